@@ -1,4 +1,10 @@
+import hashlib
+import json
 import os
+import socketserver
+import sqlite3
+import tempfile
+import threading
 import unittest
 from unittest.mock import patch, MagicMock
 from management.LibraryController import LibraryController
@@ -7,8 +13,109 @@ from management.LibraryFileManager import LibraryFileManager
 from users.librarian import LibrarianManager
 from books.book import Book
 from management.library import Library
+from management.SQLiteStorage import SQLiteStorage
+from management.SearchIndex import NGramIndex
+from management.BookLoader import BookLoader
+from management.CatalogSnapshot import CatalogSnapshot
+from files.Log import add_log, configure_logging, stop_logging
+from management.BookTable import VirtualBookTable
+from management.UIExecutor import UIExecutor
+from management.SearchStrategy import SearchBookName
+from management.ComponentRegistry import ComponentRegistry
+from management.NotificationOutbox import NotificationOutbox, NotificationDispatcher, SMTPTransport
+from management.LibraryServer import LibraryServer
+from management.LibraryClient import LibraryClient, RemoteController
+from management.Metrics import metrics
+
+try:
+    from management.ColumnarLibrary import ColumnarLibrary
+except ImportError:  # NumPy is optional
+    ColumnarLibrary = None
 import pandas as pd
 
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP to accept messages and keeps their recipients."""
+
+    def handle(self):
+        self.wfile.write(b"220 localhost ready\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.wfile.write(b"250 localhost\r\n")
+            elif command.startswith("RCPT TO:"):
+                self.server.recipients.append(line.decode().strip()[8:].strip("<> "))
+                self.wfile.write(b"250 OK\r\n")
+            elif command == "DATA":
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.wfile.write(b"250 OK\r\n")
+            elif command == "QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+class StandInTreeview:
+    """Records the row operations a VirtualBookTable performs, in place of a ttk.Treeview."""
+
+    def __init__(self):
+        self.rows = []
+        self.values = {}
+        self.calls = []
+
+    def configure(self, **options):
+        pass
+
+    def bind(self, sequence, callback):
+        pass
+
+    def insert(self, parent, index, iid, values):
+        self.calls.append("insert")
+        self.rows.insert(index, iid)
+        self.values[iid] = values
+
+    def delete(self, *iids):
+        self.calls.append("delete")
+        for iid in iids:
+            self.rows.remove(iid)
+            del self.values[iid]
+
+    def item(self, iid, values):
+        self.calls.append("item")
+        self.values[iid] = values
+
+    def move(self, iid, parent, index):
+        self.calls.append("move")
+        self.rows.remove(iid)
+        self.rows.insert(index, iid)
+
+
+class StandInRoot:
+    """Collects root.after callbacks so a test can run them as the Tk mainloop would."""
+
+    def __init__(self):
+        self.pending = {}
+        self.next_id = 0
+
+    def after(self, delay, callback):
+        self.next_id += 1
+        self.pending[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, timer):
+        self.pending.pop(timer, None)
+
+    def run_pending(self):
+        callbacks, self.pending = list(self.pending.values()), {}
+        for callback in callbacks:
+            callback()
+
+
 class TestLibrarySystem(unittest.TestCase):
 
     def setUp(self):
@@ -102,5 +209,842 @@ class TestLibrarySystem(unittest.TestCase):
         with self.assertRaises(PermissionError):
             self.controller.authenticate_librarian("Admin", "admin123", "wrongpassword")
 
+    def test_journal_replay(self):
+        """Test that journal records survive a restart and a torn tail is discarded."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            books_file = os.path.join(temp_dir, "books.csv")
+            controller = LibraryController(Library(), self.stats_manager, file_path=books_file, journal=True)
+            controller.add_book("Journal Title", "Journal Author", 2, "Fiction", 2020)
+            controller.borrow_book("Journal Title", "Journal Author", {"name": "Lidor", "email": "l@gmail.com", "phone": "1"})
+            with open(books_file + ".journal", "ab") as file:
+                file.write(b"0000dead {\"op\":\"remove\"")
+
+            library = Library(books_file)
+            LibraryController(library, self.stats_manager, file_path=books_file, journal=True)
+            book = library.books["journal title:journal author"]
+            self.assertEqual(book.available, 1)
+            self.assertEqual(book.request_counter, 1)
+            self.assertFalse(os.path.exists(books_file))
+
+    def test_journal_replay_after_return(self):
+        """Test that a returned copy is journaled and survives a restart."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            books_file = os.path.join(temp_dir, "books.csv")
+            controller = LibraryController(Library(), self.stats_manager, file_path=books_file, journal=True)
+            controller.add_book("Journal Title", "Journal Author", 1, "Fiction", 2020)
+            controller.borrow_book("Journal Title", "Journal Author", {"name": "Lidor", "email": "l@gmail.com", "phone": "1"})
+            controller.return_book("Journal Title", "Journal Author")
+
+            library = Library(books_file)
+            LibraryController(library, self.stats_manager, file_path=books_file, journal=True)
+            book = library.books["journal title:journal author"]
+            self.assertEqual((book.available, book.is_loaned), (1, False))
+
+    def test_group_commit_flush(self):
+        """Test that group commit coalesces book and waitlist saves and flushes them on close."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            books_file = os.path.join(temp_dir, "books.csv")
+            stats_file = os.path.join(temp_dir, "stats.csv")
+            stats_manager = StatisticsManager(stats_file)
+            controller = LibraryController(Library(), stats_manager, file_path=books_file,
+                                           group_commit=True, commit_interval=60, commit_batch_size=1000)
+            controller.add_book("Group Title", "Group Author", 1, "Fiction", 2020)
+            user = {"name": "Lidor", "email": "lidor@gmail.com", "phone": "111111"}
+            controller.borrow_book("Group Title", "Group Author", user)
+            self.assertFalse(controller.borrow_book("Group Title", "Group Author", user))
+            self.assertFalse(os.path.exists(books_file))
+            self.assertFalse(os.path.exists(stats_file))
+            controller.close()
+
+            library = Library(books_file)
+            library.load_books_from_file()
+            self.assertTrue(library.has_book("group title:group author"))
+            self.assertEqual(StatisticsManager(stats_file).get_waitlist("group title:group author"), [user])
+
+            # Once the writer is closed, waitlist changes are saved as they happen again
+            stats_manager.notify_waitlist("group title:group author", "Group Title")
+            self.assertEqual(StatisticsManager(stats_file).get_waitlist("group title:group author"), [])
+
+    def test_sqlite_storage(self):
+        """Test migrating CSV data to SQLite and persisting row-level updates."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            storage = SQLiteStorage(os.path.join(temp_dir, "library.db"))
+            self.assertEqual(storage.migrate_from_csv(os.path.abspath("../files/books.csv")), 34)
+
+            library = Library()
+            stats_manager = StatisticsManager(backend=storage)
+            controller = LibraryController(library, stats_manager, file_path=os.path.join(temp_dir, "books.csv"),
+                                           storage=storage)
+            controller.load_books()
+            user = {"name": "Lidor", "email": "lidor@gmail.com", "phone": "111111"}
+            controller.borrow_book("1984", "George Orwell", user)
+            self.assertEqual(storage.get_book("1984:george orwell").request_counter, 6)
+            self.assertEqual(len(storage.get_books_by_genre("Dystopian")), len(
+                [book for book in library.get_books() if book.genre == "Dystopian"]))
+
+            # Genre and availability lookups are answered by the database, with the library's Book objects
+            book_key = storage.query_book_keys("get_available_books")[0]
+            with storage.connection:  # Only the database sees the book as out of copies
+                storage.connection.execute("UPDATE books SET available = 0 WHERE book_key = ?", (book_key,))
+            self.assertIn(library.books[book_key], library.get_available_books())
+            self.assertNotIn(library.books[book_key], controller.get_available_books())
+            self.assertIn(library.books["1984:george orwell"], controller.query("get_books_by_genre", "Dystopian"))
+            self.assertEqual(controller.query("get_loaned_books"), [
+                library.books[book_key] for book_key in storage.query_book_keys("get_loaned_books")])
+
+            reloaded = StatisticsManager(backend=storage)
+            self.assertEqual(reloaded.get_waitlist("1984:george orwell")[0]["email"], "lidor@gmail.com")
+            storage.close()
+
+    def test_sqlite_schema_upgrade(self):
+        """Test that a database without waitlist priorities is upgraded on open."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "library.db")
+            connection = sqlite3.connect(db_path)
+            connection.execute("CREATE TABLE waitlist (book_key TEXT NOT NULL, position INTEGER NOT NULL, name TEXT, "
+                               "email TEXT, phone TEXT, PRIMARY KEY (book_key, position))")
+            connection.execute("INSERT INTO waitlist VALUES ('t:a', 0, 'A', 'a@x.com', '1')")
+            connection.commit()
+            connection.close()
+
+            storage = SQLiteStorage(db_path)
+            self.assertEqual(storage.connection.execute("PRAGMA user_version").fetchone()[0],
+                             SQLiteStorage.SCHEMA_VERSION)
+            stats_manager = StatisticsManager(backend=storage)
+            self.assertEqual(stats_manager.get_waitlist("t:a")[0]["email"], "a@x.com")
+            storage.save_statistics(stats_manager)
+            storage.close()
+
+    def test_indexed_title_search(self):
+        """Test that the n-gram index returns the same books as a linear scan."""
+        library = Library(os.path.abspath("../files/books.csv"))
+        library.load_books_from_file()
+        self.assertIsNone(library.title_index)  # Built by the first search, not by the load
+        library.add_book(Book("Café Society", "Émile Zola", 1880, 1, "Classic", 1))
+        library.search_title("the")
+        library.remove_book("the hobbit:j.r.r. tolkien")
+        library.add_book(Book("The Hobbit", "J.R.R. Tolkien", 1937, 2, "Fantasy", 0))
+        library.remove_book("1984:george orwell")
+        for query in ["the", "sa", "café", "cafe", "zola", "ring", "x", "hobbit", "1984"]:
+            expected = [book for book in library.get_books() if query in book.title.lower()]
+            self.assertEqual(library.search_title(query), expected)
+            expected = [book for book in library.get_books() if query in book.author.lower()]
+            self.assertEqual(library.search_author(query), expected)
+
+        # Removed entries are dropped from the postings once they dominate the index
+        index = NGramIndex()
+        for number in range(3000):
+            index.add(f"key{number}", f"Title {number}")
+        for number in range(2000):
+            index.remove(f"key{number}")
+        self.assertLess(index.removed, 1024)
+        self.assertEqual(index.candidates("title 2999"), ["key2999"])
+        self.assertEqual(len(index.candidates("title")), 1000)
+
+    def test_secondary_indexes(self):
+        """Test that genre and availability indexes follow borrow, return and remove."""
+        self.controller.add_book("Test Title", "Test Author", 1, "Fiction", 2021)
+        self.controller.add_book("Other Title", "Other Author", 2, "Drama", 2020)
+        user = {"name": "Lidor", "email": "lidor@gmail.com", "phone": "111111"}
+        self.controller.borrow_book("Test Title", "Test Author", user)
+        self.assertEqual([book.title for book in self.library.get_loaned_books()], ["Test Title"])
+        self.assertEqual([book.title for book in self.library.get_available_books()], ["Other Title"])
+
+        self.controller.return_book("Test Title", "Test Author")
+        self.assertEqual([book.title for book in self.library.get_available_books()], ["Test Title", "Other Title"])
+        self.controller.remove_book("Other Title", "Other Author")
+        self.assertEqual(self.library.get_genres(), ["Fiction"])
+        self.assertEqual(self.library.get_books_by_genre("Drama"), [])
+
+    def test_popular_books_top_k(self):
+        """Test that the maintained top-K matches sorting the whole catalog."""
+        library = Library(os.path.abspath("../files/books.csv"), popular_k=5, popular_by_genre=True)
+        library.load_books_from_file()
+        for step in range(200):
+            keys = list(library.books)
+            book_key = keys[(step * 7) % len(keys)]
+            library.books[book_key].request_counter += step % 3
+            library.update_book_state(book_key)
+            if step % 50 == 0:
+                top = library.get_popular_books()[0]
+                library.remove_book(StatisticsManager.generate_key(top.title, top.author))
+        books = library.get_books()
+        expected = sorted(books, key=lambda book: book.request_counter, reverse=True)[:5]
+        self.assertEqual(library.get_popular_books(), expected)
+        expected = sorted([book for book in books if book.genre == "Fiction"],
+                          key=lambda book: book.request_counter, reverse=True)[:5]
+        self.assertEqual(library.get_popular_books("Fiction"), expected)
+
+    @unittest.skipIf(ColumnarLibrary is None, "NumPy is not installed")
+    def test_columnar_library_matches_library(self):
+        """Test that the columnar catalog answers filters like the dict-based library."""
+        libraries = [Library(os.path.abspath("../files/books.csv")),
+                     ColumnarLibrary(os.path.abspath("../files/books.csv"), capacity=4)]
+        user = {"name": "Lidor", "email": "lidor@gmail.com", "phone": "111111"}
+        for library in libraries:
+            library.load_books_from_file()
+            controller = LibraryController(library, self.stats_manager, file_path=os.path.abspath("../Test/TestBooks.csv"))
+            controller.borrow_book("The Great Gatsby", "F. Scott Fitzgerald", user)
+            controller.return_book("1984", "George Orwell")
+            controller.remove_book("Moby Dick", "Herman Melville")
+
+        def rows(books):
+            return [(book.title, book.author, book.year, book.copies, book.genre, book.available,
+                     book.is_loaned, book.request_counter) for book in books]
+
+        library, columnar = libraries
+        self.assertEqual(rows(columnar.get_books()), rows(library.get_books()))
+        self.assertEqual(rows(columnar.get_available_books()), rows(library.get_available_books()))
+        self.assertEqual(rows(columnar.get_loaned_books()), rows(library.get_loaned_books()))
+        self.assertEqual(rows(columnar.get_books_by_genre("Fiction")), rows(library.get_books_by_genre("Fiction")))
+        self.assertEqual(rows(columnar.get_popular_books()), rows(library.get_popular_books()))
+        self.assertEqual(rows(columnar.search_title("the")), rows(library.search_title("the")))
+        self.assertEqual(columnar.get_genres(), library.get_genres())
+
+        # Compaction repacks the titles and drops authors no book uses any more
+        for number in range(2000):
+            columnar.add_book(Book(f"Bulk Tïtle {number}", f"Bulk Author {number}", 2000, 1, "Drama", 1))
+        for number in range(2000):
+            columnar.remove_book(f"bulk tïtle {number}:bulk author {number}")
+        self.assertEqual(rows(columnar.get_books()), rows(library.get_books()))
+        self.assertNotIn("Bulk Author 0", columnar.author_lookup)
+
+    def test_streaming_loader(self):
+        """Test quoted commas, chunking, parallel parsing and structured error reports."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            books_file = os.path.join(temp_dir, "books.csv")
+            with open(books_file, "w", encoding="utf-8") as file:
+                file.write("title,author,is_loaned,copies,genre,year,available,request_counter\n")
+                file.write('"War, Peace and More",Leo Tolstoy,no,2,Classic,1869,2,3\n')
+                file.write("Broken Row,Someone,no,two,Classic,1900,1,0\n")
+                for i in range(25):
+                    file.write(f"Title {i},Author {i},no,1,Fiction,2000,0,{i}\n")
+
+            for workers in (0, 2):
+                loader = BookLoader(books_file, chunk_size=10, workers=workers)
+                chunks = list(loader.iter_chunks())
+                self.assertEqual([len(chunk) for chunk in chunks], [9, 10, 7])
+                self.assertEqual(chunks[0][0].title, "War, Peace and More")
+                self.assertEqual([(error.line_number, error.row[0]) for error in loader.errors], [(3, "Broken Row")])
+
+            library = Library(books_file)
+            self.assertEqual(library.load_books_from_file(), 26)
+            self.assertEqual(len(library.load_errors), 1)
+            self.assertTrue(library.books["title 3:author 3"].is_loaned)
+
+    def test_catalog_snapshot(self):
+        """Test that the snapshot is written, read lazily and rebuilt once the CSV changes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            books_file = os.path.join(temp_dir, "books.csv")
+            with open(os.path.abspath("../files/books.csv"), "rb") as source, open(books_file, "wb") as target:
+                target.write(source.read())
+
+            library = Library(books_file)
+            library.load_books_from_file(use_snapshot=True)
+            with CatalogSnapshot(books_file + ".snapshot") as snapshot:
+                self.assertTrue(snapshot.is_fresh(books_file))
+                self.assertEqual(len(snapshot), len(library.books))
+                self.assertEqual(snapshot.get("1984:george orwell").request_counter, 5)
+                self.assertIsNone(snapshot.get("missing:book"))
+
+            from_snapshot = Library(books_file)
+            from_snapshot.load_books_from_file(use_snapshot=True)
+            self.assertFalse(from_snapshot.indexed)  # Served from the mapping; nothing decoded yet
+            self.assertEqual(from_snapshot.books.loaded, {})
+            self.assertEqual([book.to_dict() for book in from_snapshot.get_books()],
+                             [book.to_dict() for book in library.get_books()])
+
+            # Changes made before and after the indexes are built show up in every query
+            user = {"name": "Lidor", "email": "lidor@gmail.com", "phone": "111111"}
+            for target in (library, from_snapshot):
+                controller = LibraryController(target, StatisticsManager(os.path.join(temp_dir, "stats.csv")),
+                                               file_path=os.path.join(temp_dir, "saved.csv"))
+                controller.borrow_book("The Great Gatsby", "F. Scott Fitzgerald", user)
+                controller.remove_book("Moby Dick", "Herman Melville")
+                controller.add_book("Dune", "Frank Herbert", 1, "Sci-Fi", 1965)
+                self.assertIs(target.books["the great gatsby:f. scott fitzgerald"],
+                              target.books["the great gatsby:f. scott fitzgerald"])
+            self.assertFalse(from_snapshot.indexed)
+            def rows(result):
+                return [book.to_dict() if isinstance(book, Book) else book for book in result]
+
+            for query in ("get_books", "get_available_books", "get_loaned_books", "get_popular_books"):
+                self.assertEqual(rows(getattr(from_snapshot, query)()), rows(getattr(library, query)()))
+            self.assertEqual(sorted(from_snapshot.get_genres()), sorted(library.get_genres()))
+            self.assertTrue(from_snapshot.indexed)
+            from_snapshot.remove_book("1984:george orwell")
+            library.remove_book("1984:george orwell")
+            self.assertEqual(rows(from_snapshot.search_title("the")), rows(library.search_title("the")))
+            self.assertEqual(from_snapshot.get_books_by_genre("Sci-Fi")[0].title, "Dune")
+            self.assertEqual(len(from_snapshot.books), len(library.books))
+
+            with open(books_file, "a", encoding="utf-8") as file:
+                file.write("New Book,New Author,no,1,Fiction,2024,1,0\n")
+            os.utime(books_file, ns=(0, 1))
+            refreshed = Library(books_file)
+            refreshed.load_books_from_file(use_snapshot=True)
+            self.assertTrue(refreshed.has_book("new book:new author"))
+            with CatalogSnapshot(books_file + ".snapshot") as snapshot:
+                self.assertEqual(len(snapshot), len(refreshed.books))
+
+    def test_failed_load_writes_no_snapshot(self):
+        """Test that a load interrupted by an error does not leave a snapshot of the partial catalog."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            books_file = os.path.join(temp_dir, "books.csv")
+            with open(os.path.abspath("../files/books.csv"), "rb") as source, open(books_file, "wb") as target:
+                target.write(source.read())
+
+            def failing_chunks(loader):
+                yield [Book("First", "Author", 2000, 1, "Fiction", 0)]
+                raise MemoryError("out of memory")
+
+            with patch.object(BookLoader, "iter_chunks", failing_chunks):
+                library = Library(books_file)
+                library.load_books_from_file(use_snapshot=True)
+            self.assertEqual(len(library.books), 1)
+            self.assertFalse(os.path.exists(books_file + ".snapshot"))
+
+    def test_waitlist_queue(self):
+        """Test waitlist deduplication, priority tiers, positions and persisted order."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stats_file = os.path.join(temp_dir, "statistics.csv")
+            stats_manager = StatisticsManager(storage_file=stats_file)
+            users = [{"name": f"User {i}", "email": f"user{i}@gmail.com", "phone": str(i)} for i in range(4)]
+            for user in users[:3]:
+                stats_manager.add_user_to_waitlist("book:author", user)
+            stats_manager.add_user_to_waitlist("book:author", dict(users[1], name="Again"))
+            stats_manager.add_user_to_waitlist("book:author", users[3], priority=1)
+
+            self.assertEqual([user["name"] for user in stats_manager.get_waitlist("book:author")],
+                             ["User 3", "User 0", "User 1", "User 2"])
+            self.assertEqual(stats_manager.get_waitlist_position("book:author", "USER2@gmail.com"), 4)
+            self.assertEqual(stats_manager.notify_waitlist("book:author", "Book")["name"], "User 3")
+            self.assertEqual(stats_manager.notify_waitlist("book:author", "Book")["name"], "User 0")
+            self.assertEqual(stats_manager.get_waitlist_position("book:author", "user2@gmail.com"), 2)
+            self.assertIsNone(stats_manager.notify_waitlist("other:book", "Other"))
+
+            stats_manager.add_user_to_waitlist("book:author", users[0], priority=2)
+            reloaded = StatisticsManager(storage_file=stats_file)
+            self.assertEqual([user["name"] for user in reloaded.get_waitlist("book:author")],
+                             ["User 0", "User 1", "User 2"])
+            self.assertEqual(reloaded.get_waitlist_position("book:author", "user1@gmail.com"), 2)
+
+    def test_notification_outbox(self):
+        """Test that returns queue notifications which are retried and delivered over SMTP."""
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), StandInSMTPHandler)
+        server.recipients = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        class FlakyTransport:
+            name = "flaky"
+            calls = 0
+
+            def send(self, batch):
+                FlakyTransport.calls += 1
+                if FlakyTransport.calls == 1:
+                    raise ConnectionError("temporary failure")
+
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                outbox = NotificationOutbox(os.path.join(temp_dir, "outbox.jsonl"))
+                stats_manager = StatisticsManager(storage_file=os.path.join(temp_dir, "stats.csv"), outbox=outbox)
+                controller = LibraryController(self.library, stats_manager,
+                                               file_path=os.path.join(temp_dir, "books.csv"))
+                controller.add_book("Test Title", "Test Author", 1, "Fiction", 2021)
+                controller.borrow_book("Test Title", "Test Author", {"name": "A", "email": "a@x.com", "phone": "1"})
+                controller.borrow_book("Test Title", "Test Author", {"name": "B", "email": "b@x.com", "phone": "2"})
+                controller.return_book("Test Title", "Test Author")
+                self.assertEqual(len(NotificationOutbox(outbox.file_path)), 1)
+
+                smtp = SMTPTransport("127.0.0.1", server.server_address[1])
+                dispatcher = NotificationDispatcher(outbox, [smtp, FlakyTransport()], base_delay=0.01).start()
+                self.assertTrue(dispatcher.drain(timeout=5))
+                dispatcher.stop()
+                self.assertEqual(server.recipients, ["b@x.com"])
+                self.assertEqual(FlakyTransport.calls, 2)
+                self.assertEqual(len(NotificationOutbox(outbox.file_path)), 0)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_notification_outbox_torn_tail(self):
+        """Test that a torn last record is cut off so that later records survive a reopen."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "outbox.jsonl")
+            NotificationOutbox(file_path).add({"name": "A", "email": "a@x.com", "phone": "1"}, "t:a", "T")
+            with open(file_path, "a", encoding="utf-8") as file:
+                file.write('{"op":"add","notifica')
+
+            outbox = NotificationOutbox(file_path)
+            self.assertEqual(len(outbox), 1)
+            outbox.add({"name": "B", "email": "b@x.com", "phone": "2"}, "t:a", "T")
+            self.assertEqual(len(NotificationOutbox(file_path)), 2)
+
+    def test_librarian_sessions(self):
+        """Test session tokens, their expiry and the upgrade of legacy password hashes on login."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "librarians.csv")
+            with open(file_path, "w", encoding="utf-8") as file:
+                file.write("username,id,password_hash\n")
+                file.write(f"old,old1,{hashlib.sha256(b'secret').hexdigest()}\n")
+
+            manager = LibrarianManager(file_path, hash_iterations=1000)
+            self.assertIsNone(manager.login("old", "old1", "wrong"))
+            token = manager.login("old", "old1", "secret")
+            self.assertEqual(manager.validate_session(token).id, "old1")
+            self.assertTrue(LibrarianManager(file_path).librarians["old1"].password_hash.startswith("pbkdf2_sha256$1000$"))
+
+            # A higher configured cost upgrades the hash again on the next login
+            stronger = LibrarianManager(file_path, hash_iterations=2000, session_ttl=0)
+            expired = stronger.login("old", "old1", "secret")
+            self.assertTrue(stronger.librarians["old1"].password_hash.startswith("pbkdf2_sha256$2000$"))
+            self.assertIsNone(stronger.validate_session(expired))
+            self.assertNotIn(expired, stronger.sessions)
+
+            controller = LibraryController(self.library, self.stats_manager, librarian_manager=manager,
+                                           file_path=os.path.join(temp_dir, "books.csv"))
+            controller.authenticate_librarian("old", "old1", "secret")
+            self.assertEqual(controller.current_librarian().username, "old")
+            controller.logout_librarian()
+            self.assertIsNone(controller.current_librarian())
+
+            # With require_session, catalog changes are refused without a live session
+            controller.require_session = True
+            with self.assertRaises(PermissionError):
+                controller.add_book("Session Title", "Session Author", 1, "Drama", 2000)
+            controller.authenticate_librarian("old", "old1", "secret")
+            controller.add_book("Session Title", "Session Author", 1, "Drama", 2000)
+            manager.session_ttl = 0
+            controller.authenticate_librarian("old", "old1", "secret")
+            with self.assertRaises(PermissionError):
+                controller.remove_book("Session Title", "Session Author")
+            self.assertIsNone(controller.session_token)
+            self.assertTrue(self.library.has_book("session title:session author"))
+
+            # Expired sessions are purged when a new one opens
+            stale = manager.login("old", "old1", "secret")
+            manager.login("old", "old1", "secret")
+            self.assertNotIn(stale, manager.sessions)
+
+    def test_targeted_observers(self):
+        """Test that registry wiring subscribes librarians once and targeted observers only hear their books."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "librarians.csv")
+            LibrarianManager(file_path, hash_iterations=1000).add_librarian("lib", "lib1", "secret")
+            registry = ComponentRegistry(books_file=os.path.join(temp_dir, "books.csv"),
+                                         statistics_file=os.path.join(temp_dir, "stats.csv"),
+                                         librarians_file=file_path, library=self.library)
+            controller = registry.create_controller()
+            self.assertIs(controller.librarian_manager, registry.librarian_manager)
+            LibrarianManager(file_path, statistics_manager=registry.statistics_manager)  # Reloads the same librarian
+            self.assertEqual(len(list(registry.statistics_manager)), 1)
+
+            calls = []
+
+            class Recorder:
+                def __init__(self, name):
+                    self.name = name
+
+                @staticmethod
+                def update(observer, user, book_name):
+                    calls.append((observer.name, book_name))
+
+            fiction, history = Recorder("fiction"), Recorder("history")
+            stats_manager = registry.statistics_manager
+            stats_manager.register_observer(fiction, genre="Fiction")
+            stats_manager.register_observer(fiction, genre="Fiction")
+            stats_manager.register_observer(history, book_key="rome:beard")
+            self.assertEqual(stats_manager.notify_observers({"name": "A"}, "Dune", "dune:herbert", "Fiction"), 2)
+            self.assertEqual(calls, [("fiction", "Dune")])
+            stats_manager.unregister_observer(fiction)
+            self.assertEqual(stats_manager.notify_observers({"name": "A"}, "Dune", "dune:herbert", "Fiction"), 1)
+            self.assertEqual(stats_manager.get_observers("rome:beard"), [*stats_manager.observers.values(), history])
+
+    def test_queued_rotating_log(self):
+        """Test that queued log records reach a rotating log file, formatted lazily and appended."""
+        class Expensive:
+            formatted = 0
+
+            def __str__(self):
+                Expensive.formatted += 1
+                return "expensive"
+
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                log_path = os.path.join(temp_dir, "library_log.txt")
+                with open(log_path, "w") as file:
+                    file.write("earlier run\n")
+                configure_logging(log_path, asynchronous=True, max_bytes=2000, backup_count=2)
+                add_log("skipped %s", "debug", Expensive())
+                add_log("Library started.", "info")
+                stop_logging()
+                self.assertEqual(Expensive.formatted, 0)
+                with open(log_path) as file:
+                    self.assertTrue(file.read().startswith("earlier run\n"))
+
+                configure_logging(log_path, asynchronous=True, max_bytes=2000, backup_count=2)
+                for number in range(100):
+                    add_log("Book %d borrowed by %s.", "info", number, "A")
+                stop_logging()
+                self.assertTrue(os.path.exists(log_path + ".2"))
+                self.assertFalse(os.path.exists(log_path + ".3"))
+                with open(log_path) as file:
+                    self.assertIn("Book 99 borrowed by A.", file.read())
+        finally:
+            configure_logging()
+
+    def test_virtual_book_table(self):
+        """Test that the book table renders one page and only applies the rows that changed."""
+        for number in range(1000):
+            self.library.add_book(Book(f"Book {number}", "Author", 2000, 1, "Fiction", 1))
+        tree = StandInTreeview()
+        table = VirtualBookTable(tree, page_size=10)
+        table.show(self.library.get_books())
+        self.assertEqual(tree.rows, [f"book {number}:author" for number in range(10)])
+
+        tree.calls.clear()
+        self.controller.borrow_book("Book 3", "Author", {"name": "A", "email": "a@x.com", "phone": "1"})
+        table.refresh()
+        self.assertEqual(tree.calls, ["item"])
+        self.assertEqual(tree.values["book 3:author"][2], "yes")
+
+        tree.calls.clear()
+        table.yview("scroll", 1, "units")
+        self.assertEqual(tree.calls, ["delete", "insert"])
+        self.assertEqual(tree.rows, [f"book {number}:author" for number in range(1, 11)])
+
+        table.yview("moveto", "1.0")
+        self.assertEqual(tree.rows, [f"book {number}:author" for number in range(990, 1000)])
+        table.show(self.library.search_title("Book 99"))
+        self.assertEqual(tree.rows, [f"book {number}:author" for number in range(990, 1000)])
+        table.show(self.library.search_title("Book 99"), keep_position=False)
+        self.assertEqual(tree.rows, ["book 99:author"] + [f"book {number}:author" for number in range(990, 999)])
+
+    def test_ui_executor(self):
+        """Test that worker results come back through root.after, stale searches are dropped and input is debounced."""
+        self.controller.add_book("Dune", "Frank Herbert", 1, "Fiction", 1965)
+        self.controller.add_book("Dune Messiah", "Frank Herbert", 1, "Fiction", 1969)
+        root = StandInRoot()
+        executor = UIExecutor(root)
+        results, started, release = [], threading.Event(), threading.Event()
+
+        def slow_find(query, library):
+            started.set()
+            release.wait(5)
+            return SearchBookName().find(query, library)
+
+        first = executor.submit_latest("search", slow_find, "dune", self.library, on_done=results.append)
+        started.wait(5)  # Still running when the next search arrives, so its result must be dropped
+        second = executor.submit_latest("search", SearchBookName().find, "messiah", self.library,
+                                        on_done=results.append)
+        errors = []
+        executor.submit(SearchBookName().find, "", self.library, on_error=errors.append)
+        release.set()
+        for future in (first, second):
+            future.result(5)
+        executor.executor.submit(lambda: None).result(5)
+        root.run_pending()
+        self.assertEqual([[book.title for book in books] for books, _ in results], [["Dune Messiah"]])
+        self.assertIsInstance(errors[0], ValueError)
+
+        typed = []
+        for text in ("d", "du", "dun"):
+            executor.debounce("search", 300, typed.append, text)
+        root.run_pending()
+        self.assertEqual(typed, ["dun"])
+        executor.shutdown()
+
+    def test_bulk_add_books(self):
+        """Test that a bulk import validates and dedupes rows, reports rejects and saves once."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            feed_path = os.path.join(temp_dir, "feed.jsonl")
+            with open(feed_path, "w", encoding="utf-8") as file:
+                for number in range(500):
+                    file.write(json.dumps({"title": f"Title {number}", "author": "Vendor", "copies": 2,
+                                           "genre": "Fiction", "year": 2000}) + "\n")
+                file.write(json.dumps({"title": "Title 7", "author": "VENDOR", "copies": 1, "genre": "Fiction",
+                                       "year": 2001}) + "\n")
+                file.write(json.dumps({"title": "No Year", "author": "Vendor", "copies": 1, "genre": "Fiction"}) + "\n")
+                file.write("{not json\n")
+            controller = LibraryController(self.library, self.stats_manager, file_path=os.path.join(temp_dir, "books.csv"))
+            controller.add_book("Title 1", "Vendor", 1, "Fiction", 1999)
+
+            with patch.object(LibraryFileManager, "save_books", autospec=True,
+                              side_effect=LibraryFileManager.save_books) as save_books:
+                report = controller.bulk_add_books(feed_path)
+            self.assertEqual(save_books.call_count, 1)
+            self.assertEqual(report.added, 499)
+            self.assertEqual([(error.line_number, error.message) for error in report.errors],
+                             [(2, "duplicate book 'Title 1' by Vendor"), (501, "duplicate book 'Title 7' by VENDOR"),
+                              (502, "missing year"), (503, "not a record")])
+            self.assertGreater(report.rate, 0)
+            reloaded = Library(os.path.join(temp_dir, "books.csv"))
+            reloaded.load_books_from_file()
+            self.assertEqual(len(reloaded.books), 500)
+            self.assertEqual(len(self.library.search_author("vendor")), 500)
+
+            csv_path = os.path.join(temp_dir, "feed.csv")
+            with open(csv_path, "w", encoding="utf-8") as file:
+                file.write("title,author,copies,genre,year\n\"Dune, Deluxe\",Frank Herbert,1,Fiction,1965\nBad,X,-1,Fiction,2000\n")
+            report = controller.bulk_add_books(csv_path)
+            self.assertEqual((report.added, report.error_count), (1, 1))
+            self.assertEqual(self.library.books["dune, deluxe:frank herbert"].available, 1)
+
+    def test_process_loans_batch(self):
+        """Test that a loan batch saves once, hands off returned copies and rolls back atomically."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stats_manager = StatisticsManager(storage_file=os.path.join(temp_dir, "stats.csv"))
+            controller = LibraryController(self.library, stats_manager, file_path=os.path.join(temp_dir, "books.csv"))
+            controller.add_book("Dune", "Frank Herbert", 2, "Fiction", 1965)
+            controller.add_book("Emma", "Jane Austen", 1, "Classic", 1815)
+            users = [{"name": f"U{number}", "email": f"u{number}@x.com", "phone": "1"} for number in range(4)]
+
+            with patch.object(LibraryFileManager, "save_books", autospec=True,
+                              side_effect=LibraryFileManager.save_books) as save_books, \
+                    patch.object(StatisticsManager, "save_data", autospec=True,
+                                 side_effect=StatisticsManager.save_data) as save_data:
+                outcomes = controller.process_loans([
+                    ("borrow", "Dune", "Frank Herbert", users[0]),
+                    ("borrow", "Dune", "Frank Herbert", users[1]),
+                    ("borrow", "Dune", "Frank Herbert", users[2]),
+                    ("borrow", "Emma", "Jane Austen", users[3]),
+                    ("return", "Dune", "Frank Herbert"),
+                ])
+            self.assertEqual([outcome.status for outcome in outcomes],
+                             ["borrowed", "borrowed", "waitlisted", "borrowed", "returned"])
+            self.assertEqual((save_books.call_count, save_data.call_count), (1, 1))
+            self.assertEqual(stats_manager.get_waitlist("dune:frank herbert"), [])  # U2 was handed the returned copy
+            self.assertEqual(self.library.books["dune:frank herbert"].available, 1)
+
+            outcomes = controller.process_loans([
+                ("return", "Dune", "Frank Herbert"),
+                ("borrow", "Emma", "Jane Austen", users[0]),
+                ("return", "Missing", "Nobody"),
+            ])
+            self.assertEqual([outcome.status for outcome in outcomes], ["rolled back", "rolled back", "failed"])
+            self.assertEqual(self.library.books["dune:frank herbert"].available, 1)
+            self.assertEqual(self.library.books["emma:jane austen"].request_counter, 1)
+            self.assertEqual(stats_manager.get_waitlist("emma:jane austen"), [])
+
+            outcomes = controller.process_loans([("return", "Emma", "Jane Austen"), ("return", "Emma", "Jane Austen")],
+                                                atomic=False)
+            self.assertEqual([outcome.status for outcome in outcomes], ["returned", "failed"])
+            reloaded = Library(os.path.join(temp_dir, "books.csv"))
+            reloaded.load_books_from_file()
+            self.assertEqual(reloaded.books["emma:jane austen"].available, 1)
+
+            # Any error rolls an atomic batch back, not only ValueError; here the second user has no name
+            nameless = {"email": "x@x.com", "phone": "1"}
+            for atomic, statuses in ((True, ["rolled back", "failed"]), (False, ["borrowed", "failed"])):
+                outcomes = controller.process_loans([("borrow", "Emma", "Jane Austen", users[0]),
+                                                     ("borrow", "Dune", "Frank Herbert", nameless)], atomic=atomic)
+                self.assertEqual([outcome.status for outcome in outcomes], statuses)
+                self.assertEqual(self.library.books["dune:frank herbert"].available, 1)
+                reloaded = Library(os.path.join(temp_dir, "books.csv"))
+                reloaded.load_books_from_file()
+                self.assertEqual(reloaded.books["emma:jane austen"].available, self.library.books[
+                    "emma:jane austen"].available)
+            self.assertEqual(self.library.books["emma:jane austen"].available, 0)
+
+    def test_thread_safe_controller(self):
+        """Test that concurrent desks never oversell copies in thread-safe mode."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            controller = LibraryController(self.library, StatisticsManager(os.path.join(temp_dir, "stats.csv")),
+                                           file_path=os.path.join(temp_dir, "books.csv"), group_commit=True,
+                                           thread_safe=True, lock_stripes=8)
+            for number in range(20):
+                controller.add_book(f"Title {number}", "Author", 2, "Fiction", 2000)
+            counts, violations, done = [], [], threading.Event()
+
+            def desk(seed):
+                borrowed = returned = 0
+                user = {"name": f"U{seed}", "email": f"u{seed}@x.com", "phone": "1"}
+                for number in range(300):
+                    title = f"Title {(seed * 7 + number) % 20}"
+                    if (seed + number) % 3:
+                        borrowed += controller.borrow_book(title, "Author", user)
+                    else:
+                        try:
+                            controller.return_book(title, "Author")
+                            returned += 1
+                        except ValueError:
+                            pass
+                    if seed == 0 and number % 100 == 0:
+                        controller.add_book(f"New {number}", "Author", 1, "Fiction", 2020)  # Catalog change mid-run
+                counts.append(borrowed - returned)
+
+            def checker():
+                while not done.wait(0.001):
+                    violations.extend(book for book in self.library.get_books()
+                                      if not 0 <= book.available <= book.copies)
+
+            watcher = threading.Thread(target=checker)
+            watcher.start()
+            desks = [threading.Thread(target=desk, args=(seed,)) for seed in range(8)]
+            for thread in desks:
+                thread.start()
+            for thread in desks:
+                thread.join()
+            done.set()
+            watcher.join()
+            controller.close()
+
+            self.assertEqual(violations, [])
+            self.assertEqual(sum(book.copies - book.available for book in self.library.get_books()), sum(counts))
+            self.assertEqual(len(self.library.books), 23)
+
+    def test_library_server(self):
+        """Test pipelined requests, sessions and a remote controller against one served catalog."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            controller = LibraryController(self.library, StatisticsManager(os.path.join(temp_dir, "stats.csv")),
+                                           file_path=os.path.join(temp_dir, "books.csv"),
+                                           librarian_manager=LibrarianManager(os.path.join(temp_dir, "lib.csv"),
+                                                                              hash_iterations=1000),
+                                           thread_safe=True)
+            controller.add_book("Dune", "Frank Herbert", 1, "Sci-Fi", 1965)
+            controller.add_book("Emma", "Jane Austen", 2, "Classic", 1815)
+            controller.register_librarian("desk", "1", "secret")
+            server = LibraryServer(controller, port=0).start_in_thread()
+            client = LibraryClient(port=server.port)
+            remote = RemoteController(port=server.port)
+            try:
+                titles, authors, genres = client.pipeline([("search_title", {"query": "dun"}),
+                                                           ("search_author", {"query": "austen"}),
+                                                           ("get_genres", {})])
+                self.assertEqual([book["title"] for book in titles], ["Dune"])
+                self.assertEqual([book["title"] for book in authors], ["Emma"])
+                self.assertEqual(genres, ["Sci-Fi", "Classic"])
+
+                user = {"name": "Ann", "email": "ann@x.com", "phone": "1"}
+                with self.assertRaises(PermissionError):
+                    client.call("borrow_book", title="Dune", author="Frank Herbert", user=user)
+                with self.assertRaises(LookupError):
+                    client.call("checkpoint")
+
+                remote.authenticate_librarian("desk", "1", "secret")
+                dune = remote.library.search_title("Dune")[0]
+                self.assertTrue(remote.borrow_book("Dune", "Frank Herbert", user))
+                self.assertEqual((dune.available, dune.is_loaned), (0, True))  # Updated in place
+                self.assertFalse(remote.borrow_book("Dune", "Frank Herbert", user))
+                self.assertEqual(remote.stat_manager.get_waitlist("dune:frank herbert"), [user])
+                with self.assertRaises(ValueError):
+                    remote.return_book("Emma", "Jane Austen")
+                self.assertEqual(self.library.books["dune:frank herbert"].available, 0)
+                remote.logout_librarian()
+                with self.assertRaises(PermissionError):
+                    remote.return_book("Dune", "Frank Herbert")
+            finally:
+                remote.close()
+                client.close()
+                server.stop()
+                controller.close()
+
+    def test_shared_files_merge_and_reload(self):
+        """Test that two desks on the same files merge their saves and reload each other's changes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            books = os.path.join(temp_dir, "books.csv")
+            stats = os.path.join(temp_dir, "stats.csv")
+            librarians = os.path.join(temp_dir, "librarians.csv")
+
+            def desk():
+                stat_manager = StatisticsManager(stats)
+                controller = LibraryController(Library(), stat_manager, file_path=books, watch_files=True,
+                                               librarian_manager=LibrarianManager(librarians, hash_iterations=1000))
+                controller.load_books()
+                return controller
+
+            first = desk()
+            first.add_book("Dune", "Frank Herbert", 1, "Sci-Fi", 1965)
+            first.add_book("Emma", "Jane Austen", 2, "Classic", 1815)
+            second = desk()
+            emma = second.library.books["emma:jane austen"]
+
+            # Each desk saves a different change; neither overwrites the other
+            user = {"name": "Ann", "email": "ann@x.com", "phone": "1"}
+            first.borrow_book("Dune", "Frank Herbert", user)
+            first.borrow_book("Dune", "Frank Herbert", user)  # Waitlisted
+            second.borrow_book("Emma", "Jane Austen", user)
+            second.add_book("Ulysses", "James Joyce", 1, "Classic", 1922)
+            second.register_librarian("desk2", "2", "secret")
+
+            rows = {row[0]: row for row in LibraryFileManager(books)._read_rows().values()}
+            self.assertEqual((rows["Dune"][6], rows["Emma"][6], len(rows)), ("0", "1", 3))
+
+            # The first desk picks up only the rows the second one changed
+            self.assertEqual(first.reload_if_changed(), 2)
+            self.assertEqual(first.library.books["emma:jane austen"].available, 1)
+            self.assertEqual(first.library.search_title("ulysses")[0].author, "James Joyce")
+            self.assertEqual(first.library.books["dune:frank herbert"].available, 0)
+            self.assertIsNotNone(first.librarian_manager.authenticate("desk2", "2", "secret"))
+            self.assertEqual(second.stat_manager.reload_data(), 1)
+            self.assertEqual(second.stat_manager.get_waitlist("dune:frank herbert"), [user])
+
+            # Updates are applied in place; removals on disk are removed in memory
+            first.return_book("Dune", "Frank Herbert")
+            first.remove_book("Ulysses", "James Joyce")
+            second.reload_if_changed()
+            self.assertIs(second.library.books["emma:jane austen"], emma)
+            self.assertEqual(second.library.books["dune:frank herbert"].available, 1)
+            self.assertFalse(second.library.has_book("ulysses:james joyce"))
+            self.assertEqual(second.reload_if_changed(), 0)
+            self.assertFalse(any(name.endswith(".tmp") for name in os.listdir(temp_dir)))
+
+    @unittest.skipIf(ColumnarLibrary is None, "NumPy is not installed")
+    def test_columnar_library_reloads_changes(self):
+        """Test that rows changed by another desk are applied to a columnar catalog."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            books = os.path.join(temp_dir, "books.csv")
+            stats = os.path.join(temp_dir, "stats.csv")
+            first = LibraryController(Library(), StatisticsManager(stats), file_path=books, watch_files=True)
+            first.add_book("Dune", "Frank Herbert", 2, "Sci-Fi", 1965)
+            first.add_book("Emma", "Jane Austen", 1, "Classic", 1815)
+            second = LibraryController(ColumnarLibrary(), StatisticsManager(stats), file_path=books,
+                                       watch_files=True)
+            second.load_books()
+
+            first.borrow_book("Dune", "Frank Herbert", {"name": "Ann", "email": "ann@x.com", "phone": "1"})
+            first.remove_book("Emma", "Jane Austen")
+            self.assertEqual(second.reload_if_changed(), 2)
+            dune = second.library.books["dune:frank herbert"]
+            self.assertEqual((dune.available, dune.request_counter), (1, 1))
+            self.assertFalse(second.library.has_book("emma:jane austen"))
+
+    def test_metrics(self):
+        """Test latency histograms, bytes written and the OpenMetrics dump, and that nothing is kept while off."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            controller = LibraryController(self.library, StatisticsManager(os.path.join(temp_dir, "stats.csv")),
+                                           file_path=os.path.join(temp_dir, "books.csv"))
+            controller.add_book("Dune", "Frank Herbert", 1, "Sci-Fi", 1965)
+            self.assertEqual(metrics.snapshot(), [])  # Disabled by default
+
+            metrics.enable()
+            try:
+                user = {"name": "Ann", "email": "ann@x.com", "phone": "1"}
+                controller.borrow_book("Dune", "Frank Herbert", user)
+                controller.borrow_book("Dune", "Frank Herbert", user)  # Waitlisted
+                with self.assertRaises(ValueError):
+                    controller.borrow_book("Missing", "Nobody", user)
+                SearchBookName().find("dune", self.library)
+            finally:
+                metrics.enable(False)
+            saved_size = os.path.getsize(os.path.join(temp_dir, "books.csv"))
+            controller.return_book("Dune", "Frank Herbert")
+
+            rows = {row["operation"]: row for row in metrics.snapshot()}
+            self.assertEqual(rows["controller.borrow_book"]["count"], 3)
+            self.assertEqual(rows["search.SearchBookName"]["count"], 1)
+            self.assertEqual(rows["statistics.add_user_to_waitlist"]["count"], 1)
+            self.assertNotIn("controller.return_book", rows)
+            self.assertLessEqual(rows["file.save_books"]["p50"], rows["file.save_books"]["max"])
+            written = dict((labels["file"], total) for labels, total in metrics.totals("library_bytes_written"))
+            self.assertEqual(written["books.csv"], 2 * saved_size)
+
+            text = metrics.openmetrics()
+            self.assertIn('library_operation_seconds_count{operation="controller.borrow_book"} 3', text)
+            self.assertIn('library_operation_seconds_bucket{operation="controller.borrow_book",le="+Inf"} 3', text)
+            self.assertIn('library_operation_errors_total{operation="controller.borrow_book"} 1', text)
+            self.assertTrue(text.endswith("# EOF\n"))
+            metrics.reset()
+
 if __name__ == "_main_":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""Memory-per-book benchmark: the __slots__ Book against the old __dict__ class.
+
+Builds the same synthetic catalog with both classes and measures the
+allocated bytes with tracemalloc. Genres and authors are parsed from text,
+as they are when loading a CSV, so each book gets fresh string objects
+unless the class interns them.
+
+    python benchmarks/book_memory.py [--books 100000]
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from books.book import Book
+
+GENRES = ["Fiction", "Dystopian", "Classic", "Fantasy", "Romance", "Mystery", "Science Fiction", "History"]
+
+
+class DictBook:
+    """The Book class as it was before __slots__ and interning."""
+
+    def __init__(self, title, author, year, copies, genre, available, is_loaned=False, request_counter=0):
+        self.title = title
+        self.author = author
+        self.year = year
+        self.copies = copies
+        self.genre = genre
+        self.is_loaned = is_loaned
+        self.available = available
+        self.request_counter = request_counter
+
+
+def csv_lines(count):
+    for i in range(count):
+        yield f"Title {i},Author {i % 5000},no,3,{GENRES[i % len(GENRES)]},{1900 + i % 120},2,{i % 40}"
+
+
+def measure(book_class, count):
+    tracemalloc.start()
+    books = []
+    for line in csv_lines(count):
+        title, author, is_loaned, copies, genre, year, available, request_counter = line.split(",")
+        books.append(book_class(title, author, int(year), int(copies), genre, int(available),
+                                is_loaned == "yes", int(request_counter)))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=100_000)
+    args = parser.parse_args()
+
+    before = measure(DictBook, args.books)
+    after = measure(Book, args.books)
+    print(f"{args.books} books")
+    print(f"  __dict__ Book: {before:7.1f} bytes per book")
+    print(f"  __slots__ Book: {after:7.1f} bytes per book ({100 * (before - after) / before:.0f}% less)")
+
+
+if __name__ == "__main__":
+    main()
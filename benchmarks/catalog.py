@@ -0,0 +1,108 @@
+"""Deterministic synthetic catalogs for benchmarks.
+
+Writes a books.csv and a matching statistics.csv (waitlists and request
+counts) of any size. Rows are streamed, so 10M books need no more memory
+than 1k, and the same --books and --seed always give byte-identical files.
+
+    python benchmarks/catalog.py OUT_DIR [--books 100000] [--seed 0] [--waitlisted 0.05]
+
+Request counts follow a long-tailed distribution, so a few books are far
+more popular than the rest, as in a real library. About a fifth of the
+books have every copy out; --waitlisted is the fraction of books with
+people waiting.
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from management.LibraryFileManager import LibraryFileManager
+from management.StatisticsManager import StatisticsManager
+
+GENRES = ["Fiction", "Dystopian", "Classic", "Fantasy", "Romance", "Mystery", "Science Fiction", "History",
+          "Biography", "Poetry", "Horror", "Travel"]
+WORDS = ["River", "Silent", "Garden", "Shadow", "Winter", "Crown", "Stone", "Harbor", "Night", "Glass", "Empire",
+         "Letter", "Forest", "Storm", "Mirror", "Journey", "Island", "Fire", "Secret", "Song", "Road", "Tide",
+         "Memory", "Light", "House", "Wolf", "Summer", "Clock", "Bridge", "Star"]
+FIRST_NAMES = ["Ada", "Ben", "Clara", "Dmitri", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jonas", "Kemi", "Liam",
+               "Maya", "Noor", "Oscar", "Priya", "Quinn", "Rosa", "Samir", "Tove"]
+LAST_NAMES = ["Abbott", "Brandt", "Castillo", "Dubois", "Eriksen", "Fischer", "Gallo", "Haddad", "Ivanova",
+              "Jensen", "Kowalski", "Larsen", "Moreau", "Nakamura", "Okafor", "Petrov", "Quist", "Rossi",
+              "Silva", "Tanaka"]
+QUERIES = {"title": "river", "author": "castillo", "genre": "Mystery"}  # Queries that match every catalog size
+
+
+def iter_books(count, seed=0):
+    """Yield the books.csv rows of a catalog, in FIELDNAMES order."""
+    rng = random.Random(seed)
+    authors = max(1, count // 20)
+    for number in range(count):
+        title = f"The {rng.choice(WORDS)} {rng.choice(WORDS)} {number}"  # The number keeps titles unique
+        author_number = rng.randrange(authors)
+        author = (f"{FIRST_NAMES[author_number % len(FIRST_NAMES)]} "
+                  f"{LAST_NAMES[author_number // len(FIRST_NAMES) % len(LAST_NAMES)]} {author_number}")
+        copies = rng.randint(1, 5)
+        available = 0 if rng.random() < 0.2 else rng.randint(1, copies)
+        requests = int(rng.paretovariate(1.2)) - 1 + (copies - available)
+        yield [title, author, "yes" if available == 0 else "no", copies, rng.choice(GENRES),
+               rng.randint(1850, 2024), available, requests]
+
+
+def iter_waitlists(count, seed=0, waitlisted=0.05):
+    """Yield statistics.csv rows (key, request count, waitlist) for the unavailable books of a catalog."""
+    rng = random.Random(seed + 1)
+    for title, author, is_loaned, copies, genre, year, available, requests in iter_books(count, seed):
+        if available or rng.random() >= waitlisted / 0.2:
+            continue
+        users = [f"Reader {number},reader{number}@example.com,555-{number:07d}"
+                 for number in rng.sample(range(max(10, count)), rng.randint(1, 5))]
+        yield [StatisticsManager.generate_key(title, author), requests, ";".join(users)]
+
+
+def write_catalog(directory, count, seed=0, waitlisted=0.05):
+    """Write books.csv and statistics.csv into directory; returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    books_path = os.path.join(directory, "books.csv")
+    statistics_path = os.path.join(directory, "statistics.csv")
+    with open(books_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(LibraryFileManager.FIELDNAMES)
+        writer.writerows(iter_books(count, seed))
+    with open(statistics_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["title:author", "request_count", "waitlist"])
+        writer.writerows(iter_waitlists(count, seed, waitlisted))
+    return books_path, statistics_path
+
+
+def cached_catalog(directory, count, seed=0, waitlisted=0.05):
+    """Return the paths of a generated catalog under directory, generating it on first use."""
+    target = os.path.join(directory, f"catalog-{count}-{seed}-{waitlisted}")
+    books_path = os.path.join(target, "books.csv")
+    statistics_path = os.path.join(target, "statistics.csv")
+    if not os.path.isdir(target):
+        # Generate beside the target and rename, so an interrupted run never leaves a truncated catalog behind
+        partial = f"{target}.partial"
+        shutil.rmtree(partial, ignore_errors=True)
+        write_catalog(partial, count, seed, waitlisted)
+        os.replace(partial, target)
+    return books_path, statistics_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--waitlisted", type=float, default=0.05)
+    args = parser.parse_args()
+    books_path, statistics_path = write_catalog(args.directory, args.books, args.seed, args.waitlisted)
+    print(f"Wrote {args.books} books to {books_path} and their waitlists to {statistics_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Concurrent circulation benchmark for the thread-safe LibraryController.
+
+Several desk threads borrow and return random books from one shared
+controller (group commit, so saves stay off the hot path) while a checker
+thread watches that no book ever has available < 0 or available > copies.
+Prints operations per second for each thread count.
+
+    python benchmarks/concurrent_desks.py [--books 200] [--operations 20000] [--threads 1 2 4 8]
+
+Group commit defers both the books.csv and the statistics.csv saves, so
+what is left are short CPU-bound critical sections. Under CPython's GIL
+throughput cannot grow with threads and drops a little as they contend
+for it. What must hold at every thread count is the invariant.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from files.Log import configure_logging
+from management.library import Library
+from management.LibraryController import LibraryController
+from management.StatisticsManager import StatisticsManager
+from users.librarian import LibrarianManager
+
+
+def build_controller(temp_dir, books):
+    controller = LibraryController(Library(), StatisticsManager(os.path.join(temp_dir, "stats.csv")),
+                                   file_path=os.path.join(temp_dir, "books.csv"), group_commit=True,
+                                   librarian_manager=LibrarianManager(os.path.join(temp_dir, "librarians.csv")),
+                                   thread_safe=True)
+    for number in range(books):
+        controller.add_book(f"Title {number}", f"Author {number % 50}", 3, "Fiction", 2000)
+    return controller
+
+
+def desk(controller, books, operations, seed, counts):
+    rng = random.Random(seed)
+    borrowed = returned = 0
+    for number in range(operations):
+        index = rng.randrange(books)
+        title, author = f"Title {index}", f"Author {index % 50}"
+        user = {"name": f"Reader {seed}", "email": f"reader{seed}@example.com", "phone": "1"}
+        if rng.random() < 0.5:
+            borrowed += controller.borrow_book(title, author, user)
+        else:
+            try:
+                controller.return_book(title, author)
+                returned += 1
+            except ValueError:
+                pass  # Every copy was already on the shelf
+    counts.append((borrowed, returned))
+
+
+def check_invariant(controller):
+    for book in controller.library.get_books():
+        if not 0 <= book.available <= book.copies:
+            return book
+    return None
+
+
+def run(books, operations, threads):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        controller = build_controller(temp_dir, books)
+        counts, violations, done = [], [], threading.Event()
+
+        def checker():
+            while not done.wait(0.001):
+                book = check_invariant(controller)
+                if book is not None:
+                    violations.append(book)
+
+        watcher = threading.Thread(target=checker)
+        watcher.start()
+        workers = [threading.Thread(target=desk, args=(controller, books, operations // threads, seed, counts))
+                   for seed in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        watcher.join()
+        controller.close()
+
+        on_loan = sum(book.copies - book.available for book in controller.library.get_books())
+        borrowed = sum(count[0] for count in counts)
+        returned = sum(count[1] for count in counts)
+        consistent = not violations and on_loan == borrowed - returned
+        return operations / elapsed, consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=200)
+    parser.add_argument("--operations", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    configure_logging(os.devnull, logging.WARNING)
+
+    print(f"{args.operations} borrow/return operations on {args.books} books")
+    for threads in args.threads:
+        rate, consistent = run(args.books, args.operations, threads)
+        print(f"  {threads:2d} threads: {rate:9.0f} ops/s, invariant {'held' if consistent else 'VIOLATED'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Startup benchmark: how long does importing the core controller take?
+
+Runs ``python -X importtime`` in a fresh interpreter for each target module
+and reports the slowest imports, and fails if pandas or tkinter show up in a
+module graph that should not need them.
+
+    python benchmarks/startup.py [--runs 5] [--top 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS = ["management.LibraryController", "management.SearchStrategy"]
+FORBIDDEN = ("pandas", "tkinter")
+
+
+def import_profile(module):
+    """Return (wall seconds, [(cumulative microseconds, name)]) for importing module."""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        entries.append((int(cumulative), name.strip()))
+    return elapsed, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    failed = False
+    for module in TARGETS:
+        runs = [import_profile(module) for _ in range(args.runs)]
+        wall = statistics.median(elapsed for elapsed, _ in runs)
+        entries = runs[-1][1]
+        own = next((cumulative for cumulative, name in entries if name == module), 0)
+        print(f"{module}: {own / 1000:.1f} ms import, {wall * 1000:.1f} ms interpreter start-to-exit (median of {args.runs})")
+        for cumulative, name in sorted(entries, reverse=True)[:args.top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+        loaded = {name.split(".")[0] for _, name in entries}
+        for heavy in FORBIDDEN:
+            if heavy in loaded:
+                print(f"    ERROR: {heavy} is imported by {module}")
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
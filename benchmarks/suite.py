@@ -0,0 +1,226 @@
+"""Benchmark suite: load, search, loans, popularity and statistics on synthetic catalogs.
+
+    python benchmarks/suite.py run [--sizes 1000 10000 100000] [--repeat 5] [--output results.json]
+    python benchmarks/suite.py compare baseline.json results.json [--threshold 0.10]
+
+"run" generates a deterministic catalog per size (benchmarks/catalog.py,
+cached under --data-dir) and times:
+
+  load.csv / load.snapshot   Library.load_books_from_file, from CSV and from the snapshot
+                             (which only maps the file)
+  load.snapshot_indexed      a snapshot load plus the first query, which builds the indexes
+  search.<Strategy>          find() of each SearchStrategy on the loaded library
+  popular                    Library.get_popular_books
+  loans.csv / .journal / .group_commit
+                             a borrow_book + return_book pair, including persistence in each mode
+  stats.load / stats.save    StatisticsManager.load_data / save_data
+
+Every figure is the median over --repeat runs, in seconds per call. Cases
+that are fast at a size are called many times per run and averaged; full
+CSV saves are slow on big catalogs, so loans.csv does fewer pairs there.
+Sizes up to 10M work, given the memory for the catalog.
+
+"compare" matches two result files by case and size and flags every case
+that got slower by more than --threshold (and by more than --min-seconds,
+to ignore timer noise); it exits with status 1 if any did.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.catalog import QUERIES, cached_catalog
+from files.Log import configure_logging
+from management.library import Library
+from management.LibraryController import LibraryController
+from management.SearchStrategy import (SearchAllBooks, SearchAuthorName, SearchAvailableBooks, SearchBookName,
+                                       SearchBorrowedBooks, SearchCategory)
+from management.StatisticsManager import StatisticsManager
+from users.librarian import LibrarianManager
+
+SEARCHES = [(SearchBookName, QUERIES["title"]), (SearchAuthorName, QUERIES["author"]), (SearchAllBooks, ""),
+            (SearchAvailableBooks, ""), (SearchBorrowedBooks, ""), (SearchCategory, QUERIES["genre"])]
+LOAN_MODES = {"csv": {}, "journal": {"journal": True}, "group_commit": {"group_commit": True}}
+
+
+def measure(func, repeat, number=1):
+    """Median and minimum seconds per call of func over repeat runs of number calls each."""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - started) / number)
+    return statistics.median(runs), min(runs)
+
+
+def calls_for(size, budget=200_000):
+    """How many times to call an O(size) case per run so that one run is not lost in timer noise."""
+    return max(1, budget // size)
+
+
+class Suite:
+    def __init__(self, repeat, operations, data_dir, seed, only=None):
+        self.repeat = repeat
+        self.operations = operations
+        self.data_dir = data_dir
+        self.seed = seed
+        self.only = only
+        self.results = []
+
+    def wanted(self, name):
+        return not self.only or any(name == prefix or name.startswith(prefix + ".") for prefix in self.only)
+
+    def record(self, name, size, func, number=1, repeat=None):
+        if not self.wanted(name):
+            return
+        median, best = measure(func, repeat or self.repeat, number)
+        self.results.append({"name": name, "books": size, "seconds": median, "min_seconds": best,
+                             "runs": repeat or self.repeat, "calls_per_run": number})
+        print(f"  {name:28s} {size:>10d} books  {median * 1000:12.4f} ms  (min {best * 1000:.4f} ms)")
+
+    def run_size(self, size):
+        books_path, statistics_path = cached_catalog(self.data_dir, size, self.seed)
+        with tempfile.TemporaryDirectory() as work_dir:
+            # Cases that write get their own copy of the catalog
+            work_books = shutil.copy(books_path, os.path.join(work_dir, "books.csv"))
+            work_statistics = shutil.copy(statistics_path, os.path.join(work_dir, "statistics.csv"))
+
+            self.record("load.csv", size, lambda: Library(books_path).load_books_from_file())
+            if self.wanted("load.snapshot"):
+                Library(work_books).load_books_from_file(use_snapshot=True)  # Writes the snapshot
+            self.record("load.snapshot", size, lambda: Library(work_books).load_books_from_file(use_snapshot=True))
+            self.record("load.snapshot_indexed", size, lambda: self.load_indexed(work_books))
+
+            library = Library(books_path)
+            library.load_books_from_file()
+            for strategy, query in SEARCHES:
+                self.record(f"search.{strategy.__name__}", size,
+                            lambda strategy=strategy(), query=query: strategy.find(query, library),
+                            number=calls_for(size))
+            self.record("popular", size, library.get_popular_books, number=1000)
+
+            for mode, options in LOAN_MODES.items():
+                if self.wanted(f"loans.{mode}"):
+                    self.run_loans(mode, options, library, size, work_dir, work_books, work_statistics)
+            del library
+
+            self.record("stats.load", size, lambda: StatisticsManager(statistics_path))
+            stat_manager = StatisticsManager(work_statistics)
+            self.record("stats.save", size, stat_manager.save_data)
+
+    @staticmethod
+    def load_indexed(books_path):
+        library = Library(books_path)
+        library.load_books_from_file(use_snapshot=True)
+        library.get_available_books()
+
+    def run_loans(self, mode, options, library, size, work_dir, work_books, work_statistics):
+        # Every full save rewrites the whole file, so plain CSV mode does fewer pairs on big catalogs
+        pairs = self.operations if mode != "csv" else max(2, min(self.operations, 2_000_000 // size))
+        books = library.get_available_books()[:pairs]
+        user = {"name": "Bench Reader", "email": "bench@example.com", "phone": "555-0000000"}
+
+        def loans():
+            controller = LibraryController(library, StatisticsManager(work_statistics), file_path=work_books,
+                                           librarian_manager=LibrarianManager(os.path.join(work_dir, "lib.csv")),
+                                           **options)
+            for number in range(pairs):
+                book = books[number % len(books)]
+                controller.borrow_book(book.title, book.author, user)
+                controller.return_book(book.title, book.author)
+            controller.close()  # Pending group commits and the journal checkpoint count too
+
+        # One run is pairs borrow/return pairs; report seconds per pair
+        median, best = measure(loans, self.repeat)
+        self.results.append({"name": f"loans.{mode}", "books": size, "seconds": median / pairs,
+                             "min_seconds": best / pairs, "runs": self.repeat, "calls_per_run": pairs})
+        print(f"  {'loans.' + mode:28s} {size:>10d} books  {median / pairs * 1000:12.4f} ms  "
+              f"(min {best / pairs * 1000:.4f} ms, {pairs} pairs per run)")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    configure_logging(os.devnull, logging.WARNING)
+    data_dir = args.data_dir or os.path.join(tempfile.gettempdir(), "library-benchmarks")
+    suite = Suite(args.repeat, args.operations, data_dir, args.seed, args.only)
+    for size in args.sizes:
+        print(f"{size} books")
+        suite.run_size(size)
+
+    report = {"meta": {"revision": git_revision(), "python": platform.python_version(),
+                       "platform": platform.platform(), "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "seed": args.seed, "repeat": args.repeat, "sizes": args.sizes},
+              "results": suite.results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = {(entry["name"], entry["books"]): entry for entry in json.load(file)["results"]}
+    with open(args.current, encoding="utf-8") as file:
+        current = json.load(file)["results"]
+
+    regressions = 0
+    for entry in current:
+        before = baseline.get((entry["name"], entry["books"]))
+        if before is None:
+            print(f"  {entry['name']:28s} {entry['books']:>10d} books  new")
+            continue
+        change = entry["seconds"] / before["seconds"] - 1 if before["seconds"] else 0.0
+        slower = change > args.threshold and entry["seconds"] - before["seconds"] > args.min_seconds
+        faster = change < -args.threshold and before["seconds"] - entry["seconds"] > args.min_seconds
+        regressions += slower
+        print(f"  {entry['name']:28s} {entry['books']:>10d} books  {before['seconds'] * 1000:12.4f} ms -> "
+              f"{entry['seconds'] * 1000:12.4f} ms  {change:+7.1%}"
+              + ("  REGRESSION" if slower else "  faster" if faster else ""))
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--operations", type=int, default=200, help="borrow/return pairs per loans run")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--only", nargs="+", help="case names or prefixes, e.g. search loans.journal")
+    run_parser.add_argument("--data-dir", help="where generated catalogs are cached")
+    run_parser.add_argument("--output", help="JSON file for the results")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown to flag")
+    compare_parser.add_argument("--min-seconds", type=float, default=1e-6, help="ignore smaller differences")
+
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,23 @@
 import logging
+import sys
+
+
+def _intern(value):
+    """Share one string object between all books with the same genre or author."""
+    return sys.intern(value) if type(value) is str else value
 
 
 class Book:
+    # No per-instance __dict__: a large catalog keeps millions of these in memory
+    __slots__ = ("title", "author", "year", "copies", "genre", "is_loaned", "available", "request_counter")
+
     def __init__(self, title, author, year, copies, genre, available, is_loaned=False, request_counter=0):
         self.title = title
-        self.author = author
+        self.author = _intern(author)
         self.year = year
         self.copies = copies
-        self.genre = genre
-        self.is_loaned = is_loaned
+        self.genre = _intern(genre)
+        self.is_loaned = bool(is_loaned)  # Always one of the two shared bool objects
         self.available = available  # Available copies
         self.request_counter = request_counter
 
@@ -26,13 +35,14 @@ class Book:
         }
 
     @classmethod
-    def from_dict(cls, data, stat_manager):
-        """Create a Book object from a dictionary using StatisticsManager."""
+    def from_dict(cls, data, stat_manager=None):
+        """Create a Book object from a dictionary, falling back to StatisticsManager for the request count."""
         try:
-            # Generate the book key to fetch request counter dynamically
-            book_key = stat_manager.generate_key(data["title"].strip(), data["author"].strip())
-            request_counter = stat_manager.get_request_count(book_key)
-
+            request_counter = data.get("request_counter", data.get("request_count"))
+            if request_counter in (None, "") and stat_manager is not None:
+                # Fetch the request counter dynamically when the row does not carry one
+                book_key = stat_manager.generate_key(data["title"].strip(), data["author"].strip())
+                request_counter = stat_manager.get_request_count(book_key)
 
             return cls(
                     title=data.get("title"),
@@ -42,7 +52,7 @@ class Book:
                     genre=data.get("genre"),
                     year=int(data.get("year", 0)),
                     available=int(data.get("available", 0)),
-                    request_counter=int(data.get("request_count", 0))  # Map request_count
+                    request_counter=int(request_counter or 0)
                 )
         except (KeyError, ValueError) as e:
             logging.error(f"Invalid book data: {data} - {e}")
@@ -1,24 +1,79 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    datefmt="%m/%d/%Y %I:%M:%S %p",
-    filename=os.path.abspath("../library_log.txt"),
-    filemode="w",
-    force=True
-)
-
-
-def add_log(message, level):
-    if level == "debug":
-        logging.debug(message)
-    elif level == "info":
-        logging.info(message)
-    elif level == "warning":
-        logging.warning(message)
-    elif level == "error":
-        logging.error(message)
-    elif level == "critical":
-        logging.critical(message)
\ No newline at end of file
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+DEFAULT_LOG_FILE = "../library_log.txt"
+LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "critical": logging.CRITICAL
+}
+
+_configured = False
+_listener = None
+
+
+def configure_logging(file_path=DEFAULT_LOG_FILE, level=logging.INFO, asynchronous=False, mode="a", max_bytes=0,
+                      backup_count=5, when=None):
+    """Send log records to the library log file.
+
+    The file is appended to unless mode is "w". It is rotated when it grows past
+    max_bytes, or at the interval given by when ("midnight", "H", ...), keeping
+    backup_count old files. With asynchronous=True callers only put records on
+    a queue and a QueueListener thread writes them, so file I/O stays off the
+    calling thread.
+
+    Nothing is configured at import time; the first add_log call does it with
+    the defaults unless the application has called this function first.
+    """
+    global _configured, _listener
+    stop_logging()
+    file_path = os.path.abspath(file_path)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(file_path, when=when, backupCount=backup_count,
+                                                            encoding="utf-8")
+    elif max_bytes:
+        handler = logging.handlers.RotatingFileHandler(file_path, mode=mode, maxBytes=max_bytes,
+                                                       backupCount=backup_count, encoding="utf-8")
+    else:
+        handler = logging.FileHandler(file_path, mode=mode, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+
+    if asynchronous:
+        records = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, handler)
+        _listener.start()
+        handler = logging.handlers.QueueHandler(records)
+    logging.basicConfig(level=level, handlers=[handler], force=True)
+    _configured = True
+
+
+def stop_logging():
+    """Write out queued records and stop the background listener, if there is one."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def add_log(message, level, *args):
+    """Log message at level ("debug", "info", ...).
+
+    Pass values as %-style args instead of formatting them into message, and
+    the string is only built if the level is enabled.
+    """
+    if level not in LEVELS:
+        return
+    if not _configured:
+        configure_logging()
+    logging.log(LEVELS[level], message, *args)
@@ -1,48 +1,93 @@
-from management.StatisticsManager import StatisticsManager
-from management.LibraryController import LibraryController
-from management.library import Library
-from users.librarian import LibrarianManager
-from management.gui import LibraryGUI
+from management.ComponentRegistry import get_registry
+from management.LibraryClient import RemoteController
+from management.LibraryServer import LibraryServer
+from management.NotificationOutbox import NotificationOutbox, NotificationDispatcher, ObserverTransport
+import argparse
 import logging
 import os
-from files.Log import add_log
+from files.Log import add_log, configure_logging, stop_logging
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Library Management System")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--serve", metavar="HOST:PORT", nargs="?", const="127.0.0.1:8765",
+                      help="host the catalog for other desks instead of opening the GUI")
+    mode.add_argument("--connect", metavar="HOST:PORT",
+                      help="open the GUI on a catalog hosted by another process with --serve")
+    mode.add_argument("--shared", action="store_true",
+                      help="several desks run on the same files: merge their saves and reload their changes")
+    return parser.parse_args()
+
+
+def split_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
 
 
 # Initialize system components
 def main():
-    add_log("Initializing Library System...","info")
-
+    args = parse_args()
     # File paths
     books_file_path = os.path.abspath("../files/books.csv")
     statistics_file = os.path.abspath("../files/statistics.csv")
-    librarian_file = os.path.abspath("../files/librarian.csv")
+    librarian_file = os.path.abspath("../files/librarians.csv")
     log_file_path = os.path.abspath("../library_log.txt")
+    outbox_file = os.path.abspath("../files/notifications.jsonl")
 
-    os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
-    logging.basicConfig(
-        filename=log_file_path,
-        level=logging.DEBUG,  # Change to INFO or WARNING in production
-        format="%(asctime)s - %(levelname)s - %(message)s"
-    )
+    # Records are written by a background thread; the log rotates at 5 MB
+    configure_logging(log_file_path, logging.INFO, asynchronous=True, max_bytes=5 * 1024 * 1024)  # Change to DEBUG while troubleshooting
+    add_log("Initializing Library System...","info")
     add_log("Logging setup complete. Application starting.","info")
 
+    if args.connect:
+        # The desk keeps no catalog of its own: every call goes to the server
+        from management.gui import LibraryGUI  # tkinter is only imported by the modes that open a window
+        controller = RemoteController(*split_address(args.connect))
+        add_log("Starting the Library Management GUI against %s...", "info", args.connect)
+        LibraryGUI(controller).run()
+        stop_logging()
+        return
+
     # Initialize components
-    library = Library(books_file_path)  # Manage books
-    statistics_manager = StatisticsManager()  # Manage waitlists and request counts
-    librarian_manager = LibrarianManager(librarian_file)  # Manage librarians
+    outbox = NotificationOutbox(outbox_file)  # Waitlist notifications waiting for delivery
+    registry = get_registry(books_file=books_file_path, statistics_file=statistics_file,
+                            librarians_file=librarian_file, outbox=outbox)
+    library = registry.library  # Manage books
+    statistics_manager = registry.statistics_manager  # Manage waitlists and request counts
+    librarian_manager = registry.librarian_manager  # Manage librarians, subscribed to waitlist notifications
+    dispatcher = NotificationDispatcher(outbox, [ObserverTransport(statistics_manager)]).start()
 
     # Load books into the library from CSV
-    library.load_books_from_file()
+    library.load_books_from_file(use_snapshot=True)
     add_log("Books loaded successfully from file.", "info")
 
 
-    # Create the controller and GUI
-    controller = LibraryController(library, statistics_manager, file_path=books_file_path)
-    gui = LibraryGUI(controller)
+    if args.serve:
+        # One warm catalog for every desk; concurrent requests need the thread-safe controller
+        controller = registry.create_controller(journal=True, thread_safe=True)
+        host, port = split_address(args.serve)
+        try:
+            LibraryServer(controller, host, port).serve_forever()
+        finally:
+            controller.close()
+    elif args.shared:
+        # No journal: every change is saved straight to the shared books.csv, merged with the other desks' saves
+        from management.gui import LibraryGUI
+        controller = registry.create_controller(watch_files=True, require_session=True)
+        add_log("Starting the Library Management GUI on shared files...", "info")
+        LibraryGUI(controller, reload_interval=2000).run()
+    else:
+        # Create the controller and GUI
+        from management.gui import LibraryGUI
+        controller = registry.create_controller(journal=True, require_session=True)
+        gui = LibraryGUI(controller)
 
-    # Run the GUI
-    add_log("Starting the Library Management GUI...", "info")
-    gui.run()
+        # Run the GUI
+        add_log("Starting the Library Management GUI...", "info")
+        gui.run()
+    dispatcher.stop()
+    stop_logging()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,201 @@
+import csv
+import json
+from collections import deque
+
+from books.book import Book
+from management.Metrics import timed
+
+
+class LoadError:
+    """A row that could not be turned into a book."""
+    __slots__ = ("line_number", "row", "message")
+
+    def __init__(self, line_number, row, message):
+        self.line_number = line_number
+        self.row = row
+        self.message = message
+
+    def __repr__(self):
+        return f"LoadError(line {self.line_number}: {self.message} - {self.row!r})"
+
+
+def parse_book_row(row, columns):
+    """Build a Book from one CSV record; raises ValueError on missing or malformed fields."""
+    if len(row) != len(columns):
+        raise ValueError(f"expected {len(columns)} fields, got {len(row)}")
+    data = dict(zip(columns, row))
+    try:
+        available = int(data["available"])
+        return Book(
+            title=data["title"],
+            author=data["author"],
+            is_loaned=available == 0,  # is_loaned is derived from the available copies
+            copies=int(data["copies"]),
+            genre=data["genre"],
+            year=int(data["year"]),
+            available=available,
+            request_counter=int(data.get("request_counter") or 0)
+        )
+    except KeyError as e:
+        raise ValueError(f"missing column {e}") from None
+
+
+IMPORT_FIELDS = ("title", "author", "copies", "genre", "year")
+
+
+def parse_import_record(data):
+    """Build a new Book from an import record (a dict of IMPORT_FIELDS); raises ValueError if it is invalid."""
+    if not isinstance(data, dict):
+        raise ValueError("not a record")
+    missing = [field for field in IMPORT_FIELDS if str(data.get(field) or "").strip() == ""]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    try:
+        copies, year = int(data["copies"]), int(data["year"])
+    except (TypeError, ValueError):
+        raise ValueError("copies and year must be integers") from None
+    if copies < 0:
+        raise ValueError("copies must not be negative")
+    return Book(
+        title=str(data["title"]).strip(),
+        author=str(data["author"]).strip(),
+        year=year,
+        copies=copies,
+        genre=str(data["genre"]).strip(),
+        available=copies
+    )
+
+
+def iter_import_records(file_path):
+    """Yield (line_number, record) from a CSV file with a header or a JSON lines (.jsonl) file.
+
+    A JSON line that does not parse is yielded as its raw text, so it is
+    reported by parse_import_record like any other invalid record.
+    """
+    with open(file_path, "r", encoding="utf-8", newline="") as file:
+        if str(file_path).lower().endswith((".jsonl", ".json")):
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, line.rstrip("\n")
+        else:
+            reader = csv.DictReader(file)
+            reader.fieldnames = [name.strip() for name in reader.fieldnames or []]
+            for record in reader:
+                yield reader.line_num, record
+
+
+class ImportReport:
+    """Outcome of a bulk import: how many books were added and the rows that were rejected."""
+
+    def __init__(self, max_errors=1000):
+        self.added = 0
+        self.errors = []  # LoadError entries, up to max_errors
+        self.error_count = 0
+        self.elapsed = 0.0  # Seconds
+        self.max_errors = max_errors
+
+    def reject(self, line_number, row, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(LoadError(line_number, row, message))
+
+    @property
+    def rate(self):
+        """Books added per second."""
+        return self.added / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"ImportReport(added={self.added}, rejected={self.error_count}, "
+                f"elapsed={self.elapsed:.3f}s, rate={self.rate:.0f}/s)")
+
+
+@timed("loader.parse_chunk")
+def _parse_chunk(chunk, columns):
+    """Parse (line_number, row) pairs; runs in worker processes when loading in parallel."""
+    books, errors = [], []
+    for line_number, row in chunk:
+        try:
+            books.append(parse_book_row(row, columns))
+        except ValueError as e:
+            errors.append(LoadError(line_number, row, str(e)))
+    return books, errors
+
+
+class BookLoader:
+    """Streaming, quote-aware loader for books.csv.
+
+    Rows are read with the csv module, so quoted titles may contain commas,
+    and parsed ``chunk_size`` rows at a time; with ``workers`` > 1 chunks are
+    parsed in a process pool with a bounded number in flight. Only one chunk
+    (or a few, in parallel mode) is held in memory at a time. Rejected rows
+    are collected in ``errors`` (up to ``max_errors``) instead of being printed.
+    """
+
+    def __init__(self, file_path, chunk_size=10000, workers=0, max_errors=1000):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.max_errors = max_errors
+        self.errors = []
+        self.error_count = 0
+        self.loaded = 0
+
+    def __iter__(self):
+        return self.iter_books()
+
+    def iter_books(self):
+        """Yield the books of the file one at a time."""
+        for books in self.iter_chunks():
+            yield from books
+
+    def iter_chunks(self):
+        """Yield the books of the file as lists of at most chunk_size books."""
+        self.errors, self.error_count, self.loaded = [], 0, 0
+        with open(self.file_path, "r", encoding="utf-8", newline="") as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if header is None:
+                return
+            columns = [column.strip() for column in header]
+            chunks = self._read_chunks(reader)
+            if self.workers and self.workers > 1:
+                yield from self._parse_parallel(chunks, columns)
+            else:
+                for chunk in chunks:
+                    yield self._collect(*_parse_chunk(chunk, columns))
+
+    def _read_chunks(self, reader):
+        chunk = []
+        for row in reader:
+            if not row:
+                continue  # Blank line
+            chunk.append((reader.line_num, row))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _parse_parallel(self, chunks, columns):
+        # Imported here: concurrent.futures.process (multiprocessing) is slow to import and only needed by big loads
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_parse_chunk, chunk, columns))
+                # Keep a bounded number of chunks in flight so memory does not grow with the file
+                if len(pending) >= self.workers * 2:
+                    yield self._collect(*pending.popleft().result())
+            while pending:
+                yield self._collect(*pending.popleft().result())
+
+    def _collect(self, books, errors):
+        self.loaded += len(books)
+        self.error_count += len(errors)
+        self.errors.extend(errors[:max(0, self.max_errors - len(self.errors))])
+        return books
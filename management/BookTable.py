@@ -0,0 +1,132 @@
+from management.Metrics import timed
+from management.StatisticsManager import StatisticsManager
+
+
+def book_row(book):
+    """Treeview values of a book in the main book list."""
+    return (book.title, book.author, "yes" if book.is_loaned else "no", book.copies, book.genre, book.year,
+            book.available, book.request_counter)
+
+
+class VirtualBookTable:
+    """Shows a book list in a ttk.Treeview one page at a time.
+
+    Only the ``page_size`` rows in view exist in the Treeview, with the book
+    key as item ID, so a catalog of any size costs one page of widgets. Every
+    update is a diff against what is on screen: rows that left the page are
+    deleted, new ones inserted, and rows whose values changed are updated in
+    place. The scrollbar is driven by the position in the full list.
+    """
+
+    def __init__(self, tree, scrollbar=None, page_size=30, row=book_row):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.row = row
+        self.books = []  # The full list being shown
+        self.first = 0  # Index in books of the top row on screen
+        self.rendered = {}  # item ID -> values currently in the tree
+        self.order = []  # item IDs in on-screen order
+
+        tree.configure(height=page_size)
+        if scrollbar is not None:
+            scrollbar.configure(command=self.yview)
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", self._on_wheel)
+        tree.bind("<Button-5>", self._on_wheel)
+        tree.bind("<Up>", self._on_key)
+        tree.bind("<Down>", self._on_key)
+        tree.bind("<Prior>", lambda event: self.yview("scroll", -1, "pages"))
+        tree.bind("<Next>", lambda event: self.yview("scroll", 1, "pages"))
+
+    def __len__(self):
+        return len(self.books)
+
+    def show(self, books, keep_position=True):
+        """Display a new list of books, from the top or keeping the scroll position where possible."""
+        self.books = books if isinstance(books, list) else list(books)
+        if not keep_position:
+            self.first = 0
+        self.render()
+
+    def refresh(self):
+        """Redraw the page from the current state of the books, e.g. after a borrow or return."""
+        self.render()
+
+    def clear(self):
+        self.show([])
+
+    def scroll_to(self, first):
+        self.first = first
+        self.render()
+
+    def yview(self, *args):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", count, "units" | "pages")."""
+        if not args:
+            return self._fractions()
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.books)))
+        elif args[0] == "scroll":
+            step = self.page_size if args[2] == "pages" else 1
+            self.scroll_to(self.first + int(args[1]) * step)
+        return "break"
+
+    def key(self, book):
+        key = getattr(book, "_key", None)  # BookRow views know their key
+        return key if key is not None else StatisticsManager.generate_key(book.title, book.author)
+
+    @timed("gui.render")
+    def render(self):
+        self.first = max(0, min(self.first, len(self.books) - self.page_size))
+        page = [(self.key(book), tuple(self.row(book)))
+                for book in self.books[self.first:self.first + self.page_size]]
+        wanted = {item_id for item_id, _ in page}
+
+        stale = [item_id for item_id in self.order if item_id not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+            for item_id in stale:
+                del self.rendered[item_id]
+            self.order = [item_id for item_id in self.order if item_id in wanted]
+
+        for index, (item_id, values) in enumerate(page):
+            if item_id not in self.rendered:
+                self.tree.insert("", index, iid=item_id, values=values)
+                self.order.insert(index, item_id)
+            else:
+                if self.rendered[item_id] != values:
+                    self.tree.item(item_id, values=values)
+                if self.order[index] != item_id:
+                    self.tree.move(item_id, "", index)
+                    self.order.remove(item_id)
+                    self.order.insert(index, item_id)
+            self.rendered[item_id] = values
+
+        if self.scrollbar is not None:
+            self.scrollbar.set(*self._fractions())
+
+    def _fractions(self):
+        if not self.books:
+            return 0.0, 1.0
+        return self.first / len(self.books), min(1.0, (self.first + self.page_size) / len(self.books))
+
+    def _on_wheel(self, event):
+        up = getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0
+        return self.yview("scroll", -3 if up else 3, "units")
+
+    def _on_key(self, event):
+        # Arrow keys move the selection inside the page; at its edges they scroll instead
+        focus = self.tree.focus()
+        if not self.order or focus not in self.rendered:
+            return None
+        index = self.order.index(focus)
+        step = -1 if event.keysym == "Up" else 1
+        if 0 <= index + step < len(self.order):
+            return None
+        before = self.first
+        self.scroll_to(self.first + step)
+        if self.first != before:
+            item_id = self.order[index]
+            self.tree.selection_set(item_id)
+            self.tree.focus(item_id)
+        return "break"
@@ -0,0 +1,312 @@
+import mmap
+import operator
+import os
+import struct
+from collections.abc import MutableMapping
+
+from books.book import Book
+from files.Log import add_log
+
+
+class CatalogSnapshot:
+    """Memory-mapped binary snapshot of the catalog, written beside books.csv.
+
+    Layout (little-endian):
+      header   magic, book count, section offsets and the mtime/size of the CSV it was built from
+      records  one fixed-width record per book in catalog order: year, copies, available,
+               request_counter, is_loaned and (offset, length) references for title, author,
+               genre and book key into the string heap
+      keys     row numbers sorted by book key, for binary search without decoding the catalog
+      heap     UTF-8 strings, each distinct string stored once
+
+    Opening a snapshot decodes nothing: ``snapshot[row]`` and ``snapshot.get(book_key)``
+    materialize a single Book straight from the mapping, and ``iter_fields``
+    walks the records decoding only the fields asked for.
+    """
+    MAGIC = b"LIBSNAP1"
+    HEADER = struct.Struct("<8sQQQQqQ")  # magic, count, records, keys, heap, csv mtime_ns, csv size
+    RECORD = struct.Struct("<iiiqB" + "QI" * 4)
+    KEY = struct.Struct("<I")
+    FIELDS = {"year": 0, "copies": 1, "available": 2, "request_counter": 3, "is_loaned": 4, "title": 5,
+              "author": 7, "genre": 9}  # Position in a record; strings are (offset, length) pairs
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with open(file_path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, self.count, self._records, self._keys, self._heap, self.source_mtime_ns, self.source_size = \
+                self.HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            magic = None
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"{file_path} is not a catalog snapshot.")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.count:
+            raise IndexError(row)
+        return self._book(self.RECORD.unpack_from(self._map, self._records + row * self.RECORD.size))
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def is_fresh(self, source_path):
+        """True if the snapshot was built from the current version of source_path."""
+        try:
+            stat = os.stat(source_path)
+        except FileNotFoundError:
+            return False
+        return stat.st_mtime_ns == self.source_mtime_ns and stat.st_size == self.source_size
+
+    def key(self, row):
+        offset, length = self.RECORD.unpack_from(self._map, self._records + row * self.RECORD.size)[-2:]
+        return self._string(offset, length)
+
+    def get(self, book_key, default=None):
+        """Find a book by key with a binary search over the sorted key table."""
+        row = self.row(book_key)
+        return default if row is None else self[row]
+
+    def row(self, book_key):
+        """The row of book_key, or None if the snapshot does not hold it."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            row = self.KEY.unpack_from(self._map, self._keys + middle * self.KEY.size)[0]
+            key = self.key(row)
+            if key == book_key:
+                return row
+            if key < book_key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def iter_fields(self, *fields):
+        """Yield (book_key, *values) for every record in catalog order, decoding only the named fields."""
+        shared = {}  # Authors and genres repeat; decode each distinct one once
+
+        def shared_string(offset, length):
+            value = shared.get(offset)
+            if value is None:
+                value = shared[offset] = self._string(offset, length)
+            return value
+
+        def string_getter(position, decode):
+            return lambda record: decode(record[position], record[position + 1])
+
+        getters = []
+        for field in fields:
+            position = self.FIELDS[field]
+            if field == "title":
+                getters.append(string_getter(position, self._string))
+            elif field in ("author", "genre"):
+                getters.append(string_getter(position, shared_string))
+            elif field == "is_loaned":
+                getters.append(lambda record: bool(record[4]))
+            else:
+                getters.append(operator.itemgetter(position))
+
+        records = memoryview(self._map)[self._records:self._records + self.count * self.RECORD.size]
+        try:
+            for record in self.RECORD.iter_unpack(records):
+                yield (self._string(record[11], record[12]), *[getter(record) for getter in getters])
+        finally:
+            records.release()
+
+    def iter_books(self):
+        """Yield (book_key, Book) for every record, in catalog order."""
+        strings = {}  # Decode each distinct heap string once
+
+        def string(offset, length):
+            value = strings.get(offset)
+            if value is None:
+                value = strings[offset] = self._string(offset, length)
+            return value
+
+        records = memoryview(self._map)[self._records:self._records + self.count * self.RECORD.size]
+        try:
+            for (year, copies, available, request_counter, is_loaned, title_offset, title_length,
+                 author_offset, author_length, genre_offset, genre_length, key_offset, key_length) \
+                    in self.RECORD.iter_unpack(records):
+                yield string(key_offset, key_length), Book(
+                    title=self._string(title_offset, title_length),
+                    author=string(author_offset, author_length),
+                    is_loaned=bool(is_loaned),
+                    copies=copies,
+                    genre=string(genre_offset, genre_length),
+                    year=year,
+                    available=available,
+                    request_counter=request_counter
+                )
+        finally:
+            records.release()
+
+    def _string(self, offset, length):
+        start = self._heap + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def _book(self, record):
+        (year, copies, available, request_counter, is_loaned, title_offset, title_length,
+         author_offset, author_length, genre_offset, genre_length, _, _) = record
+        return Book(
+            title=self._string(title_offset, title_length),
+            author=self._string(author_offset, author_length),
+            is_loaned=bool(is_loaned),
+            copies=copies,
+            genre=self._string(genre_offset, genre_length),
+            year=year,
+            available=available,
+            request_counter=request_counter
+        )
+
+    @classmethod
+    def write(cls, library, file_path, source_path=None):
+        """Write the library to file_path, stamped with the mtime and size of source_path."""
+        heap = bytearray()
+        offsets = {}  # string -> heap offset, so repeated authors and genres are stored once
+
+        def intern(value):
+            data = str(value).encode("utf-8")
+            offset = offsets.get(data)
+            if offset is None:
+                offset = offsets[data] = len(heap)
+                heap.extend(data)
+            return offset, len(data)
+
+        records = bytearray()
+        keys = []
+        for row, (book_key, book) in enumerate(library.books.items()):
+            records += cls.RECORD.pack(book.year, book.copies, book.available, book.request_counter,
+                                       bool(book.is_loaned), *intern(book.title), *intern(book.author),
+                                       *intern(book.genre), *intern(book_key))
+            keys.append((book_key, row))
+        keys.sort()
+        key_table = b"".join(cls.KEY.pack(row) for _, row in keys)
+
+        stat = os.stat(source_path) if source_path else None
+        records_offset = cls.HEADER.size
+        keys_offset = records_offset + len(records)
+        heap_offset = keys_offset + len(key_table)
+        header = cls.HEADER.pack(cls.MAGIC, len(keys), records_offset, keys_offset, heap_offset,
+                                 stat.st_mtime_ns if stat else 0, stat.st_size if stat else 0)
+
+        # Write next to the target and rename, so readers never map a half-written snapshot
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(header)
+            file.write(records)
+            file.write(key_table)
+            file.write(heap)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, file_path)
+        add_log(f"Wrote catalog snapshot of {len(keys)} books to {file_path}.", "info")
+
+
+class SnapshotBooks(MutableMapping):
+    """Mapping of book key -> Book served from an open CatalogSnapshot, standing in for Library.books.
+
+    A lookup decodes one record and keeps the Book, so changes made to it
+    stick. Iterating decodes the records it has not kept on the fly and
+    drops them again. Books stored later live in memory on top of the
+    snapshot, and removed records are hidden.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.loaded = {}  # book key -> Book that replaces its record
+        self.removed = set()  # Keys of records that were removed
+        self.added = {}  # book key -> Book without a live record, after the records in insertion order
+
+    def __getitem__(self, book_key):
+        book = self.added.get(book_key)
+        if book is None:
+            book = self.loaded.get(book_key)
+        if book is not None:
+            return book
+        row = None if book_key in self.removed else self.snapshot.row(book_key)
+        if row is None:
+            raise KeyError(book_key)
+        # setdefault: readers racing on the same record all get the Book that was kept
+        return self.loaded.setdefault(book_key, self.snapshot[row])
+
+    def __setitem__(self, book_key, book):
+        if book_key in self.added or not self._has_record(book_key):
+            self.added[book_key] = book
+        else:
+            self.loaded[book_key] = book
+
+    def __delitem__(self, book_key):
+        if book_key in self.added:
+            del self.added[book_key]
+        elif self._has_record(book_key):
+            self.loaded.pop(book_key, None)
+            self.removed.add(book_key)
+        else:
+            raise KeyError(book_key)
+
+    def __contains__(self, book_key):
+        return book_key in self.added or self._has_record(book_key)
+
+    def __len__(self):
+        return len(self.snapshot) - len(self.removed) + len(self.added)
+
+    def __iter__(self):
+        for book_key, in self.snapshot.iter_fields():
+            if book_key not in self.removed:
+                yield book_key
+        yield from list(self.added)
+
+    def items(self):
+        loaded, removed = self.loaded, self.removed
+        for book_key, book in self.snapshot.iter_books():
+            if book_key not in removed:
+                yield book_key, loaded.get(book_key, book)
+        yield from list(self.added.items())
+
+    def values(self):
+        return (book for _, book in self.items())
+
+    def get_at(self, book_key, position):
+        """Like self[book_key], for a key whose position (see iter_positions) is known: no key search needed."""
+        if position >= len(self.snapshot) or book_key in self.added:
+            return self.added[book_key]
+        book = self.loaded.get(book_key)
+        if book is None:
+            book = self.loaded.setdefault(book_key, self.snapshot[position])
+        return book
+
+    def iter_positions(self, *fields):
+        """Yield (position, book_key, *values) of every book, with the changes made since the snapshot was taken.
+
+        The position of a record is its row; added books come after them, numbered from len(snapshot).
+        """
+        loaded, removed = self.loaded, self.removed
+        for row, (book_key, *values) in enumerate(self.snapshot.iter_fields(*fields)):
+            if book_key in removed:
+                continue
+            book = loaded.get(book_key)
+            if book is not None:
+                values = [getattr(book, field) for field in fields]
+            yield (row, book_key, *values)
+        for position, (book_key, book) in enumerate(list(self.added.items()), len(self.snapshot)):
+            yield (position, book_key, *[getattr(book, field) for field in fields])
+
+    def iter_fields(self, *fields):
+        """Like CatalogSnapshot.iter_fields, with the changes made since the snapshot was taken."""
+        return (values for _, *values in self.iter_positions(*fields))
+
+    def _has_record(self, book_key):
+        # A live record: kept in memory, or in the snapshot and not removed
+        return book_key in self.loaded or (book_key not in self.removed and self.snapshot.row(book_key) is not None)
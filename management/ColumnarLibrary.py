@@ -0,0 +1,266 @@
+import numpy as np
+
+from books.book import Book
+from management.library import Library
+from management.StatisticsManager import StatisticsManager
+
+
+class BookRow(Book):
+    """Lightweight view of one catalog row; reads and writes go straight to the columns."""
+    __slots__ = ("_library", "_key")
+
+    def __init__(self, library, book_key):
+        self._library = library
+        self._key = book_key
+
+    def _column(name):
+        def getter(self):
+            library = self._library
+            return getattr(library, name)[library.rows[self._key]].item()
+
+        def setter(self, value):
+            library = self._library
+            getattr(library, name)[library.rows[self._key]] = value
+
+        return property(getter, setter)
+
+    year = _column("years")
+    copies = _column("copies")
+    available = _column("available")
+    request_counter = _column("request_counters")
+    is_loaned = _column("is_loaned")
+    del _column
+
+    @property
+    def title(self):
+        return self._library.title_at(self._library.rows[self._key])
+
+    @property
+    def author(self):
+        library = self._library
+        return library.authors[library.author_codes[library.rows[self._key]]]
+
+    @property
+    def genre(self):
+        library = self._library
+        return library.genres[library.genre_codes[library.rows[self._key]]]
+
+    def __eq__(self, other):
+        if isinstance(other, BookRow):
+            return self._library is other._library and self._key == other._key
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self._library), self._key))
+
+
+class BookRows:
+    """Read-only mapping of book key -> BookRow, standing in for Library.books."""
+
+    def __init__(self, library):
+        self._library = library
+
+    def __getitem__(self, book_key):
+        if book_key not in self._library.rows:
+            raise KeyError(book_key)
+        return BookRow(self._library, book_key)
+
+    def __contains__(self, book_key):
+        return book_key in self._library.rows
+
+    def __len__(self):
+        return len(self._library.rows)
+
+    def __iter__(self):
+        return (book_key for book_key in self._library.keys[:self._library.size] if book_key is not None)
+
+    def get(self, book_key, default=None):
+        return self[book_key] if book_key in self else default
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [BookRow(self._library, book_key) for book_key in self]
+
+    def items(self):
+        return [(book_key, BookRow(self._library, book_key)) for book_key in self]
+
+
+class ColumnarLibrary(Library):
+    """Library that keeps the catalog in NumPy columns instead of a dict of Book objects.
+
+    Numeric fields live in typed arrays, genres and authors as categorical codes,
+    and titles as UTF-8 packed into one buffer addressed by per-row offsets, so
+    a book holds no Python objects besides its key. Filters and the popularity ranking
+    run as vectorized masks; ``books`` and ``get_books()`` hand out BookRow views,
+    so the controller and the search strategies work unchanged.
+    """
+    lazy_snapshot = False  # The columns are filled from the snapshot up front
+
+    def __init__(self, file_path=None, popular_k=10, capacity=1024):
+        super().__init__(file_path, popular_k)
+        self.books = BookRows(self)
+        self.rows = {}  # book key -> row
+        self.order = self.rows  # Rows stay in catalog order, so they double as the insertion order
+        self.size = 0  # Rows in use, including removed ones until the next compaction
+        self.removed = 0
+        self.keys = [None] * capacity
+        self.title_data = bytearray()  # UTF-8 titles back to back; replaced titles stay until the next compaction
+        self.genres = []  # Genre code -> genre
+        self.genre_lookup = {}  # Genre -> genre code
+        self.authors = []  # Author code -> author
+        self.author_lookup = {}  # Author -> author code
+        self.title_starts = np.zeros(capacity, dtype=np.int64)
+        self.title_lengths = np.zeros(capacity, dtype=np.int32)
+        self.years = np.zeros(capacity, dtype=np.int32)
+        self.copies = np.zeros(capacity, dtype=np.int32)
+        self.available = np.zeros(capacity, dtype=np.int32)
+        self.request_counters = np.zeros(capacity, dtype=np.int64)
+        self.is_loaned = np.zeros(capacity, dtype=np.bool_)
+        self.genre_codes = np.zeros(capacity, dtype=np.int32)
+        self.author_codes = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=np.bool_)
+
+    _COLUMNS = ("title_starts", "title_lengths", "years", "copies", "available", "request_counters", "is_loaned",
+                "genre_codes", "author_codes", "alive")
+
+    def title_at(self, row):
+        start = self.title_starts[row]
+        return self.title_data[start:start + self.title_lengths[row]].decode("utf-8")
+
+    def add_book(self, book, book_key=None):
+        if not isinstance(book, Book):
+            raise TypeError(f"Expected a Book object, but got {type(book).__name__}")
+        if book_key is None:
+            book_key = StatisticsManager.generate_key(book.title, book.author)
+        # Read every field first: book may be a view of the row that is about to be overwritten
+        values = (book.title, book.author, book.year, book.copies, book.available, book.request_counter,
+                  book.is_loaned, book.genre)
+        title, author, year, copies, available, request_counter, is_loaned, genre = values
+
+        row = self.rows.get(book_key)
+        if row is None:
+            if self.size == len(self.keys):
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.rows[book_key] = row
+            self.keys[row] = book_key
+            self._set_title(row, title)
+        elif title != self.title_at(row):
+            self._set_title(row, title)
+
+        if genre not in self.genre_lookup:
+            self.genre_lookup[genre] = len(self.genres)
+            self.genres.append(genre)
+        if author not in self.author_lookup:
+            self.author_lookup[author] = len(self.authors)
+            self.authors.append(author)
+        self.years[row] = year
+        self.copies[row] = copies
+        self.available[row] = available
+        self.request_counters[row] = request_counter
+        self.is_loaned[row] = is_loaned
+        self.genre_codes[row] = self.genre_lookup[genre]
+        self.author_codes[row] = self.author_lookup[author]
+        self.alive[row] = True
+        self._index_text(book_key, title, author)
+
+    def remove_book(self, book_key):
+        row = self.rows.pop(book_key)
+        self.alive[row] = False
+        self.keys[row] = None
+        self._unindex_text(book_key)
+        self.removed += 1
+        if self.removed > 1024 and self.removed * 2 > self.size:
+            self._compact()
+
+    def update_book_state(self, book_key):
+        # The columns are the only copy of the data, so there is nothing to refresh
+        pass
+
+    def get_books(self):
+        return self.books.values()
+
+    def get_genres(self):
+        counts = np.bincount(self.genre_codes[:self.size][self.alive[:self.size]], minlength=len(self.genres))
+        return [self.genres[code] for code in np.flatnonzero(counts)]
+
+    def get_books_by_genre(self, genre):
+        code = self.genre_lookup.get(genre)
+        if code is None:
+            return []
+        return self._books_where(self.genre_codes[:self.size] == code)
+
+    def get_available_books(self):
+        return self._books_where(self.available[:self.size] > 0)
+
+    def get_loaned_books(self):
+        return self._books_where(self.is_loaned[:self.size])
+
+    def get_books_by_year(self, first_year, last_year):
+        years = self.years[:self.size]
+        return self._books_where((years >= first_year) & (years <= last_year))
+
+    def get_popular_books(self, genre=None):
+        """Return the popular_k most requested books; ties keep catalog order."""
+        mask = self.alive[:self.size].copy()
+        if genre is not None:
+            code = self.genre_lookup.get(genre)
+            if code is None:
+                return []
+            mask &= self.genre_codes[:self.size] == code
+        rows = np.flatnonzero(mask)
+        counts = self.request_counters[rows]
+        k = self.popular_k
+        if len(rows) > k:
+            # argpartition finds the k-th best count; every row above it is in, ties are filled in row order
+            threshold = counts[np.argpartition(-counts, k - 1)[k - 1]]
+            above = np.flatnonzero(counts > threshold)
+            tied = np.flatnonzero(counts == threshold)[:k - len(above)]
+            selected = np.concatenate((above, tied))
+            rows, counts = rows[selected], counts[selected]
+        order = np.lexsort((rows, -counts))
+        return [BookRow(self, self.keys[row]) for row in rows[order]]
+
+    def _books_where(self, mask):
+        rows = np.flatnonzero(mask & self.alive[:self.size])
+        return [BookRow(self, self.keys[row]) for row in rows]
+
+    def _grow(self):
+        capacity = len(self.keys) * 2
+        extra = capacity - len(self.keys)
+        self.keys.extend([None] * extra)
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _set_title(self, row, title):
+        encoded = title.encode("utf-8")
+        self.title_starts[row] = len(self.title_data)
+        self.title_lengths[row] = len(encoded)
+        self.title_data += encoded
+
+    def _compact(self):
+        """Drop removed rows and unused titles and authors, keeping the remaining rows in catalog order."""
+        live = np.flatnonzero(self.alive[:self.size])
+        titles = [self.title_at(row) for row in live]
+        used, self.author_codes[live] = np.unique(self.author_codes[live], return_inverse=True)
+        self.authors = [self.authors[code] for code in used]
+        self.author_lookup = {author: code for code, author in enumerate(self.authors)}
+        capacity = len(self.keys)
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            compacted = np.zeros(capacity, dtype=column.dtype)
+            compacted[:len(live)] = column[live]
+            setattr(self, name, compacted)
+        self.keys = [self.keys[row] for row in live] + [None] * (capacity - len(live))
+        self.title_data = bytearray()
+        for row, title in enumerate(titles):
+            self._set_title(row, title)
+        self.rows = self.order = {book_key: row for row, book_key in enumerate(self.keys[:len(live)])}
+        self.size = len(live)
+        self.removed = 0
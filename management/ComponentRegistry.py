@@ -0,0 +1,79 @@
+import os
+import threading
+
+from management.library import Library
+from management.LibraryController import LibraryController
+from management.StatisticsManager import StatisticsManager
+from users.librarian import LibrarianManager
+
+
+class ComponentRegistry:
+    """Owns the one Library, StatisticsManager and LibrarianManager of the process.
+
+    Components are created on first use and wired together once: the
+    LibrarianManager subscribes its librarians to the StatisticsManager, so
+    nothing builds a second manager (and re-reads statistics.csv) just to
+    register observers. Pre-built components can be handed in instead.
+    """
+
+    def __init__(self, books_file=os.path.abspath("../files/books.csv"),
+                 statistics_file=os.path.abspath("../files/statistics.csv"),
+                 librarians_file=os.path.abspath("../files/librarians.csv"), outbox=None, library=None,
+                 statistics_manager=None, librarian_manager=None):
+        self.books_file = books_file
+        self.statistics_file = statistics_file
+        self.librarians_file = librarians_file
+        self.outbox = outbox
+        self._library = library
+        self._statistics_manager = statistics_manager
+        self._librarian_manager = librarian_manager
+        self._lock = threading.RLock()
+
+    @property
+    def library(self):
+        with self._lock:
+            if self._library is None:
+                self._library = Library(self.books_file)
+            return self._library
+
+    @property
+    def statistics_manager(self):
+        with self._lock:
+            if self._statistics_manager is None:
+                self._statistics_manager = StatisticsManager(self.statistics_file, outbox=self.outbox)
+            return self._statistics_manager
+
+    @property
+    def librarian_manager(self):
+        with self._lock:
+            if self._librarian_manager is None:
+                self._librarian_manager = LibrarianManager(self.librarians_file,
+                                                           statistics_manager=self.statistics_manager)
+            elif self._librarian_manager.statistics_manager is not self.statistics_manager:
+                self._librarian_manager.subscribe(self.statistics_manager)
+            return self._librarian_manager
+
+    def create_controller(self, **options):
+        """Build a LibraryController over the shared components."""
+        return LibraryController(self.library, self.statistics_manager, file_path=self.books_file,
+                                 librarian_manager=self.librarian_manager, **options)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(**options):
+    """Return the process-wide registry, creating it with options on the first call."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ComponentRegistry(**options)
+        return _registry
+
+
+def reset_registry():
+    """Forget the process-wide registry, e.g. between tests."""
+    global _registry
+    with _registry_lock:
+        _registry = None
@@ -0,0 +1,101 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Hold an advisory lock on path across processes.
+
+    The lock is taken on a ``<path>.lock`` file next to it rather than on the
+    file itself, because atomic_write replaces the file (and its inode) on
+    every save. Shared locks are exclusive on Windows.
+    """
+    with open(f"{os.fspath(path)}.lock", "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def atomic_write(path, newline=""):
+    """Open a temporary text file that replaces path only once it is complete and on disk."""
+    temp_path = f"{os.fspath(path)}.tmp"
+    try:
+        with open(temp_path, "w", newline=newline, encoding="utf-8") as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def file_stamp(path):
+    """What changes when another process saves path: (inode, size, mtime), or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class SyncedRows:
+    """Remembers one CSV file as this process last read or wrote it, to merge changes made by others.
+
+    Rows are tuples of strings keyed by a row key; only a hash of each is
+    kept. ``merge`` compares three versions of every row: the remembered one
+    (base), the in-memory one (ours) and the one now on disk (theirs). Rows
+    that only the other process changed are taken from disk; rows we changed
+    are kept, and rows both changed are conflicts where ours wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.base = None  # row key -> hash of the row; None until the file is tracked
+        self.stamp = None
+
+    @property
+    def tracked(self):
+        return self.base is not None
+
+    def track(self, rows, stamp=None):
+        """Record rows as the current content of the file."""
+        self.base = {key: hash(row) for key, row in rows.items()}
+        self.stamp = file_stamp(self.path) if stamp is None else stamp
+
+    def changed(self):
+        """True if the file was replaced since it was last tracked."""
+        return self.tracked and file_stamp(self.path) != self.stamp
+
+    def merge(self, ours, theirs):
+        """Return ({key: their row, or None if they deleted it}, [conflicting keys])."""
+        changes, conflicts = {}, []
+        for key in ours.keys() | theirs.keys():
+            base = self.base.get(key)
+            mine = hash(ours[key]) if key in ours else None
+            their = hash(theirs[key]) if key in theirs else None
+            if their == base or their == mine:
+                continue  # They did not touch it, or made the same change
+            if mine == base:
+                changes[key] = theirs.get(key)
+            else:
+                conflicts.append(key)
+        return changes, conflicts
@@ -0,0 +1,195 @@
+import itertools
+import json
+import socket
+import threading
+
+from books.book import Book
+from management.LibraryController import LoanOutcome
+from management.StatisticsManager import StatisticsManager
+
+ERRORS = {"ValueError": ValueError, "PermissionError": PermissionError, "LookupError": LookupError,
+          "KeyError": KeyError, "TypeError": TypeError}
+
+
+class LibraryClient:
+    """Blocking client for LibraryServer.
+
+    ``call`` sends one request and waits for its reply; ``pipeline`` writes a
+    whole list of requests before reading any reply, so N calls cost one
+    round trip. A client may be shared by threads; calls are serialized.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, timeout=30):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.stream = self.sock.makefile("rwb")
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    def call(self, method, **params):
+        return self.pipeline([(method, params)])[0]
+
+    def pipeline(self, calls, raise_errors=True):
+        """Send (method, params) pairs and return their results in order.
+
+        A failed call raises its error (ValueError, PermissionError, ...), or
+        with raise_errors=False stands in the results as the exception object.
+        """
+        with self.lock:
+            request_ids = []
+            for method, params in calls:
+                request_id = next(self.ids)
+                request_ids.append(request_id)
+                request = {"id": request_id, "method": method, "params": params}
+                self.stream.write(json.dumps(request).encode("utf-8") + b"\n")
+            self.stream.flush()
+
+            responses = {}
+            while len(responses) < len(request_ids):
+                line = self.stream.readline()
+                if not line:
+                    raise ConnectionError("The library server closed the connection.")
+                response = json.loads(line)
+                responses[response["id"]] = response
+
+        results = []
+        for request_id in request_ids:
+            response = responses[request_id]
+            if "error" in response:
+                error = ERRORS.get(response["error"]["type"], RuntimeError)(response["error"]["message"])
+                if raise_errors:
+                    raise error
+                results.append(error)
+            else:
+                results.append(response["result"])
+        return results
+
+    def close(self):
+        with self.lock:
+            self.stream.close()
+            self.sock.close()
+
+
+class RemoteLibrary:
+    """The read side of a Library, answered by a LibraryServer.
+
+    Each book is one local Book object, updated in place whenever a reply
+    carries it, so lists already on screen see borrows and returns.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.books = {}  # book key -> Book
+
+    def merge(self, data):
+        if data is None:
+            return None
+        book_key = data.pop("key")
+        fresh = Book.from_dict(data)
+        book = self.books.get(book_key)
+        if book is None:
+            self.books[book_key] = book = fresh
+        else:
+            for name in Book.__slots__:
+                setattr(book, name, getattr(fresh, name))
+        return book
+
+    def _books(self, method, **params):
+        return [self.merge(data) for data in self.client.call(method, **params)]
+
+    def get_books(self):
+        return self._books("get_books")
+
+    def get_genres(self):
+        return self.client.call("get_genres")
+
+    def search_title(self, query):
+        return self._books("search_title", query=query)
+
+    def search_author(self, query):
+        return self._books("search_author", query=query)
+
+    def get_books_by_genre(self, genre):
+        return self._books("get_books_by_genre", genre=genre)
+
+    def get_available_books(self):
+        return self._books("get_available_books")
+
+    def get_loaned_books(self):
+        return self._books("get_loaned_books")
+
+    def get_popular_books(self, genre=None):
+        return self._books("get_popular_books", genre=genre)
+
+
+class RemoteStatistics:
+    """Waitlist lookups answered by a LibraryServer."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_waitlist(self, book_key):
+        return self.client.call("get_waitlist", book_key=book_key)
+
+    def get_waitlist_position(self, book_key, email):
+        return self.client.call("get_waitlist_position", book_key=book_key, email=email)
+
+
+class RemoteController:
+    """Stands in for LibraryController in the GUI, with the catalog held by a LibraryServer."""
+
+    def __init__(self, host="127.0.0.1", port=8765, timeout=30):
+        self.client = LibraryClient(host, port, timeout)
+        self.library = RemoteLibrary(self.client)
+        self.stat_manager = RemoteStatistics(self.client)
+        self.username = None
+
+    @staticmethod
+    def _generate_book_key(title, author):
+        return StatisticsManager.generate_key(title, author)
+
+    def add_book(self, title, author, copies, genre, year):
+        self.library.merge(self.client.call("add_book", title=title, author=author, copies=copies, genre=genre,
+                                            year=year)["book"])
+
+    def remove_book(self, title, author):
+        self.client.call("remove_book", title=title, author=author)
+        self.library.books.pop(self._generate_book_key(title, author), None)
+
+    def borrow_book(self, title, author, user):
+        result = self.client.call("borrow_book", title=title, author=author, user=user)
+        self.library.merge(result["book"])
+        return result["borrowed"]
+
+    def return_book(self, title, author):
+        self.library.merge(self.client.call("return_book", title=title, author=author)["book"])
+
+    def process_loans(self, operations, atomic=True):
+        result = self.client.call("process_loans", operations=[list(operation) for operation in operations],
+                                  atomic=atomic)
+        for data in result["books"]:
+            self.library.merge(data)
+        return [LoanOutcome(**outcome) for outcome in result["outcomes"]]
+
+    def get_popular_books(self, genre=None):
+        return self.library.get_popular_books(genre)
+
+    def get_available_books(self):
+        return self.library.get_available_books()
+
+    def authenticate_librarian(self, username, librarian_id, password):
+        self.client.call("login", username=username, id=librarian_id, password=password)
+        self.username = username
+
+    def logout_librarian(self):
+        if self.username is not None:
+            self.client.call("logout")
+            self.username = None
+
+    def register_librarian(self, username, librarian_id, password):
+        self.client.call("register", username=username, id=librarian_id, password=password)
+
+    def flush(self):
+        """The server owns persistence; nothing is held back here."""
+
+    def close(self):
+        self.client.close()
@@ -1,6 +1,14 @@
+import copy
 import csv
+import threading
+import time
+from contextlib import nullcontext
 
-from management.LibraryFileManager import LibraryFileManager
+from management.BookLoader import ImportReport, iter_import_records, parse_import_record
+from management.LibraryFileManager import LibraryFileManager, GroupCommitWriter
+from management.LibraryJournal import LibraryJournal
+from management.Locks import ReadWriteLock, StripedLock
+from management.Metrics import timed
 from books.book import *
 from management.StatisticsManager import StatisticsManager
 
@@ -8,18 +16,101 @@ from users.librarian import LibrarianManager
 import os
 from files.Log import add_log
 
+class LoanOutcome:
+    """Result of one operation of a LibraryController.process_loans batch."""
+
+    def __init__(self, index, action, title, author, status, error=None):
+        self.index = index
+        self.action = action
+        self.title = title
+        self.author = author
+        self.status = status  # "borrowed", "waitlisted", "returned", "failed" or "rolled back"
+        self.error = error
+
+    def __repr__(self):
+        return f"LoanOutcome({self.index}, {self.action} '{self.title}': {self.status}" + \
+            (f" - {self.error})" if self.error else ")")
+
+
 class LibraryController:
     DEFAULT_FILE_PATH = os.path.abspath("../files/books.csv")
-    def __init__(self, library, statistics_manager, file_path=DEFAULT_FILE_PATH):
+    def __init__(self, library, statistics_manager, file_path=DEFAULT_FILE_PATH, journal=False,
+                 checkpoint_interval=500, group_commit=False, commit_interval=1.0, commit_batch_size=50,
+                 storage=None, librarian_manager=None, thread_safe=False, lock_stripes=64, watch_files=False,
+                 require_session=False):
         self.library = library
         self.stat_manager = statistics_manager
-        self.librarian_manager = LibrarianManager()
+        self.storage = storage  # Optional backend with row-level updates (e.g. SQLiteStorage)
+        if librarian_manager is None:
+            librarian_manager = LibrarianManager(statistics_manager=statistics_manager)
+        self.librarian_manager = librarian_manager
+        self.session_token = None  # Session of the librarian logged in through this controller
+        self.require_session = require_session  # Changes to the catalog need a live session
         self.file_path = file_path
         if not isinstance(file_path, (str, os.PathLike)):
             raise TypeError("file_path must be a string or PathLike object.")
+        self.file_manager = LibraryFileManager(file_path=file_path)
+
+        # With watch_files several processes may share books.csv: saves merge the rows others changed and
+        # reload_if_changed picks them up. Merging rewrites books in memory, so only the plain CSV mode allows it
+        self.watch_files = watch_files
+        if watch_files and (journal or group_commit or thread_safe or storage is not None):
+            raise ValueError("watch_files needs the plain CSV mode (no journal, group commit, storage or "
+                             "thread-safe mode).")
+        if watch_files:
+            self.file_manager.track(self.library)
+
+        # In thread-safe mode borrows and returns lock their book's stripe and read-lock the catalog;
+        # adding and removing books, imports and loan batches write-lock the catalog
+        self.thread_safe = thread_safe
+        if thread_safe:
+            self._catalog_lock = ReadWriteLock()
+            self._book_locks = StripedLock(lock_stripes)
+            self._index_lock = threading.Lock()  # Shared availability and popularity indexes
+            self._sync_lock = threading.RLock()  # Persistence
+        else:
+            self._catalog_lock = self._book_locks = None
+            self._index_lock = self._sync_lock = nullcontext()
+
+        # In journal mode mutations are appended to books.csv.journal and books.csv is only a checkpoint
+        self.journal = None
+        if journal:
+            self.journal = LibraryJournal(f"{os.fspath(file_path)}.journal", checkpoint_interval)
+            self.journal.replay(self.library)
+
+        # In group commit mode mutations only mark the catalog dirty and a background thread saves it
+        self.writer = None
+        if group_commit:
+            self.writer = GroupCommitWriter(self.file_manager, self.library,
+                                            self.stat_manager, commit_interval, commit_batch_size,
+                                            lock=self._reading if thread_safe else None)
+
+    def _reading(self):
+        return self._catalog_lock.read() if self.thread_safe else nullcontext()
+
+    def _writing(self):
+        return self._catalog_lock.write() if self.thread_safe else nullcontext()
+
+    def _check_session(self):
+        if self.require_session and self.current_librarian() is None:
+            self.session_token = None
+            raise PermissionError("Your session has expired or you are not logged in. Please log in again.")
 
+    def _locked_book(self, book_key):
+        return self._book_locks.for_key(book_key) if self.thread_safe else nullcontext()
+
+    def _update_state(self, book_key):
+        with self._index_lock:
+            self.library.update_book_state(book_key)
+
+    @timed("controller.add_book")
     def add_book(self, title, author, copies, genre, year):
         """Add a new book to the library."""
+        self._check_session()
+        with self._writing():
+            self._add_book(title, author, copies, genre, year)
+
+    def _add_book(self, title, author, copies, genre, year):
         try:
             # Generate book key
             book_key = self._generate_book_key(title, author)
@@ -41,15 +132,70 @@ class LibraryController:
             self.library.add_book(new_book, book_key)
 
             # Synchronize the library data with books.csv
-            self._sync_books()
-            add_log(f"Book '{title}' by '{author}' successfully added to the library.","info")
+            self._sync_books(book_key)
+            add_log("Book '%s' by '%s' successfully added to the library.", "info", title, author)
 
         except Exception as e:
-            add_log(f"Error while adding book '{title}' by '{author}': {str(e)}","info")
+            add_log("Error while adding book '%s' by '%s': %s", "info", title, author, e)
             raise
 
+    @timed("controller.bulk_add_books")
+    def bulk_add_books(self, source, max_errors=1000):
+        """Add many books at once from an iterable (of Books or dicts) or a .csv/.jsonl file path.
+
+        Records are validated and deduplicated by book key in one pass; invalid
+        ones and those already in the library or earlier in the source are
+        reported, not added. The library is persisted once, at the end.
+        Returns an ImportReport.
+        """
+        self._check_session()
+        with self._writing():
+            return self._bulk_add_books(source, max_errors)
+
+    def _bulk_add_books(self, source, max_errors):
+        started = time.perf_counter()
+        report = ImportReport(max_errors)
+        records = iter_import_records(source) if isinstance(source, (str, os.PathLike)) else enumerate(source, 1)
+        batch = {}  # book key -> Book, in source order
+        for line_number, record in records:
+            try:
+                book = record if isinstance(record, Book) else parse_import_record(record)
+                book_key = self._generate_book_key(book.title, book.author)
+                if book_key in batch or self.library.has_book(book_key):
+                    raise ValueError(f"duplicate book '{book.title}' by {book.author}")
+            except ValueError as e:
+                report.reject(line_number, record, str(e))
+                continue
+            batch[book_key] = book
+
+        report.added = self.library.add_books(batch.items())
+        if batch:
+            self._sync_bulk(batch)
+        report.elapsed = time.perf_counter() - started
+        add_log("Imported %d books (%d rejected) in %.2f s, %.0f books/s.", "info", report.added,
+                report.error_count, report.elapsed, report.rate)
+        return report
+
+    def _sync_bulk(self, books):
+        """Persist a batch of added books with one write."""
+        with self._sync_lock:
+            if self.storage is not None:
+                self.storage.upsert_books(books.items())
+            elif self.journal is not None:
+                self.checkpoint()  # One full save instead of a journal record per book
+            elif self.writer is not None:
+                self.writer.mark_dirty()
+            else:
+                self._sync_books()
+
+    @timed("controller.remove_book")
     def remove_book(self, title, author):
         """Remove a book from the library."""
+        self._check_session()
+        with self._writing():
+            self._remove_book(title, author)
+
+    def _remove_book(self, title, author):
         book_identifier = self._generate_book_key(title, author)
         book = self.library.books[book_identifier]
         if not self.library.has_book(book_identifier):
@@ -58,17 +204,24 @@ class LibraryController:
             raise ValueError(f"The book '{title}' by {author} cannot be removed from the library because the book is lend.")
         else:
             self.library.remove_book(book_identifier)
-            self._sync_books()
+            self._sync_books(book_identifier)
 
     @staticmethod
     def _generate_book_key(title, author):
         """Generate a unique key for the book."""
         return StatisticsManager.generate_key(title, author)
 
+    @timed("controller.borrow_book")
     def borrow_book(self, title, author, user):
         """Borrow a book or add the user to the waitlist if unavailable."""
+        self._check_session()
         book_key = self._generate_book_key(title, author)
+        with self._reading(), self._locked_book(book_key):
+            borrowed = self._borrow(book_key, title, author, user)
+            self._sync_books(book_key)
+        return borrowed  # True if borrowed, False if the user was added to the waitlist
 
+    def _borrow(self, book_key, title, author, user):
         if not self.library.has_book(book_key):
             raise ValueError(f"The book '{title}' by '{author}' does not exist in the library.")
 
@@ -81,19 +234,29 @@ class LibraryController:
             # Decrease the available copies and mark the book as loaned
             book.available -= 1
             book.is_loaned = book.available == 0
-            add_log(f"Book '{title}' successfully borrowed by {user['name']}.",'info')
-            self._sync_books()
+            self._update_state(book_key)
+            add_log("Book '%s' successfully borrowed by %s.", "info", title, user['name'])
             return True  # Book successfully borrowed
 
         # If no copies are available, add the user to the waitlist
+        self._update_state(book_key)
         self.stat_manager.add_user_to_waitlist(book_key, user)
-        add_log(f"Book '{title}' is unavailable. {user['name']} added to the waitlist.","info")
-        self._sync_books()
+        add_log("Book '%s' is unavailable. %s added to the waitlist.", "info", title, user['name'])
         return False  # User added to waitlist
 
+    @timed("controller.return_book")
     def return_book(self, title, author):
         """Return a borrowed book and notify the next user in the waitlist if applicable."""
+        self._check_session()
         book_key = self._generate_book_key(title, author)
+        with self._reading(), self._locked_book(book_key):
+            book = self._return(book_key, title, author)
+            self._sync_books(book_key)
+
+            if self.stat_manager.get_waitlist_count()>0:
+                self.stat_manager.notify_waitlist(book_key,title, book.genre)
+
+    def _return(self, book_key, title, author):
         if not self.library.has_book(book_key):
             raise ValueError(f"Book '{title}' by '{author}' not found in the library.")
 
@@ -107,43 +270,240 @@ class LibraryController:
         book.available += 1
         if book.available > 0:
             book.is_loaned = False
+        self._update_state(book_key)
+        return book
 
-        if self.stat_manager.get_waitlist_count()>0:
-            self.stat_manager.notify_waitlist(book_key,title)
+    @timed("controller.process_loans")
+    def process_loans(self, operations, atomic=True):
+        """Apply many borrows and returns as one batch.
 
-    def get_popular_books(self):
-        """Get the top 10 most popular books."""
-        books = sorted(self.library.get_books(), key=lambda book: book.request_counter, reverse=True)
-        return books[:10]
+        operations are ("borrow", title, author, user) and ("return", title,
+        author) tuples. Returns one LoanOutcome per operation, in order. With
+        atomic=True a single failure undoes the whole batch (the other
+        outcomes then say "rolled back"); otherwise the failed operations are
+        skipped. Waitlist notifications for the returned copies, the books
+        save and the statistics save each happen once, after the batch.
+        """
+        self._check_session()
+        with self._writing():
+            return self._process_loans(operations, atomic)
 
+    def _process_loans(self, operations, atomic):
+        outcomes = []
+        saved = {}  # book key -> (available, is_loaned, request_counter, waitlist) before the batch
+        returned = []  # book keys, once per returned copy
+        failed = False
+        with self.stat_manager.batch():
+            for index, (action, title, author, *user) in enumerate(operations):
+                book_key = self._generate_book_key(title, author)
+                before = self._book_state(book_key) if self.library.has_book(book_key) else None
+                if before is not None:
+                    saved.setdefault(book_key, before)
+                try:
+                    if action == "borrow":
+                        status = "borrowed" if self._borrow(book_key, title, author, user[0]) else "waitlisted"
+                    elif action == "return":
+                        self._return(book_key, title, author)
+                        returned.append(book_key)
+                        status = "returned"
+                    else:
+                        raise ValueError(f"Unknown loan operation '{action}'.")
+                except Exception as e:
+                    if not isinstance(e, (ValueError, IndexError)):
+                        add_log("Loan operation %d (%s '%s') failed: %r", "error", index, action, title, e)
+                    if before is not None:
+                        self._restore_books({book_key: before})  # Undo whatever the operation did before failing
+                    failed = True
+                    outcomes.append(LoanOutcome(index, action, title, author, "failed", str(e)))
+                    continue
+                outcomes.append(LoanOutcome(index, action, title, author, status))
+
+            if failed and atomic:
+                self._restore_books(saved)
+                for outcome in outcomes:
+                    if outcome.status != "failed":
+                        outcome.status = "rolled back"
+                add_log("Loan batch of %d operations rolled back.", "warning", len(outcomes))
+                return outcomes
+
+            for book_key in returned:
+                if self.stat_manager.get_waitlist_count() > 0 and self.library.has_book(book_key):
+                    book = self.library.books[book_key]
+                    self.stat_manager.notify_waitlist(book_key, book.title, book.genre)
+
+        self._sync_batch(saved)
+        add_log("Processed loan batch of %d operations.", "info", len(outcomes))
+        return outcomes
+
+    def _book_state(self, book_key):
+        book = self.library.books[book_key]
+        waitlist = self.stat_manager.waiting_list.get(book_key)
+        return book.available, book.is_loaned, book.request_counter, copy.deepcopy(waitlist)
+
+    def _restore_books(self, saved):
+        for book_key, (available, is_loaned, request_counter, waitlist) in saved.items():
+            book = self.library.books[book_key]
+            book.available, book.is_loaned, book.request_counter = available, is_loaned, request_counter
+            self._update_state(book_key)
+            if waitlist is None:
+                self.stat_manager.waiting_list.pop(book_key, None)
+            else:
+                self.stat_manager.waiting_list[book_key] = waitlist
+
+    def _sync_batch(self, book_keys):
+        """Persist the books changed by a batch with one write."""
+        with self._sync_lock:
+            if not book_keys:
+                return
+            if self.storage is not None:
+                self.storage.upsert_books((book_key, self.library.books[book_key]) for book_key in book_keys)
+            elif self.journal is not None:
+                self.journal.append_many((LibraryJournal.UPSERT, book_key, self.library.books[book_key])
+                                         for book_key in book_keys)
+                if self.journal.needs_checkpoint():
+                    self.checkpoint()
+            elif self.writer is not None:
+                self.writer.mark_dirty()
+            else:
+                self._sync_books()
+
+    _INDEXED_QUERIES = {"get_available_books", "get_loaned_books", "get_popular_books"}
+
+    @timed("controller.query")
+    def query(self, method, *args):
+        """Call a read-only Library method (e.g. "search_title") safely next to concurrent desks.
+
+        With a storage backend, the lookups it indexes (genre and availability)
+        are answered by the database instead of the in-memory indexes.
+        """
+        if self.storage is not None and method in self.storage.BOOK_QUERIES:
+            return self._query_storage(method, *args)
+        index_lock = self._index_lock if method in self._INDEXED_QUERIES else nullcontext()
+        with self._reading(), index_lock:
+            return getattr(self.library, method)(*args)
+
+    @timed("controller.get_popular_books")
+    def get_popular_books(self, genre=None):
+        """Get the most popular books (top 10 by default), optionally within one genre."""
+        with self._reading(), self._index_lock:
+            return self.library.get_popular_books(genre)
+
+    @timed("controller.get_available_books")
     def get_available_books(self):
         """Get all available books."""
-        available_books = [book for book in self.library.get_books() if not book.is_loaned]
-        return available_books
+        if self.storage is not None:
+            return self._query_storage("get_available_books")
+        with self._reading(), self._index_lock:
+            return self.library.get_available_books()
 
-    def _sync_books(self):
-        """Save library data to CSV using LibraryFileManager."""
-        file_manager = LibraryFileManager(file_path=self.file_path)
-        file_manager.save_books(self.library, self.stat_manager)
+    def _query_storage(self, method, *args):
+        """Run an indexed storage query and return the library's own Book objects for the matched keys."""
+        with self._reading():
+            books = self.library.books
+            return [books[book_key] for book_key in self.storage.query_book_keys(method, *args)
+                    if book_key in books]
 
+    def _sync_books(self, book_key=None):
+        """Persist a change to the library: a row update, a journal record or a full CSV save."""
+        with self._sync_lock:
+            if self.storage is not None:
+                if book_key is None:
+                    self.storage.save_books(self.library, self.stat_manager)
+                elif self.library.has_book(book_key):
+                    self.storage.upsert_book(book_key, self.library.books[book_key])
+                else:
+                    self.storage.delete_book(book_key)
+                return
+
+            if self.journal is not None and book_key is not None:
+                book = self.library.books.get(book_key)
+                if book is None:
+                    self.journal.append(LibraryJournal.REMOVE, book_key)
+                else:
+                    self.journal.append(LibraryJournal.UPSERT, book_key, book)
+                if self.journal.needs_checkpoint():
+                    self.checkpoint()
+                return
+
+            if self.writer is not None:
+                self.writer.mark_dirty()
+                return
+
+            self.file_manager.save_books(self.library, self.stat_manager)
+
+    @timed("controller.checkpoint")
+    def checkpoint(self):
+        """Write the full catalog to books.csv and discard the journal records it now contains."""
+        with self._sync_lock:
+            self.file_manager.save_books(self.library, self.stat_manager)
+            if self.journal is not None:
+                self.journal.truncate()
+
+    @timed("controller.flush")
+    def flush(self):
+        """Write out changes still held back by group commit."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        """Flush pending changes and stop background persistence before exit."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.journal is not None:
+            self.checkpoint()
+
+    @timed("controller.load_books")
     def load_books(self):
-        """Load books from CSV into the library."""
-        file_manager = LibraryFileManager(file_path=self.file_path)
-        file_manager.load_books(self.library, self.stat_manager)
+        """Load books from the storage backend, or from CSV, into the library."""
+        if self.storage is not None:
+            self.storage.load_books(self.library, self.stat_manager)
+            return
+        self.file_manager.load_books(self.library, self.stat_manager)
+        if self.watch_files:
+            self.file_manager.track(self.library)
+
+    @timed("controller.reload_if_changed")
+    def reload_if_changed(self):
+        """Pick up what other processes saved to the books, statistics and librarians files.
+
+        Only rows that changed on disk are applied, and rows changed here but
+        not saved yet are kept. Returns the number of books and waitlists that
+        changed. The books file is only watched with watch_files=True.
+        """
+        with self._writing():
+            changed = self.file_manager.reload_books(self.library, self.stat_manager) if self.watch_files else 0
+        changed += self.stat_manager.reload_data()
+        self.librarian_manager.reload_librarians()
+        return changed
 
     def authenticate_librarian(self, username, librarian_id, password):
         """Authenticate a librarian."""
         try:
-            if not self.librarian_manager.authenticate(username, librarian_id, password):
+            token = self.librarian_manager.login(username, librarian_id, password)
+            if token is None:
                 raise PermissionError("Invalid username, ID, or password.")
-            add_log(f"Librarian '{username}' with ID '{librarian_id}' authenticated successfully.","info")
+            self.session_token = token
+            add_log("Librarian '%s' with ID '%s' authenticated successfully.", "info", username, librarian_id)
         except Exception as e:
-            add_log(f"Failed to authenticate librarian '{username}' with ID '{librarian_id}': {e}", "info")
+            add_log("Failed to authenticate librarian '%s' with ID '%s': %s", "info", username, librarian_id, e)
             raise
 
+    def current_librarian(self):
+        """Return the librarian of the current session, or None if nobody is logged in or it expired."""
+        if self.session_token is None:
+            return None
+        return self.librarian_manager.validate_session(self.session_token)
+
+    def logout_librarian(self):
+        """End the current librarian session."""
+        if self.session_token is not None:
+            self.librarian_manager.logout(self.session_token)
+            self.session_token = None
+
     def register_librarian(self, username, librarian_id, password):
         """Register a new librarian."""
         if self.librarian_manager.is_librarian_registered(librarian_id):
             raise ValueError("Librarian with this id already exists.")
         self.librarian_manager.add_librarian(username, librarian_id, password)
-        add_log(f"Librarian '{username}' registered successfully.","info")
+        add_log("Librarian '%s' registered successfully.", "info", username)
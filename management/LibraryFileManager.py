@@ -1,43 +1,48 @@
 import csv
-import pandas as pd
 import os
-from management.StatisticsManager import StatisticsManager
+import threading
+from contextlib import nullcontext
 from books.book import Book
+from management.StatisticsManager import StatisticsManager
+from management.BookLoader import BookLoader
+from management.FileSync import SyncedRows, atomic_write, file_lock, file_stamp
+from management.Metrics import metrics, timed
 from files.Log import add_log
 
 
 
 class LibraryFileManager:
+    """Reads and writes books.csv.
+
+    Saves hold an advisory lock on the file and replace it atomically. Once
+    ``track`` has been called, a save first merges rows that another process
+    saved in the meantime instead of overwriting them, and ``reload_books``
+    applies such rows without a save.
+    """
+    FIELDNAMES = ["title", "author", "is_loaned", "copies", "genre", "year", "available", "request_counter"]
+    MUTABLE_FIELDS = ("copies", "year", "available", "is_loaned", "request_counter")
+
     def __init__(self, file_path= os.path.abspath("../files/books.csv")):
         self.file_path = file_path
+        self.synced = SyncedRows(file_path)
 
+    @timed("file.save_books")
     def save_books(self, library, statistics_manager):
         """Save all book data to CSV."""
         try:
-            books = library.get_books()  # Returns a list of Book objects
-
-            # Prepare data for saving
-            data = [
-                {
-                    "title": book.title,
-                    "author": book.author,
-                    "is_loaned": "yes" if book.is_loaned else "no",
-                    "copies": book.copies,
-                    "genre": book.genre,
-                    "year": book.year,
-                    "available": book.available,
-                    "request_counter": book.request_counter  # Save correct request counter
-                }
-                for book in books
-            ]
-
-            # Save to CSV
-            self._save_to_csv(self.file_path, data)
+            with file_lock(self.file_path):
+                if self.synced.changed():
+                    self._merge_from_disk(library, statistics_manager)
+                rows = self._rows(library)
+                self._save_to_csv(self.file_path, rows.values())
+                if self.synced.tracked:
+                    self.synced.track(rows)
             add_log("Books saved successfully.","info")
         except Exception as e:
             add_log(f"Failed to save books: {e}","error")
             raise
 
+    @timed("file.load_books")
     def load_books(self, library, statistics_manager):
         """Load book data from books.csv into the library."""
         try:
@@ -46,29 +51,177 @@ class LibraryFileManager:
                 return
 
 
-            with open(self.file_path, "r", encoding="utf-8") as file:
-                    reader = csv.DictReader(file)
-                    for row in reader:
-                        book = Book.from_dict(row)
-                        if book:
-                            book_key = StatisticsManager.generate_key(book.title, book.author)
-                            library.add_book(book, book_key)
-                            statistics_manager.request_counts[book_key] = book.request_counter  # Sync with stats
-                    statistics_manager.waiting_list[book_key] = book.waitlist
+            loader = BookLoader(self.file_path)
+            for book in loader.iter_books():
+                book_key = StatisticsManager.generate_key(book.title, book.author)
+                library.add_book(book, book_key)
+                statistics_manager.request_counts[book_key] = book.request_counter  # Sync with stats
+            if loader.error_count:
+                add_log(f"Skipped {loader.error_count} invalid rows in {self.file_path}: {loader.errors[:5]}", "warning")
 
             add_log("Books loaded successfully from CSV.","info")
         except Exception as e:
             add_log(f"Failed to load books: {e}","error")
             raise
 
-    def _save_to_csv(self, file_path, data):
-        """Helper function to save data to a CSV file."""
+    def track(self, library):
+        """Remember the library as the current content of the file, so later changes by others can be merged."""
+        self.synced.track(self._rows(library))
+
+    @timed("file.reload_books")
+    def reload_books(self, library, statistics_manager):
+        """Apply the rows other processes changed in the file since it was last read or written.
+
+        Returns the number of books added, updated or removed.
+        """
+        if not self.synced.changed():
+            return 0
+        with file_lock(self.file_path, shared=True):
+            return self._merge_from_disk(library, statistics_manager)
+
+    def _merge_from_disk(self, library, statistics_manager):
+        stamp = file_stamp(self.file_path)
+        theirs = self._read_rows()
+        changes, conflicts = self.synced.merge(self._rows(library), theirs)
+        for book_key, row in changes.items():
+            self._apply_row(library, statistics_manager, book_key, row)
+        if conflicts:
+            add_log("Kept local changes to %d books also changed in %s: %s", "warning", len(conflicts),
+                    self.file_path, conflicts[:5])
+        self.synced.track(theirs, stamp)
+        if changes:
+            add_log("Reloaded %d books changed in %s by another process.", "info", len(changes), self.file_path)
+        return len(changes)
+
+    @staticmethod
+    def _apply_row(library, statistics_manager, book_key, row):
+        if row is None:
+            if library.has_book(book_key):
+                library.remove_book(book_key)
+            return
+        book = Book.from_dict(dict(zip(LibraryFileManager.FIELDNAMES, row)))
+        if book is None:
+            return  # Invalid row, already logged
+        current = library.books.get(book_key)
+        same_book = current is not None and (current.title, current.author, current.genre) == (
+            book.title, book.author, book.genre)
+        if same_book:
+            # Update in place, so lists on screen show the new values; a ColumnarLibrary row has no setter for
+            # the other fields
+            for name in LibraryFileManager.MUTABLE_FIELDS:
+                setattr(current, name, getattr(book, name))
+            library.update_book_state(book_key)
+        else:
+            if current is not None:
+                library.remove_book(book_key)
+            library.add_book(book, book_key)
+        statistics_manager.request_counts[book_key] = book.request_counter
+
+    @staticmethod
+    def _rows(library):
+        # The row of each book exactly as it is written to the file
+        return {StatisticsManager.generate_key(book.title, book.author):
+                    tuple(str(value) for value in book.to_dict().values())
+                for book in library.get_books()}
+
+    def _read_rows(self):
+        if not os.path.exists(self.file_path):
+            return {}
+        with open(self.file_path, "r", newline="", encoding="utf-8") as file:
+            return {StatisticsManager.generate_key(row["title"], row["author"]):
+                        tuple(row.get(field) or "" for field in self.FIELDNAMES)
+                    for row in csv.DictReader(file)}
+
+    def _save_to_csv(self, file_path, rows):
+        """Helper function to save rows to a CSV file.
+
+        The data is written to a temporary file that replaces the target only
+        once it is complete, so a crash never leaves a half-written CSV behind.
+        """
         try:
-            with open(file_path, "w", newline="", encoding="utf-8") as file:
-                writer = csv.DictWriter(file, fieldnames=data[0].keys())
-                writer.writeheader()
-                writer.writerows(data)
-            add_log(f"Data saved successfully to {file_path}", "info")
+            with atomic_write(file_path) as file:
+                writer = csv.writer(file)
+                writer.writerow(self.FIELDNAMES)
+                writer.writerows(rows)
+            if metrics.enabled:
+                metrics.count("library_bytes_written", os.path.getsize(file_path), file=os.path.basename(file_path))
+            add_log("Data saved successfully to %s", "info", file_path)
         except Exception as e:
             add_log(f"Failed to save data to {file_path}: {e}", "error")
-            raise
\ No newline at end of file
+            raise
+
+
+class GroupCommitWriter:
+    """Coalesces catalog saves into one background write per interval or batch.
+
+    Mutations only call ``mark_dirty``; a daemon thread writes the catalog once
+    ``batch_size`` changes have piled up or ``interval`` seconds have passed.
+    Waitlist saves of the statistics manager are deferred the same way and
+    written with the catalog. ``flush`` writes synchronously and ``close``
+    stops the thread after a final flush.
+    """
+
+    def __init__(self, file_manager, library, statistics_manager, interval=1.0, batch_size=50, lock=None):
+        self.file_manager = file_manager
+        self.library = library
+        self.statistics_manager = statistics_manager
+        self.interval = interval
+        self.batch_size = batch_size
+        self.lock = lock  # Optional callable returning a context manager held while the catalog is read
+        self._pending = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._save_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="LibraryGroupCommit", daemon=True)
+        self._thread.start()
+        statistics_manager.defer_saves(self.mark_dirty)
+
+    def mark_dirty(self):
+        """Record a change that has to reach disk with the next save."""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Group commit writer is already closed.")
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._condition.notify()
+
+    def flush(self):
+        """Write all pending changes now, on the calling thread."""
+        with self._save_lock:
+            with self._condition:
+                pending, self._pending = self._pending, 0
+            if not pending:
+                return
+            try:
+                with self.lock() if self.lock is not None else nullcontext():
+                    self.file_manager.save_books(self.library, self.statistics_manager)
+                self.statistics_manager.save_pending()
+            except Exception:
+                # Keep the catalog dirty so the next flush retries the save
+                with self._condition:
+                    self._pending += pending
+                raise
+            add_log("Group commit wrote %d pending changes.", "debug", pending)
+
+    def close(self):
+        """Stop the background thread and write whatever is still pending."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.statistics_manager.defer_saves(None)  # Later waitlist changes are saved as they happen again
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._closed and self._pending < self.batch_size:
+                    self._condition.wait(self.interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                add_log(f"Background save failed, will retry: {e}", "error")
@@ -0,0 +1,115 @@
+import json
+import os
+import zlib
+
+from books.book import Book
+from files.Log import add_log
+from management.Metrics import metrics
+
+
+class LibraryJournal:
+    """Append-only write-ahead journal for library mutations.
+
+    Every mutation is appended as a single ``<crc32> <json>`` line and fsynced,
+    so a crash can leave at most one torn record at the end of the file.
+    The books CSV is the checkpoint: once it has been rewritten the journal
+    is truncated, and on startup the checkpoint plus the journal are replayed.
+    """
+    UPSERT = "upsert"
+    REMOVE = "remove"
+
+    def __init__(self, file_path, checkpoint_interval=500):
+        self.file_path = file_path
+        self.checkpoint_interval = checkpoint_interval
+        self.pending = 0  # Records appended since the last checkpoint
+
+    def append(self, op, book_key, book=None):
+        """Append one mutation record and force it to disk."""
+        self.append_many([(op, book_key, book)])
+
+    def append_many(self, mutations):
+        """Append (op, book_key, book) records with a single write and fsync."""
+        lines = []
+        for op, book_key, book in mutations:
+            record = {"op": op, "key": book_key}
+            if book is not None:
+                record["book"] = book.to_dict()
+            payload = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            lines.append(b"%08x %s\n" % (zlib.crc32(payload), payload))
+        if not lines:
+            return
+        with open(self.file_path, "ab") as file:
+            file.write(b"".join(lines))
+            file.flush()
+            os.fsync(file.fileno())
+        self.pending += len(lines)
+        metrics.count("library_bytes_written", sum(map(len, lines)), file=os.path.basename(self.file_path))
+
+    def needs_checkpoint(self):
+        return self.pending >= self.checkpoint_interval
+
+    def replay(self, library):
+        """Apply the journal on top of the checkpoint already loaded into the library."""
+        if not os.path.exists(self.file_path):
+            return 0
+
+        applied = 0
+        valid_size = 0
+        with open(self.file_path, "rb") as file:
+            for line in file:
+                record = self._decode(line)
+                if record is None:
+                    add_log(f"Discarding torn journal record at offset {valid_size} in {self.file_path}.", "warning")
+                    break
+                self._apply(library, record)
+                applied += 1
+                valid_size += len(line)
+
+        # Cut off a torn tail so that new records are appended after the last good one
+        if valid_size < os.path.getsize(self.file_path):
+            with open(self.file_path, "r+b") as file:
+                file.truncate(valid_size)
+                os.fsync(file.fileno())
+
+        self.pending = applied
+        add_log(f"Replayed {applied} journal records from {self.file_path}.", "info")
+        return applied
+
+    def truncate(self):
+        """Empty the journal once its records are contained in a checkpoint."""
+        with open(self.file_path, "wb") as file:
+            os.fsync(file.fileno())
+        self.pending = 0
+
+    @staticmethod
+    def _decode(line):
+        if not line.endswith(b"\n"):
+            return None
+        checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+        try:
+            if int(checksum, 16) != zlib.crc32(payload):
+                return None
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _apply(library, record):
+        book_key = record["key"]
+        if record["op"] == LibraryJournal.REMOVE:
+            if library.has_book(book_key):
+                library.remove_book(book_key)
+            return
+
+        data = record["book"]
+        book = Book(
+            title=data["title"],
+            author=data["author"],
+            is_loaned=data["is_loaned"] == "yes",
+            copies=int(data["copies"]),
+            genre=data["genre"],
+            year=int(data["year"]),
+            available=int(data["available"]),
+            request_counter=int(data["request_counter"])
+        )
+        library.add_book(book, book_key)
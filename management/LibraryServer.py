@@ -0,0 +1,226 @@
+import asyncio
+import functools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from files.Log import add_log
+from management.Metrics import metrics
+from management.StatisticsManager import StatisticsManager
+
+MAX_LINE = 1024 * 1024  # Longest request line accepted, in bytes
+
+
+def book_to_json(book, book_key=None):
+    """A book as a JSON object: the books.csv fields plus its key."""
+    data = book.to_dict()
+    data["key"] = book_key or StatisticsManager.generate_key(book.title, book.author)
+    return data
+
+
+class LibraryServer:
+    """Serves one LibraryController to many desks as line-delimited JSON over TCP.
+
+    Every request is one line ``{"id": 1, "method": "borrow_book", "params": {...}}``
+    and gets one reply line ``{"id": 1, "result": ...}`` or
+    ``{"id": 1, "error": {"type": "ValueError", "message": "..."}}``. Clients
+    may pipeline: send many requests without waiting, and the replies come
+    back in the same order. Controller calls run on a thread pool so the event
+    loop keeps reading other connections; the controller should be created
+    with thread_safe=True, otherwise calls are run one at a time.
+
+    Reads are open to everyone. Borrowing, returning and changing the catalog
+    need a librarian session on the connection, opened with ``login``.
+    """
+
+    PUBLIC = {"login", "register", "search_title", "search_author", "get_books", "get_genres", "get_books_by_genre",
+              "get_available_books", "get_loaned_books", "get_popular_books", "get_waitlist",
+              "get_waitlist_position", "metrics"}
+    PROTECTED = {"logout", "borrow_book", "return_book", "add_book", "remove_book", "process_loans"}
+
+    def __init__(self, controller, host="127.0.0.1", port=8765, workers=8):
+        self.controller = controller
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=workers if controller.thread_safe else 1,
+                                           thread_name_prefix="LibraryServer")
+        self.server = None
+        self.loop = None
+        self.thread = None
+
+    async def start(self):
+        """Bind the listening socket; port 0 picks a free port, stored back in self.port."""
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_LINE)
+        self.port = self.server.sockets[0].getsockname()[1]
+        add_log("Library server listening on %s:%s", "info", self.host, self.port)
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted."""
+        async def serve():
+            await self.start()
+            async with self.server:
+                await self.server.serve_forever()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def start_in_thread(self):
+        """Serve on a daemon thread; returns once the port is bound."""
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(self.start())
+            ready.set()
+            self.loop.run_forever()
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="LibraryServerLoop", daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """Stop a server started with start_in_thread and wait for running calls."""
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.thread = None
+        self.executor.shutdown(wait=True)
+
+    async def _handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        connection = {"token": None}  # The librarian session of this connection
+        add_log("Library client connected: %s", "info", peer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break  # Dropped, or a line longer than MAX_LINE
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = await self._respond(line, connection)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                # Pipelined requests are answered back to back; only wait when the client stops reading
+                if writer.transport.get_write_buffer_size() > MAX_LINE:
+                    await writer.drain()
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if connection["token"] is not None:
+                self.controller.librarian_manager.logout(connection["token"])
+            writer.close()
+            add_log("Library client disconnected: %s", "info", peer)
+
+    async def _respond(self, line, connection):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            method = request["method"]
+            params = request.get("params") or {}
+            if method not in self.PUBLIC and method not in self.PROTECTED:
+                raise LookupError(f"Unknown method '{method}'.")
+            if method in self.PROTECTED and (
+                    connection["token"] is None
+                    or self.controller.librarian_manager.validate_session(connection["token"]) is None):
+                raise PermissionError("Log in as a librarian first.")
+            handler = functools.partial(getattr(self, f"_rpc_{method}"), connection, **params)
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, handler)
+        except Exception as e:
+            if not isinstance(e, (ValueError, LookupError, PermissionError)):
+                add_log("Library server request failed: %s", "error", e)
+            return {"id": request_id, "error": {"type": type(e).__name__, "message": str(e)}}
+        return {"id": request_id, "result": result}
+
+    # Methods callable by clients; connection is the dict of the calling connection
+
+    def _books(self, method, *args):
+        return [book_to_json(book) for book in self.controller.query(method, *args)]
+
+    def _book(self, title, author):
+        book_key = self.controller._generate_book_key(title, author)
+        book = self.controller.library.books.get(book_key)
+        return book_to_json(book, book_key) if book is not None else None
+
+    def _rpc_metrics(self, connection):
+        return metrics.openmetrics()
+
+    def _rpc_login(self, connection, username, id, password):
+        token = self.controller.librarian_manager.login(username, id, password)
+        if token is None:
+            raise PermissionError("Invalid username, ID, or password.")
+        connection["token"] = token
+        add_log("Librarian '%s' logged in to the library server.", "info", username)
+        return token
+
+    def _rpc_logout(self, connection):
+        self.controller.librarian_manager.logout(connection["token"])
+        connection["token"] = None
+
+    def _rpc_register(self, connection, username, id, password):
+        self.controller.register_librarian(username, id, password)
+
+    def _rpc_search_title(self, connection, query):
+        return self._books("search_title", query)
+
+    def _rpc_search_author(self, connection, query):
+        return self._books("search_author", query)
+
+    def _rpc_get_books(self, connection):
+        return self._books("get_books")
+
+    def _rpc_get_genres(self, connection):
+        return self.controller.query("get_genres")
+
+    def _rpc_get_books_by_genre(self, connection, genre):
+        return self._books("get_books_by_genre", genre)
+
+    def _rpc_get_available_books(self, connection):
+        return self._books("get_available_books")
+
+    def _rpc_get_loaned_books(self, connection):
+        return self._books("get_loaned_books")
+
+    def _rpc_get_popular_books(self, connection, genre=None):
+        return [book_to_json(book) for book in self.controller.get_popular_books(genre)]
+
+    def _rpc_get_waitlist(self, connection, book_key):
+        return self.controller.stat_manager.get_waitlist(book_key)
+
+    def _rpc_get_waitlist_position(self, connection, book_key, email):
+        return self.controller.stat_manager.get_waitlist_position(book_key, email)
+
+    def _rpc_borrow_book(self, connection, title, author, user):
+        borrowed = self.controller.borrow_book(title, author, user)
+        return {"borrowed": borrowed, "book": self._book(title, author)}
+
+    def _rpc_return_book(self, connection, title, author):
+        self.controller.return_book(title, author)
+        return {"book": self._book(title, author)}
+
+    def _rpc_add_book(self, connection, title, author, copies, genre, year):
+        self.controller.add_book(title, author, copies, genre, year)
+        return {"book": self._book(title, author)}
+
+    def _rpc_remove_book(self, connection, title, author):
+        self.controller.remove_book(title, author)
+
+    def _rpc_process_loans(self, connection, operations, atomic=True):
+        outcomes = self.controller.process_loans([tuple(operation) for operation in operations], atomic)
+        books = {}
+        for outcome in outcomes:
+            if outcome.status not in ("failed", "rolled back"):
+                books.setdefault((outcome.title, outcome.author), self._book(outcome.title, outcome.author))
+        return {"outcomes": [vars(outcome) for outcome in outcomes], "books": list(books.values())}
@@ -0,0 +1,76 @@
+import threading
+import zlib
+from contextlib import contextmanager
+
+
+class StripedLock:
+    """A fixed pool of locks shared by hash of key.
+
+    Operations on the same key always get the same lock; operations on
+    different keys usually get different ones and run in parallel, without
+    keeping a lock object per key.
+    """
+
+    def __init__(self, stripes=64):
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    def for_key(self, key):
+        # crc32 instead of hash() so the stripe of a key is the same in every process
+        return self.locks[zlib.crc32(key.encode("utf-8")) % len(self.locks)]
+
+
+class ReadWriteLock:
+    """Many readers or one writer; a waiting writer keeps new readers out so it is not starved.
+
+    The writer may re-enter write(); readers must not upgrade to writing.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = None  # Thread holding the write lock
+        self._writer_depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth += 1  # Reading inside our own write is already exclusive
+            else:
+                while self._writer is not None or self._writers_waiting:
+                    self._condition.wait()
+                self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                if self._writer == me:
+                    self._writer_depth -= 1
+                else:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth += 1
+            else:
+                self._writers_waiting += 1
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+                self._writers_waiting -= 1
+                self._writer = me
+                self._writer_depth = 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._condition.notify_all()
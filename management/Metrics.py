@@ -0,0 +1,159 @@
+import bisect
+import functools
+import math
+import os
+import threading
+import time
+
+# Upper bounds of the latency buckets, in seconds
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+
+class Histogram:
+    """Latency distribution of one operation in fixed buckets, plus count, sum and maximum."""
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (capped at the maximum seen)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    """Per-operation latency histograms and labelled counters, switchable at runtime.
+
+    Instrumented code checks ``enabled`` before doing anything else, so while
+    recording is off an instrumented call only costs an extra function call
+    and one attribute check. ``openmetrics`` renders everything in the
+    OpenMetrics text format.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms = {}  # operation -> Histogram
+        self.counters = {}  # (name, ((label, value), ...)) -> total
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def observe(self, operation, seconds):
+        with self.lock:
+            histogram = self.histograms.get(operation)
+            if histogram is None:
+                histogram = self.histograms[operation] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def totals(self, name):
+        """[(labels, total)] of one counter, e.g. totals("library_bytes_written")."""
+        with self.lock:
+            return [(dict(labels), total) for (counter, labels), total in sorted(self.counters.items())
+                    if counter == name]
+
+    def snapshot(self):
+        """One dict per operation: count, total, mean, p50, p95, p99 and max, in seconds."""
+        with self.lock:
+            return [{"operation": operation, "count": histogram.count, "total": histogram.sum,
+                     "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                     "p50": histogram.quantile(0.5), "p95": histogram.quantile(0.95),
+                     "p99": histogram.quantile(0.99), "max": histogram.max}
+                    for operation, histogram in sorted(self.histograms.items())]
+
+    def openmetrics(self):
+        """All metrics in the OpenMetrics text exposition format."""
+        lines = []
+        with self.lock:
+            if self.histograms:
+                lines += ["# TYPE library_operation_seconds histogram",
+                          "# UNIT library_operation_seconds seconds",
+                          "# HELP library_operation_seconds Latency of library operations."]
+                for operation, histogram in sorted(self.histograms.items()):
+                    label = f'operation="{_escape(operation)}"'
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else repr(bound)
+                        lines.append(f'library_operation_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+                    lines.append(f"library_operation_seconds_count{{{label}}} {histogram.count}")
+                    lines.append(f"library_operation_seconds_sum{{{label}}} {histogram.sum!r}")
+
+            families = {}
+            for (name, labels), total in self.counters.items():
+                families.setdefault(name, []).append((labels, total))
+            for name, samples in sorted(families.items()):
+                lines.append(f"# TYPE {name} counter")
+                for labels, total in sorted(samples):
+                    label = ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels)
+                    lines.append(f"{name}_total{{{label}}} {total}" if label else f"{name}_total {total}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, file_path):
+        with open(file_path, "w", encoding="utf-8") as file:
+            file.write(self.openmetrics())
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# The process-wide registry; LIBRARY_METRICS=1 turns recording on from startup
+metrics = MetricsRegistry(enabled=os.environ.get("LIBRARY_METRICS") == "1")
+
+
+def timed(operation):
+    """Decorator recording the latency of every call under operation while metrics are enabled.
+
+    Calls that raise are also counted in library_operation_errors.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                metrics.count("library_operation_errors", operation=operation)
+                raise
+            finally:
+                metrics.observe(operation, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,272 @@
+import json
+import os
+import random
+import smtplib
+import threading
+import time
+import uuid
+from email.message import EmailMessage
+
+from files.Log import add_log
+
+
+class NotificationOutbox:
+    """Durable queue of waitlist notifications, stored as JSON lines.
+
+    ``add`` appends and fsyncs a record before returning, so a notification
+    queued inside a return survives a crash; delivery outcomes are appended
+    as separate records. Reopening the file restores whatever was still
+    pending. The file is rewritten with only the pending entries once
+    finished records dominate it.
+    """
+
+    def __init__(self, file_path=os.path.abspath("../files/notifications.jsonl"), compact_after=1000):
+        self.file_path = file_path
+        self.compact_after = compact_after
+        self.pending = {}  # id -> notification, in the order they were queued
+        self.claimed = set()  # ids currently being delivered by a dispatcher worker
+        self.finished = 0  # "done"/"failed" records in the file
+        self.condition = threading.Condition()
+        self._load()
+
+    def __len__(self):
+        with self.condition:
+            return len(self.pending)
+
+    def add(self, user, book_key, book_name, genre=None):
+        """Queue a notification that book_name is available for user."""
+        notification = {"id": uuid.uuid4().hex, "user": user, "book_key": book_key, "book_name": book_name,
+                        "genre": genre, "attempts": 0, "next_attempt": 0.0, "delivered": []}
+        with self.condition:
+            self._append({"op": "add", "notification": notification})
+            self.pending[notification["id"]] = notification
+            self.condition.notify()
+        return notification["id"]
+
+    def claim_due(self, limit, now=None):
+        """Hand out up to limit notifications whose retry time has come."""
+        now = time.time() if now is None else now
+        with self.condition:
+            batch = [notification for notification_id, notification in self.pending.items()
+                     if notification_id not in self.claimed and notification["next_attempt"] <= now]
+            batch = batch[:limit]
+            self.claimed.update(notification["id"] for notification in batch)
+            return batch
+
+    def next_due(self):
+        """Seconds until the earliest unclaimed notification is due, or None if there is none."""
+        with self.condition:
+            times = [notification["next_attempt"] for notification_id, notification in self.pending.items()
+                     if notification_id not in self.claimed]
+        return max(0.0, min(times) - time.time()) if times else None
+
+    def complete(self, notification_ids, status="done"):
+        """Record that notifications were delivered ("done") or given up on ("failed")."""
+        with self.condition:
+            for notification_id in notification_ids:
+                self._append({"op": status, "id": notification_id})
+                self.pending.pop(notification_id, None)
+                self.claimed.discard(notification_id)
+                self.finished += 1
+            if self.finished > self.compact_after and self.finished > len(self.pending):
+                self._compact()
+
+    def retry(self, notification):
+        """Persist the attempt count and next retry time of a notification and release it."""
+        with self.condition:
+            self._append({"op": "retry", "id": notification["id"], "attempts": notification["attempts"],
+                          "next_attempt": notification["next_attempt"], "delivered": notification["delivered"]})
+            self.claimed.discard(notification["id"])
+            self.condition.notify()
+
+    def _append(self, record):
+        with open(self.file_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _load(self):
+        if not os.path.exists(self.file_path):
+            return
+        valid_size = 0
+        with open(self.file_path, "rb") as file:
+            for line in file:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("missing newline")
+                    record = json.loads(line)
+                except ValueError:
+                    add_log(f"Discarding torn record at offset {valid_size} in notification outbox "
+                            f"{self.file_path}.", "warning")
+                    break
+                valid_size += len(line)
+                if record["op"] == "add":
+                    self.pending[record["notification"]["id"]] = record["notification"]
+                elif record["op"] == "retry" and record["id"] in self.pending:
+                    self.pending[record["id"]].update(attempts=record["attempts"], next_attempt=record["next_attempt"],
+                                                      delivered=record["delivered"])
+                elif record["op"] in ("done", "failed"):
+                    self.pending.pop(record["id"], None)
+                    self.finished += 1
+
+        # Cut off a torn tail so that new records are appended after the last good one
+        if valid_size < os.path.getsize(self.file_path):
+            with open(self.file_path, "r+b") as file:
+                file.truncate(valid_size)
+                os.fsync(file.fileno())
+
+    def _compact(self):
+        temp_path = f"{self.file_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            for notification in self.pending.values():
+                file.write(json.dumps({"op": "add", "notification": notification}, ensure_ascii=False,
+                                      separators=(",", ":")) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.file_path)
+        self.finished = 0
+
+
+class ObserverTransport:
+    """Delivers notifications to the registered librarian observers of a StatisticsManager."""
+    name = "observers"
+
+    def __init__(self, statistics_manager):
+        self.statistics_manager = statistics_manager
+
+    def send(self, batch):
+        for notification in batch:
+            self.statistics_manager.notify_observers(notification["user"], notification["book_name"],
+                                                     notification["book_key"], notification.get("genre"))
+
+
+class SMTPTransport:
+    """Emails each waiting user, one SMTP session per batch."""
+    name = "smtp"
+
+    def __init__(self, host="localhost", port=25, sender="library@localhost", username=None, password=None,
+                 use_tls=False, timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send(self, batch):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            for notification in batch:
+                smtp.send_message(self._message(notification))
+
+    def _message(self, notification):
+        user = notification["user"]
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = user["email"]
+        message["Subject"] = f"'{notification['book_name']}' is available"
+        message.set_content(f"Hello {user['name']},\n\n"
+                            f"The book '{notification['book_name']}' you were waiting for is now available.\n")
+        return message
+
+
+class NotificationDispatcher:
+    """Worker threads that drain a NotificationOutbox through a set of transports.
+
+    Due notifications are delivered in batches of up to ``batch_size``. A batch
+    that a transport fails on is retried with exponential backoff and jitter,
+    and only through the transports that have not delivered it yet; after
+    ``max_attempts`` a notification is marked failed and logged.
+    """
+
+    def __init__(self, outbox, transports, workers=1, batch_size=20, max_attempts=5, base_delay=1.0,
+                 max_delay=300.0):
+        self.outbox = outbox
+        self.transports = list(transports)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        self._stopping = False
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"NotificationDispatcher-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5.0):
+        """Stop the workers; notifications still pending stay in the outbox for the next start."""
+        with self.outbox.condition:
+            self._stopping = True
+            self.outbox.condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def drain(self, timeout=10.0):
+        """Wait until the outbox is empty; returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while len(self.outbox):
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def dispatch_once(self):
+        """Deliver one batch of due notifications; returns how many were taken."""
+        batch = self.outbox.claim_due(self.batch_size)
+        if not batch:
+            return 0
+        delivered = []
+        for transport in self.transports:
+            todo = [notification for notification in batch if transport.name not in notification["delivered"]]
+            if not todo:
+                continue
+            try:
+                transport.send(todo)
+            except Exception as e:
+                add_log(f"Notification transport '{transport.name}' failed for {len(todo)} notifications: {e}", "warning")
+                continue
+            for notification in todo:
+                notification["delivered"].append(transport.name)
+
+        for notification in batch:
+            if all(transport.name in notification["delivered"] for transport in self.transports):
+                delivered.append(notification["id"])
+            else:
+                self._schedule_retry(notification)
+        self.outbox.complete(delivered)
+        return len(batch)
+
+    def _schedule_retry(self, notification):
+        notification["attempts"] += 1
+        if notification["attempts"] >= self.max_attempts:
+            add_log(f"Giving up on notifying {notification['user'].get('email')} about "
+                    f"'{notification['book_name']}' after {notification['attempts']} attempts.", "error")
+            self.outbox.complete([notification["id"]], status="failed")
+            return
+        delay = min(self.max_delay, self.base_delay * 2 ** (notification["attempts"] - 1))
+        notification["next_attempt"] = time.time() + delay * random.uniform(0.5, 1.0)
+        self.outbox.retry(notification)
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                if self.dispatch_once():
+                    continue
+            except Exception as e:
+                add_log(f"Notification dispatch failed: {e}", "error")
+            with self.outbox.condition:
+                if self._stopping:
+                    return
+                delay = self.outbox.next_due()
+                self.outbox.condition.wait(1.0 if delay is None else max(delay, 0.01))
@@ -0,0 +1,81 @@
+import bisect
+import heapq
+
+
+class TopKIndex:
+    """Keeps the K keys with the highest score, ties broken by insertion order.
+
+    The top K entries live in a small sorted list; every other key sits in a
+    heap that may hold stale entries, which are skipped when they surface.
+    An update costs O(log n) and reading the top K costs O(K).
+    """
+
+    def __init__(self, k=10):
+        self.k = k
+        self.entries = {}  # key -> (-score, order, key), the current entry of every key
+        self.top = []  # Sorted entries of the best k keys
+        self.top_keys = set()
+        self.rest = []  # Heap of entries for keys outside the top k
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update(self, key, score, order):
+        """Set the score of key; order breaks ties and should not change for a key."""
+        entry = (-score, order, key)
+        previous = self.entries.get(key)
+        if previous == entry:
+            return
+        self.entries[key] = entry
+        if key in self.top_keys:
+            self.top.remove(previous)
+            bisect.insort(self.top, entry)
+        else:
+            heapq.heappush(self.rest, entry)
+        self._rebalance()
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None and key in self.top_keys:
+            self.top.remove(entry)
+            self.top_keys.discard(key)
+            self._rebalance()
+
+    def get_top(self):
+        """Return the keys of the top k entries, best first."""
+        return [key for _, _, key in self.top]
+
+    def _rebalance(self):
+        # Fill the top list, then swap while the best outside entry beats the worst inside one
+        while len(self.top) < self.k and self._peek_rest() is not None:
+            self._promote(heapq.heappop(self.rest))
+        while len(self.top) > self.k:
+            self._demote()
+        best = self._peek_rest()
+        while best is not None and self.top and best < self.top[-1]:
+            self._promote(heapq.heappop(self.rest))
+            self._demote()
+            best = self._peek_rest()
+
+        # Stale entries pile up as scores change; rebuild the heap when they dominate it
+        if len(self.rest) > 2 * len(self.entries) + 64:
+            self.rest = [entry for key, entry in self.entries.items() if key not in self.top_keys]
+            heapq.heapify(self.rest)
+
+    def _peek_rest(self):
+        while self.rest:
+            entry = self.rest[0]
+            key = entry[2]
+            if key not in self.top_keys and self.entries.get(key) == entry:
+                return entry
+            heapq.heappop(self.rest)
+        return None
+
+    def _promote(self, entry):
+        bisect.insort(self.top, entry)
+        self.top_keys.add(entry[2])
+
+    def _demote(self):
+        entry = self.top.pop()
+        self.top_keys.discard(entry[2])
+        heapq.heappush(self.rest, entry)
@@ -0,0 +1,240 @@
+import csv
+import os
+import sqlite3
+import threading
+
+from books.book import Book
+from files.Log import add_log
+from management.StatisticsManager import StatisticsManager, WaitlistQueue
+
+
+class SQLiteStorage:
+    """Embedded SQLite storage backend for books, request counts and waitlists.
+
+    It offers the same ``save_books``/``load_books`` interface as
+    LibraryFileManager, plus row-level updates and indexed queries so that a
+    change touches one row instead of rewriting the whole catalog.
+
+    This backend makes saves cheap, not memory use: LibraryController still
+    loads every book into the in-memory Library at startup, so the catalog
+    must still fit in RAM. The genre and availability lookups listed in
+    BOOK_QUERIES are answered by the indexes here; searches and popularity
+    are served from memory.
+    """
+    SCHEMA_VERSION = 2  # Stored in PRAGMA user_version; 1 added waitlist.priority, 2 dropped the author index
+    BOOK_COLUMNS = ("title", "author", "is_loaned", "copies", "genre", "year", "available", "request_counter")
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS books (
+            book_key TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            is_loaned INTEGER NOT NULL DEFAULT 0,
+            copies INTEGER NOT NULL,
+            genre TEXT,
+            year INTEGER,
+            available INTEGER NOT NULL,
+            request_counter INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_books_genre ON books (genre);
+        CREATE INDEX IF NOT EXISTS idx_books_available ON books (available);
+        CREATE TABLE IF NOT EXISTS request_counts (
+            book_key TEXT PRIMARY KEY,
+            request_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS waitlist (
+            book_key TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT,
+            email TEXT,
+            phone TEXT,
+            priority INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (book_key, position)
+        );
+    """
+
+    def __init__(self, db_path=os.path.abspath("../files/library.db")):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        self._migrate()
+
+    def close(self):
+        self.connection.close()
+
+    # Books
+
+    def save_books(self, library, statistics_manager=None):
+        """Write every book of the library in a single transaction."""
+        rows = [self._book_row(book_key, book) for book_key, book in library.books.items()]
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM books")
+            self.connection.executemany(self._UPSERT_BOOK, rows)
+        add_log(f"Saved {len(rows)} books to {self.db_path}.", "info")
+
+    def load_books(self, library, statistics_manager=None):
+        """Load every book from the database into the library (the whole table is read into memory)."""
+        count = 0
+        for book_key, book in self._query_books("SELECT book_key, {columns} FROM books"):
+            library.add_book(book, book_key)
+            if statistics_manager is not None:
+                statistics_manager.request_counts[book_key] = book.request_counter
+            count += 1
+        add_log(f"Loaded {count} books from {self.db_path}.", "info")
+
+    def upsert_book(self, book_key, book):
+        """Insert or update the row of a single book."""
+        with self._lock, self.connection:
+            self.connection.execute(self._UPSERT_BOOK, self._book_row(book_key, book))
+
+    def upsert_books(self, books):
+        """Insert or update the rows of many (book_key, Book) pairs in a single transaction."""
+        rows = [self._book_row(book_key, book) for book_key, book in books]
+        with self._lock, self.connection:
+            self.connection.executemany(self._UPSERT_BOOK, rows)
+
+    def delete_book(self, book_key):
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM books WHERE book_key = ?", (book_key,))
+            self.connection.execute("DELETE FROM waitlist WHERE book_key = ?", (book_key,))
+
+    def get_book(self, book_key):
+        books = self._query_books("SELECT book_key, {columns} FROM books WHERE book_key = ?", (book_key,))
+        return next((book for _, book in books), None)
+
+    def count_books(self):
+        return self.connection.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    # Library query name -> WHERE clause; each is served by an index on the books table
+    BOOK_QUERIES = {
+        "get_books_by_genre": "genre = ?",
+        "get_available_books": "available > 0",
+        "get_loaned_books": "is_loaned = 1",
+    }
+
+    def query_book_keys(self, method, *args):
+        """Return the keys of the books matched by one of BOOK_QUERIES, in insertion order."""
+        sql = f"SELECT book_key FROM books WHERE {self.BOOK_QUERIES[method]} ORDER BY rowid"
+        return [book_key for book_key, in self.connection.execute(sql, args)]
+
+    def get_books_by_genre(self, genre):
+        return [book for _, book in self._query_books(
+            "SELECT book_key, {columns} FROM books WHERE genre = ? ORDER BY rowid", (genre,))]
+
+    def get_available_books(self):
+        return [book for _, book in self._query_books(
+            "SELECT book_key, {columns} FROM books WHERE available > 0 ORDER BY rowid")]
+
+    def get_loaned_books(self):
+        return [book for _, book in self._query_books(
+            "SELECT book_key, {columns} FROM books WHERE is_loaned = 1 ORDER BY rowid")]
+
+    # Statistics
+
+    def save_statistics(self, statistics_manager):
+        """Replace all request counts and waitlists in a single transaction."""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM request_counts")
+            self.connection.execute("DELETE FROM waitlist")
+            self.connection.executemany(
+                "INSERT INTO request_counts (book_key, request_count) VALUES (?, ?)",
+                statistics_manager.request_counts.items())
+            for book_key, waitlist in statistics_manager.waiting_list.items():
+                self._insert_waitlist(book_key, waitlist)
+
+    def save_waitlist(self, book_key, waitlist, request_count):
+        """Rewrite the waitlist and request count of a single book."""
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO request_counts (book_key, request_count) VALUES (?, ?) "
+                "ON CONFLICT (book_key) DO UPDATE SET request_count = excluded.request_count",
+                (book_key, request_count))
+            self.connection.execute("DELETE FROM waitlist WHERE book_key = ?", (book_key,))
+            self._insert_waitlist(book_key, waitlist)
+
+    def load_statistics(self, statistics_manager):
+        """Load request counts and waitlists, keeping the queue order."""
+        for book_key, request_count in self.connection.execute("SELECT book_key, request_count FROM request_counts"):
+            statistics_manager.request_counts[book_key] = request_count
+            statistics_manager.waiting_list.setdefault(book_key, WaitlistQueue())
+        rows = self.connection.execute(
+            "SELECT book_key, name, email, phone, priority FROM waitlist ORDER BY book_key, position")
+        for book_key, name, email, phone, priority in rows:
+            statistics_manager.waiting_list.setdefault(book_key, WaitlistQueue()).enqueue(
+                {"name": name, "email": email, "phone": phone}, priority)
+
+    # Migration
+
+    def migrate_from_csv(self, books_file, statistics_file=None):
+        """Import books.csv (and optionally statistics.csv) into the database in one pass."""
+        with open(books_file, "r", encoding="utf-8", newline="") as file:
+            rows = []
+            for row in csv.DictReader(file):
+                try:
+                    available = int(row["available"])
+                    rows.append((
+                        StatisticsManager.generate_key(row["title"], row["author"]),
+                        row["title"], row["author"], int(available == 0), int(row["copies"]),
+                        row["genre"], int(row["year"]), available, int(row["request_counter"] or 0)))
+                except (KeyError, TypeError, ValueError) as e:
+                    add_log(f"Skipping invalid book row during migration: {row} - {e}", "warning")
+        with self._lock, self.connection:
+            self.connection.executemany(self._UPSERT_BOOK, rows)
+
+        if statistics_file and os.path.exists(statistics_file):
+            self.save_statistics(StatisticsManager(storage_file=statistics_file))
+
+        add_log(f"Migrated {len(rows)} books from {books_file} to {self.db_path}.", "info")
+        return len(rows)
+
+    # Helpers
+
+    def _migrate(self):
+        """Bring a database created by an older version up to SCHEMA_VERSION."""
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+        with self._lock, self.connection:
+            columns = {row[1] for row in self.connection.execute("PRAGMA table_info(waitlist)")}
+            if "priority" not in columns:
+                self.connection.execute("ALTER TABLE waitlist ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+            self.connection.execute("DROP INDEX IF EXISTS idx_books_author")
+            self.connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        add_log(f"Upgraded {self.db_path} from schema version {version} to {self.SCHEMA_VERSION}.", "info")
+
+    _UPSERT_BOOK = (
+        "INSERT INTO books (book_key, title, author, is_loaned, copies, genre, year, available, request_counter) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (book_key) DO UPDATE SET title = excluded.title, author = excluded.author, "
+        "is_loaned = excluded.is_loaned, copies = excluded.copies, genre = excluded.genre, year = excluded.year, "
+        "available = excluded.available, request_counter = excluded.request_counter"
+    )
+
+    def _insert_waitlist(self, book_key, waitlist):
+        self.connection.executemany(
+            "INSERT INTO waitlist (book_key, position, name, email, phone, priority) VALUES (?, ?, ?, ?, ?, ?)",
+            [(book_key, position, user.get("name"), user.get("email"), user.get("phone"), priority)
+             for position, (user, priority) in enumerate(waitlist.items())])
+
+    @staticmethod
+    def _book_row(book_key, book):
+        return (book_key, book.title, book.author, int(bool(book.is_loaned)), book.copies, book.genre,
+                book.year, book.available, book.request_counter)
+
+    def _query_books(self, sql, params=()):
+        cursor = self.connection.execute(sql.format(columns=", ".join(self.BOOK_COLUMNS)), params)
+        for book_key, title, author, is_loaned, copies, genre, year, available, request_counter in cursor:
+            yield book_key, Book(
+                title=title,
+                author=author,
+                is_loaned=bool(is_loaned),
+                copies=copies,
+                genre=genre,
+                year=year,
+                available=available,
+                request_counter=request_counter
+            )
+
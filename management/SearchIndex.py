@@ -0,0 +1,81 @@
+import unicodedata
+from array import array
+
+
+def normalize(text):
+    """Casefold text and strip accents, so that 'Café' and 'CAFE' index the same way."""
+    if text.isascii():
+        return text.lower()  # Same result, without the per-character Unicode work
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class NGramIndex:
+    """Inverted trigram index over normalized text.
+
+    Every indexed key gets an ordinal, and each trigram's posting list is an
+    ``array('I')`` of ordinals, a few bytes per entry instead of a set of key
+    strings. ``candidates`` returns the keys listed under the rarest trigram
+    of the query, a superset of the matches that the caller confirms.
+    Removed keys are only forgotten; their ordinals are dropped from the
+    postings once they make up most of the index.
+    """
+    N = 3
+
+    def __init__(self):
+        self.postings = {}  # n-gram -> array of ordinals, ascending
+        self.keys = []  # ordinal -> key, None once removed
+        self.ordinals = {}  # key -> ordinal
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def add(self, key, text):
+        """Index text under key, replacing a previous entry for the same key."""
+        self.remove(key)
+        ordinal = len(self.keys)
+        self.keys.append(key)
+        self.ordinals[key] = ordinal
+        for gram in self._grams(normalize(text)):
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array("I")
+            posting.append(ordinal)
+
+    def remove(self, key):
+        ordinal = self.ordinals.pop(key, None)
+        if ordinal is None:
+            return
+        self.keys[ordinal] = None
+        self.removed += 1
+        if self.removed > 1024 and self.removed > len(self.ordinals):
+            self._compact()
+
+    def candidates(self, query):
+        """Keys that may contain query, in ordinal order; None if the query is too short to narrow them down."""
+        grams = self._grams(normalize(query))
+        if not grams:
+            return None
+        rarest = min((self.postings.get(gram, ()) for gram in grams), key=len)
+        keys = self.keys
+        return [keys[ordinal] for ordinal in rarest if keys[ordinal] is not None]
+
+    def _compact(self):
+        renumbered = array("I", [0]) * len(self.keys)
+        live = [key for key in self.keys if key is not None]
+        for ordinal, key in enumerate(live):
+            renumbered[self.ordinals[key]] = ordinal
+        keys = self.keys
+        postings = {}
+        for gram, posting in self.postings.items():
+            kept = array("I", [renumbered[ordinal] for ordinal in posting if keys[ordinal] is not None])
+            if kept:
+                postings[gram] = kept
+        self.postings = postings
+        self.keys = live
+        self.ordinals = {key: ordinal for ordinal, key in enumerate(live)}
+        self.removed = 0
+
+    def _grams(self, text):
+        return {text[i:i + self.N] for i in range(len(text) - self.N + 1)}
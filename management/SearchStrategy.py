@@ -1,18 +1,39 @@
 from abc import ABC, abstractmethod
-import pandas as pd
-from tkinter import messagebox
-import tkinter as tk
-import os
 
 from files.Log import add_log
+from management.Metrics import timed
 
 
-df = pd.read_csv(os.path.abspath("../files/books.csv"))
+def _messagebox():
+    # tkinter is only needed once results are shown, so keep it out of the import graph until then
+    from tkinter import messagebox
+    return messagebox
+
 
 class SearchStrategy(ABC):
+    """A way of finding books.
+
+    ``find`` only computes the matching books and touches no widgets, so it can
+    run on a worker thread; ``search`` runs it and shows the result. Every
+    subclass's ``find`` is timed as "search.<class name>".
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "find" in cls.__dict__:
+            cls.find = timed(f"search.{cls.__name__}")(cls.find)
+
     @abstractmethod
-    def search(self, query, books, controller):
-        pass
+    def find(self, query, books_in_lib):
+        """Return (matching_books, caller); raises ValueError if the query cannot be searched."""
+
+    def search(self, query, books, books_in_lib):
+        try:
+            result = self.find(query, books_in_lib)
+        except ValueError as e:
+            _messagebox().showinfo("Search", str(e))
+            return
+        SearchStrategy.show_results(result, books)
 
     @staticmethod
     def add_logs(caller, flag):
@@ -42,70 +63,76 @@ class SearchStrategy(ABC):
             add_log('Failed to display books by category.', "info")
 
     @staticmethod
-    def update_book_list(func):
-        def wrapper(self, query, books, books_in_lib):
-            result = func(self, query, books, books_in_lib)
+    def show_results(result, books):
+        """Put the result of find into books, a VirtualBookTable or a Treeview."""
+        matching_books ,caller = result
+
+        if not matching_books :
+            SearchStrategy.add_logs(caller, "fail")
+            _messagebox().showinfo("Search", "No books found.")
+        else:
+            SearchStrategy.add_logs(caller, "successfully")
+            if hasattr(books, "show"):
+                books.show(matching_books, keep_position=False)  # VirtualBookTable: only the visible page is redrawn
+                return
+            books.delete(*books.get_children())
+            for book in matching_books:
+                books.insert(
+                    "", "end",
+                    values=(book.title,book.author,"yes" if book.is_loaned else "no",book.copies,book.genre, book.year,book.available,book.request_counter))
 
-            matching_books ,caller = result
 
-            if matching_books is None:
-                return
+PLACEHOLDERS = ("enter book name...", "enter book author...", "enter author name...")
 
-            if not matching_books :
-                SearchStrategy.add_logs(caller, "fail")
-                messagebox.showinfo("Search", "No books found.")
-            else:
-                SearchStrategy.add_logs(caller, "successfully")
-                books.delete(*books.get_children())
-                for book in matching_books:
-                    books.insert(
-                        "", tk.END,
-                        values=(book.title,book.author,"yes" if book.is_loaned else "no",book.copies,book.genre, book.year,book.available,book.request_counter))
 
-        return wrapper
+def _check_query(query):
+    if not query or query.lower() in PLACEHOLDERS:
+        raise ValueError("Please enter a search term.")
 
 
 class SearchBookName(SearchStrategy):
-    @SearchStrategy.update_book_list
-    def search(self, query, books, books_in_lib):
-        if not query or query == "Enter book name..." or query == "Enter book author...":
-            messagebox.showinfo("Search", "Please enter a search term.")
-            return
+    def find(self, query, books_in_lib):
+        _check_query(query)
+        if hasattr(books_in_lib, "search_title"):
+            return books_in_lib.search_title(query),"BookName"
         return [book for book in books_in_lib if query.lower() in book.title.lower()],"BookName"
 
 
 class SearchAuthorName(SearchStrategy):
-    @SearchStrategy.update_book_list
-    def search(self, query, books, books_in_lib):
-        if not query or query == "Enter book name..." or query == "Enter book author...":
-            messagebox.showinfo("Search", "Please enter a search term.")
-            return
+    def find(self, query, books_in_lib):
+        _check_query(query)
+        if hasattr(books_in_lib, "search_author"):
+            return books_in_lib.search_author(query),"AuthorName"
         return [book for book in books_in_lib if query.lower() in book.author.lower()],"AuthorName"
 
 
 class SearchAllBooks(SearchStrategy):
-    @SearchStrategy.update_book_list
-    def search(self, query, books, books_in_lib):
+    def find(self, query, books_in_lib):
+        if hasattr(books_in_lib, "get_books"):
+            return books_in_lib.get_books(),"AllBooks"
         return [book for book in books_in_lib],"AllBooks"
 
 
 class SearchAvailableBooks(SearchStrategy):
-    @SearchStrategy.update_book_list
-    def search(self, query, books, books_in_lib):
+    def find(self, query, books_in_lib):
+        if hasattr(books_in_lib, "get_available_books"):
+            return books_in_lib.get_available_books(),"AvailableBooks"
         return [book for book in books_in_lib if book.available > 0],"AvailableBooks"
 
 
 class SearchBorrowedBooks(SearchStrategy):
-    @SearchStrategy.update_book_list
-    def search(self, query, books, books_in_lib):
+    def find(self, query, books_in_lib):
+        if hasattr(books_in_lib, "get_loaned_books"):
+            return books_in_lib.get_loaned_books(),"BorrowedBooks"
         return [book for book in books_in_lib if book.is_loaned],"BorrowedBooks"
 
 
 class SearchCategory(SearchStrategy):
-    @SearchStrategy.update_book_list
-    def search(self, query, books, books_in_lib):
+    def find(self, query, books_in_lib):
         if query == "Categories":
             return [],"category"
+        if hasattr(books_in_lib, "get_books_by_genre"):
+            return books_in_lib.get_books_by_genre(query),"Category"
         return [book for book in books_in_lib if query == book.genre],"Category"
 
 
@@ -113,5 +140,8 @@ class Search:
     def __init__(self, strategy: SearchStrategy):
         self.strategy = strategy
 
+    def find(self, query, controller):
+        return self.strategy.find(query, controller)
+
     def search(self, query, books, controller):
-        self.strategy.search(query, books, controller)
\ No newline at end of file
+        self.strategy.search(query, books, controller)
@@ -1,5 +1,13 @@
 import csv
+import itertools
 import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from management.FileSync import SyncedRows, atomic_write, file_lock, file_stamp
+from management.Metrics import metrics, timed
+from files.Log import add_log
 
 
 class MyIterator:
@@ -11,42 +19,171 @@ class MyIterator:
         return self
 
     def __next__(self):
-        if self.index < len(self.collection.items):
-            item = self.collection.items[self.index]
+        if self.index < len(self.collection):
+            item = self.collection[self.index]
             self.index += 1
             return item
         else:
             raise StopIteration
 
+class WaitlistQueue:
+    """Waitlist for one book: FIFO within priority tiers, deduplicated by email.
+
+    Each tier is a deque of emails plus running sequence numbers, so enqueue,
+    dequeue, duplicate checks and position lookups cost O(1) per tier.
+    Higher priority tiers are served first; iteration follows service order.
+    """
+
+    def __init__(self):
+        self.tiers = {}  # priority -> deque of user keys
+        self.entries = {}  # user key -> (priority, sequence, user)
+        self.heads = {}  # priority -> sequence number of the user at the front of the tier
+        self.tails = {}  # priority -> sequence number for the next user in the tier
+
+    @staticmethod
+    def user_key(user):
+        return (user.get("email") or user.get("name") or "").strip().lower()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, user):
+        return (self.user_key(user) if isinstance(user, dict) else str(user).lower()) in self.entries
+
+    def __iter__(self):
+        for user, _ in self.items():
+            yield user
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        for user in itertools.islice(self, index, None):
+            return user
+        raise IndexError("waitlist index out of range")
+
+    def items(self):
+        """Yield (user, priority) in the order users will be served."""
+        for priority in sorted(self.tiers, reverse=True):
+            for key in self.tiers[priority]:
+                yield self.entries[key][2], priority
+
+    def enqueue(self, user, priority=0):
+        """Add a user at the back of their tier; returns False if they are already waiting."""
+        key = self.user_key(user)
+        if key in self.entries:
+            return False
+        if priority not in self.tiers:
+            self.tiers[priority] = deque()
+            self.heads[priority] = self.tails[priority] = 0
+        self.tiers[priority].append(key)
+        self.entries[key] = (priority, self.tails[priority], user)
+        self.tails[priority] += 1
+        return True
+
+    def dequeue(self):
+        """Remove and return the next user to serve, or None if nobody is waiting."""
+        if not self.tiers:
+            return None
+        priority = max(self.tiers)
+        tier = self.tiers[priority]
+        key = tier.popleft()
+        self.heads[priority] += 1
+        if not tier:
+            del self.tiers[priority], self.heads[priority], self.tails[priority]
+        return self.entries.pop(key)[2]
+
+    def position(self, email):
+        """Return the 1-based place of a user in the queue, or None if they are not waiting."""
+        entry = self.entries.get(email.strip().lower())
+        if entry is None:
+            return None
+        priority, sequence, _ = entry
+        ahead = sum(len(tier) for other, tier in self.tiers.items() if other > priority)
+        return ahead + sequence - self.heads[priority] + 1
+
+
 class StatisticsManager:
-    observers = []
-    def __init__(self, storage_file=os.path.abspath("../files/statistics.csv")):
-        """Initialize the StatisticsManager with CSV-based persistence."""
+    def __init__(self, storage_file=os.path.abspath("../files/statistics.csv"), backend=None, outbox=None):
+        """Initialize the StatisticsManager with CSV-based or database-backed persistence."""
         self.storage_file = storage_file
+        self.backend = backend  # Optional storage backend with row-level updates (e.g. SQLiteStorage)
+        self.outbox = outbox  # Optional NotificationOutbox; observers are then notified asynchronously
         self.waiting_list = {}  # In-memory dictionary for waitlists
         self.request_counts = {}  # In-memory dictionary for request counts
+        self.lock = threading.RLock()  # Guards the waitlists and their saves against concurrent desks
+        self._batch_depth = 0  # Open batch() blocks; while positive, saves are collected in _dirty
+        self._dirty = set()
+        self._on_dirty = None  # Set by defer_saves: saves are then collected in _dirty and left to a writer
+        # Subscriptions, each keyed by observer so registering twice does not notify twice
+        self.observers = {}  # observer key -> observer notified about every book
+        self.book_observers = {}  # book key -> {observer key: observer}
+        self.genre_observers = {}  # genre -> {observer key: observer}
+        self.synced = SyncedRows(storage_file)  # The CSV file as last read or written, to merge others' saves
 
         # Load data from the CSV file at initialization
         self.load_data()
 
-    def register_observer(self, observer):
-        StatisticsManager.observers.append(observer)
+    @staticmethod
+    def _observer_key(observer):
+        # Librarians are identified by ID, so a reloaded Librarian replaces its old subscription
+        observer_id = getattr(observer, "id", None)
+        return (type(observer).__name__, observer_id) if observer_id is not None else id(observer)
+
+    def register_observer(self, observer, book_key=None, genre=None):
+        """Subscribe an observer to every book, or only to one book key or one genre."""
+        if book_key is not None:
+            subscriptions = self.book_observers.setdefault(book_key, {})
+        elif genre is not None:
+            subscriptions = self.genre_observers.setdefault(genre, {})
+        else:
+            subscriptions = self.observers
+        subscriptions[self._observer_key(observer)] = observer
+
+    def unregister_observer(self, observer):
+        """Remove every subscription of an observer."""
+        key = self._observer_key(observer)
+        self.observers.pop(key, None)
+        for targeted in (self.book_observers, self.genre_observers):
+            for target, subscriptions in list(targeted.items()):
+                subscriptions.pop(key, None)
+                if not subscriptions:
+                    del targeted[target]
+
+    def get_observers(self, book_key=None, genre=None):
+        """Return the observers interested in a book, each once."""
+        observers = dict(self.observers)
+        if book_key is not None:
+            observers.update(self.book_observers.get(book_key, {}))
+        if genre is not None:
+            observers.update(self.genre_observers.get(genre, {}))
+        return list(observers.values())
 
-    def notify_observers(self,user_name, book_key):
-        for observer in StatisticsManager.observers:
-            observer.update(observer,user_name,book_key)
+    def notify_observers(self, user_name, book_name, book_key=None, genre=None):
+        """Notify the observers subscribed to everything, to book_key or to genre; returns how many."""
+        observers = self.get_observers(book_key, genre)
+        for observer in observers:
+            observer.update(observer,user_name,book_name)
+        return len(observers)
 
-    def add_user_to_waitlist(self, book_key, user):
-        """Add a user to the waitlist for a specific book."""
-        if book_key not in self.waiting_list:
-            self.waiting_list[book_key] = []
-        if user not in self.waiting_list[book_key]:
-            self.waiting_list[book_key].append(user)
-        self.save_data()  # Save after modification
+    @timed("statistics.add_user_to_waitlist")
+    def add_user_to_waitlist(self, book_key, user, priority=0):
+        """Add a user to the waitlist for a specific book; users already waiting are not added twice."""
+        with self.lock:
+            if book_key not in self.waiting_list:
+                self.waiting_list[book_key] = WaitlistQueue()
+            if self.waiting_list[book_key].enqueue(user, priority):
+                self._persist(book_key)  # Save after modification
 
     def get_waitlist(self, book_key):
-        """Retrieve the waiting list for a specific book."""
-        return self.waiting_list.get(book_key, [])
+        """Retrieve the waiting list for a specific book, in the order users will be served."""
+        with self.lock:
+            return list(self.waiting_list.get(book_key, ()))
+
+    def get_waitlist_position(self, book_key, email):
+        """Return the 1-based place of a user in a book's waitlist, or None if they are not on it."""
+        with self.lock:
+            waitlist = self.waiting_list.get(book_key)
+            return waitlist.position(email) if waitlist is not None else None
 
     def get_waitlist_count(self):
         return len(self.waiting_list)
@@ -55,43 +192,172 @@ class StatisticsManager:
         """Retrieve the request count for a specific book."""
         return self.request_counts.get(book_key, 0)
 
-    def notify_waitlist(self, book_key,book_name):
+    @timed("statistics.notify_waitlist")
+    def notify_waitlist(self, book_key,book_name, genre=None):
         """Notify the next user on the waitlist when a book becomes available."""
-        user = self.waiting_list[book_key].pop(0)
-        self.notify_observers(user,book_name)
-        self.save_data()
+        with self.lock:
+            waitlist = self.waiting_list.get(book_key)
+            user = waitlist.dequeue() if waitlist is not None else None
+            if user is None:
+                return None
+            if self.outbox is not None:
+                # Queue the notification durably; a NotificationDispatcher delivers it off this thread
+                self.outbox.add(user, book_key, book_name, genre)
+            else:
+                self.notify_observers(user,book_name, book_key, genre)
+            self._persist(book_key)
+            return user
+
+    @contextmanager
+    def batch(self):
+        """Collect the saves of a block of changes and write them once when the block ends.
+
+        Batches may be nested; the outermost one writes.
+        """
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._on_dirty is None:
+                    self.save_pending()
+
+    def defer_saves(self, on_dirty):
+        """Leave waitlist saves to a background writer.
+
+        Changes are only collected and reported by calling on_dirty(); the
+        writer calls save_pending() to write them.
+        """
+        self._on_dirty = on_dirty
+
+    def save_pending(self):
+        """Write the waitlists changed since the last save, if any."""
+        with self.lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+            try:
+                if self.backend is not None:
+                    for book_key in dirty:
+                        self._write(book_key)
+                else:
+                    self.save_data()
+            except Exception:
+                self._dirty |= dirty  # Retried by the next save
+                raise
+
+    def _persist(self, book_key):
+        """Save a changed waitlist now, or collect it while a batch is open or saves are deferred."""
+        with self.lock:
+            if self._batch_depth or self._on_dirty is not None:
+                self._dirty.add(book_key)
+                if self._on_dirty is not None:
+                    self._on_dirty()
+                return
+            self._write(book_key)
+
+    def _write(self, book_key):
+        """Save a changed waitlist: one row through the backend, or the whole CSV file."""
+        if self.backend is not None:
+            self.backend.save_waitlist(book_key, self.waiting_list.get(book_key, WaitlistQueue()),
+                                       self.request_counts.get(book_key, 0))
+        else:
+            self.save_data()
 
+    @timed("statistics.save_data")
     def save_data(self):
-        """Save the waiting list and request counts to a CSV file."""
-        with open(self.storage_file, mode="w", newline="") as csvfile:
-            writer = csv.writer(csvfile)
-            # Write the header
-            writer.writerow(["title:author", "request_count", "waitlist"])
-            # Write data rows: Combine title-author as the key
-            for book_key, waitlist in self.waiting_list.items():
-                waitlist_str = ";".join([f"{u['name']},{u['email']},{u['phone']}" for u in waitlist])
-                request_count = self.request_counts.get(book_key, 0)
-                writer.writerow([book_key, request_count, waitlist_str])
+        """Save the waiting list and request counts to a CSV file.
 
+        The file is locked and replaced atomically; rows another process saved
+        since we last read it are merged in first instead of being overwritten.
+        """
+        with self.lock:
+            if self.backend is not None:
+                self.backend.save_statistics(self)
+                return
+            with file_lock(self.storage_file):
+                if self.synced.changed():
+                    self._merge_from_disk()
+                rows = self._rows()
+                with atomic_write(self.storage_file) as csvfile:
+                    writer = csv.writer(csvfile)
+                    # Write the header
+                    writer.writerow(["title:author", "request_count", "waitlist"])
+                    # Write data rows: Combine title-author as the key
+                    writer.writerows((book_key,) + row for book_key, row in rows.items())
+                if metrics.enabled:
+                    metrics.count("library_bytes_written", os.path.getsize(self.storage_file),
+                                  file=os.path.basename(self.storage_file))
+                self.synced.track(rows)
+
+    @timed("statistics.load_data")
     def load_data(self):
         """Load the waiting list and request counts from a CSV file."""
-        if not os.path.exists(self.storage_file):
+        if self.backend is not None:
+            self.backend.load_statistics(self)
             return
+        stamp = file_stamp(self.storage_file)
+        rows = self._read_rows()
+        for book_key, row in rows.items():
+            self._apply_row(book_key, row)
+        self.synced.track(rows, stamp)
 
-        with open(self.storage_file, mode="r") as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                book_key = row["title:author"]
-                self.request_counts[book_key] = int(row["request_count"])
-                # Parse the waitlist (semicolon-separated)
-                waitlist_str = row["waitlist"]
-                if waitlist_str:
-                    self.waiting_list[book_key] = [
-                        dict(zip(["name", "email", "phone"], user.split(",")))
-                        for user in waitlist_str.split(";")
-                    ]
-                else:
-                    self.waiting_list[book_key] = []
+    @timed("statistics.reload_data")
+    def reload_data(self):
+        """Apply the waitlists and request counts other processes saved since the file was last read or written.
+
+        Returns the number of books whose row changed.
+        """
+        with self.lock:
+            if self.backend is not None or not self.synced.changed():
+                return 0
+            with file_lock(self.storage_file, shared=True):
+                return self._merge_from_disk()
+
+    def _merge_from_disk(self):
+        stamp = file_stamp(self.storage_file)
+        theirs = self._read_rows()
+        changes, conflicts = self.synced.merge(self._rows(), theirs)
+        for book_key, row in changes.items():
+            self._apply_row(book_key, row)
+        if conflicts:
+            add_log("Kept local waitlist changes to %d books also changed in %s: %s", "warning", len(conflicts),
+                    self.storage_file, conflicts[:5])
+        self.synced.track(theirs, stamp)
+        return len(changes)
+
+    def _rows(self):
+        rows = {}
+        for book_key, waitlist in self.waiting_list.items():
+            # Users are written in service order; a priority is only added when it is not the default
+            waitlist_str = ";".join(
+                f"{u['name']},{u['email']},{u['phone']}" + (f",{priority}" if priority else "")
+                for u, priority in waitlist.items())
+            rows[book_key] = (str(self.request_counts.get(book_key, 0)), waitlist_str)
+        return rows
+
+    def _read_rows(self):
+        if not os.path.exists(self.storage_file):
+            return {}
+        with open(self.storage_file, mode="r", newline="", encoding="utf-8") as csvfile:
+            return {row["title:author"]: (row["request_count"], row["waitlist"] or "")
+                    for row in csv.DictReader(csvfile)}
+
+    def _apply_row(self, book_key, row):
+        if row is None:
+            self.waiting_list.pop(book_key, None)
+            return
+        request_count, waitlist_str = row
+        self.request_counts[book_key] = int(request_count)
+        # Parse the waitlist (semicolon-separated)
+        self.waiting_list[book_key] = WaitlistQueue()
+        if waitlist_str:
+            for entry in waitlist_str.split(";"):
+                fields = entry.split(",")
+                user = dict(zip(["name", "email", "phone"], fields))
+                priority = int(fields[3]) if len(fields) > 3 else 0
+                self.waiting_list[book_key].enqueue(user, priority)
 
     @staticmethod
     def generate_key(title, author):
@@ -99,4 +365,4 @@ class StatisticsManager:
         return f"{title.lower()}:{author.lower()}"
 
     def __iter__(self):
-        return MyIterator(StatisticsManager.observers)
+        return MyIterator(self.get_observers())
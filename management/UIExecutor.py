@@ -0,0 +1,109 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from files.Log import add_log
+
+
+class UIExecutor:
+    """Runs controller work on a worker thread and hands results back to the Tk thread.
+
+    Tk widgets may only be touched from the thread running the mainloop, so
+    workers never call back directly: finished tasks put their callback on a
+    queue that the Tk thread drains every ``poll_interval`` ms via
+    ``root.after``. There is a single worker by default, which keeps
+    controller calls in the order they were submitted.
+
+    ``submit_latest`` tags a task with a name and drops the result of any
+    earlier task with that name that was still running (e.g. a search the
+    user has already typed past); ``debounce`` delays a call until input has
+    been quiet for a while.
+    """
+
+    def __init__(self, root, workers=1, poll_interval=20):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="LibraryGUI")
+        self.results = queue.SimpleQueue()  # Callbacks waiting to run on the Tk thread
+        self.latest = {}  # task name -> (generation, future) of the newest submission
+        self.timers = {}  # debounce name -> root.after id
+        self._poll_id = None
+        self._closed = False
+        self._poll()
+
+    def submit(self, func, *args, on_done=None, on_error=None, **kwargs):
+        """Run func(*args, **kwargs) on a worker; on_done(result) or on_error(exception) run on the Tk thread."""
+        return self._submit(None, func, args, kwargs, on_done, on_error)
+
+    def submit_latest(self, name, func, *args, on_done=None, on_error=None, **kwargs):
+        """Like submit, but only the newest task submitted under name gets its callbacks run."""
+        generation, future = self.latest.get(name, (0, None))
+        if future is not None:
+            future.cancel()  # Never started: skip it entirely
+        return self._submit((name, generation + 1), func, args, kwargs, on_done, on_error)
+
+    def debounce(self, name, delay, func, *args):
+        """Call func(*args) on the Tk thread once delay ms pass without another debounce under name."""
+        timer = self.timers.pop(name, None)
+        if timer is not None:
+            self.root.after_cancel(timer)
+
+        def fire():
+            self.timers.pop(name, None)
+            func(*args)
+
+        self.timers[name] = self.root.after(delay, fire)
+
+    def shutdown(self, wait=True):
+        """Stop polling and wait for running tasks; their callbacks are dropped."""
+        self._closed = True
+        if self._poll_id is not None:
+            try:
+                self.root.after_cancel(self._poll_id)
+            except Exception:
+                pass  # The window is already gone
+        for timer in self.timers.values():
+            try:
+                self.root.after_cancel(timer)
+            except Exception:
+                pass
+        self.timers.clear()
+        self.executor.shutdown(wait=wait)
+
+    def _submit(self, tag, func, args, kwargs, on_done, on_error):
+        future = self.executor.submit(func, *args, **kwargs)
+        if tag is not None:
+            self.latest[tag[0]] = (tag[1], future)
+
+        def finished(future):
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None:
+                result = future.result()
+                self.results.put(lambda: self._deliver(tag, on_done, result))
+            else:
+                self.results.put(lambda: self._deliver(tag, on_error, error, failed=True))
+
+        future.add_done_callback(finished)
+        return future
+
+    def _deliver(self, tag, callback, value, failed=False):
+        if tag is not None and self.latest.get(tag[0], (None,))[0] != tag[1]:
+            return  # A newer task with this name was submitted, this result is stale
+        if callback is not None:
+            callback(value)
+        elif failed:
+            add_log("Background task failed: %s", "error", value)
+
+    def _poll(self):
+        while True:
+            try:
+                callback = self.results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback()
+            except Exception as e:
+                add_log("UI callback failed: %s", "error", e)
+        if not self._closed:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
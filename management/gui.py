@@ -1,18 +1,29 @@
-from tkinter import ttk, simpledialog
+import tkinter as tk
+from tkinter import ttk, simpledialog, messagebox, filedialog
 from management import StatisticsManager
 from management.SearchStrategy import *
+from management.BookTable import VirtualBookTable
+from management.UIExecutor import UIExecutor
+from management.Metrics import metrics
 
 class LibraryGUI:
-    def __init__(self, controller):
+    def __init__(self, controller, reload_interval=None):
         self.controller = controller
         self.stat_manager = StatisticsManager
 
         # Create the main window
         self.root = tk.Tk()
         self.root.title("Library Management System")
+        # Controller calls run here, off the Tk thread, and report back through root.after
+        self.executor = UIExecutor(self.root)
+        # When other desks save to the same files, pick up their changes every reload_interval ms
+        self.reload_interval = reload_interval
+        if reload_interval:
+            self.root.after(reload_interval, self.reload_if_changed)
 
         # Initialize GUI components
         self.book_list = None  # TreeView for book details
+        self.book_table = None  # Pages the current book list through book_list
         self.search_entry = None
 
         # Display login screen initially
@@ -50,6 +61,7 @@ class LibraryGUI:
             ("Lend Book", self.lend_book_screen),
             ("Return Book", self.return_book_screen),
             ("Popular Books", self.display_popular_books),
+            ("Diagnostics", self.display_diagnostics),
             ("Logout", self.logout)
         ]
 
@@ -60,13 +72,13 @@ class LibraryGUI:
     def clear_all_books(self):
         """Clear the books display, including the TreeView and its data."""
         if hasattr(self, "book_list") and self.book_list:
-            for row in self.book_list.get_children():
-                self.book_list.delete(row)
+            self.book_table.clear()
 
             if self.book_list.master:
                 self.book_list.master.destroy()
 
             self.book_list = None
+            self.book_table = None
 
     def create_book_list_table(self):
         """Set up the TreeView for displaying book data."""
@@ -81,26 +93,18 @@ class LibraryGUI:
 
         self.book_list.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
 
-        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.book_list.yview)
-        self.book_list.configure(yscrollcommand=scrollbar.set)
+        # The table only renders the visible page, so the scrollbar follows the table, not the tree
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.book_table = VirtualBookTable(self.book_list, scrollbar)
 
     def update_book_list(self):
-        """Update the TreeView with books from the library."""
-        # Clear the current list
-        for row in self.book_list.get_children():
-            self.book_list.delete(row)
-
-        # Populate the list with books
-        books = self.controller.library.get_books()
-
-        # Assuming books is a list of objects where each object has attributes title, author, etc.
-        for book in books:
-            self.book_list.insert(
-                "", tk.END,
-                values=(book.title, book.author, "yes" if book.is_loaned else "no", book.copies,
-                        book.genre, book.year, book.available, book.request_counter)
-            )
+        """Show every book of the library; only rows that differ from the screen are touched."""
+        def show(books):
+            if self.book_table is not None:
+                self.book_table.show(books)
+
+        self.executor.submit_latest("search", self.controller.library.get_books, on_done=show)
 
     def all_books(self):
         self.create_book_list_table()
@@ -141,16 +145,24 @@ class LibraryGUI:
             username = username_entry.get().strip()
             librarian_id = id_entry.get().strip()
             password = password_entry.get().strip()
-            try:
-                self.controller.authenticate_librarian(username, librarian_id, password)
+
+            def logged_in(result):
                 login_frame.destroy()
                 self.create_dashboard()
                 add_log("logged in successfully","info")
-            except PermissionError as e:
+
+            def failed(e):
                 add_log("logged in fail", "info")
+                login_button.config(state=tk.NORMAL)
                 error_label.config(text=str(e))
 
-        tk.Button(login_frame, text="Login", command=on_login).pack(pady=10)
+            # Password hashing takes a while; keep it off the Tk thread
+            login_button.config(state=tk.DISABLED)
+            self.executor.submit(self.controller.authenticate_librarian, username, librarian_id, password,
+                                 on_done=logged_in, on_error=failed)
+
+        login_button = tk.Button(login_frame, text="Login", command=on_login)
+        login_button.pack(pady=10)
         tk.Button(login_frame, text="Register New Librarian",
                   command=lambda: [login_frame.destroy(), self.register_screen()]).pack(pady=5)
 
@@ -185,16 +197,22 @@ class LibraryGUI:
                 add_log("registered fail", "info")
                 return
 
-            try:
-                self.controller.register_librarian(username, librarian_id, password)
+            def registered(result):
                 messagebox.showinfo("Success", "Librarian registered successfully!")
                 add_log("registered successfully", "info")
                 register_frame.destroy()
                 self.login_screen()
-            except ValueError as e:
+
+            def failed(e):
+                register_button.config(state=tk.NORMAL)
                 error_label.config(text=str(e))
 
-        tk.Button(register_frame, text="Register", command=on_register).pack(pady=10)
+            register_button.config(state=tk.DISABLED)
+            self.executor.submit(self.controller.register_librarian, username, librarian_id, password,
+                                 on_done=registered, on_error=failed)
+
+        register_button = tk.Button(register_frame, text="Register", command=on_register)
+        register_button.pack(pady=10)
         tk.Button(register_frame, text="Back to Login",
                   command=lambda: [register_frame.destroy(), self.login_screen()]).pack(pady=5)
 
@@ -235,6 +253,10 @@ class LibraryGUI:
 
         self.search_entry.bind("<FocusIn>", clear_placeholder)
 
+        # Search as you type, once typing pauses for 300 ms
+        self.search_entry.bind("<KeyRelease>", lambda event: self.executor.debounce(
+            "search", 300, lambda: self.search_books(self.combo.get(), live=True)))
+
         search_button = ttk.Button(search_frame, text="Search", command=lambda: self.search_books(self.combo.get()))
         search_button.grid(row=1, column=2, padx=10, sticky="w")
 
@@ -261,16 +283,11 @@ class LibraryGUI:
         self.combo.grid(row=0, column=1, padx=5, pady=5, sticky="w")
         self.combo.set("All Books")
 
-        def get_all_categories():
-            categories = []
-            for book in self.controller.library.get_books():
-                if book.genre not in categories:
-                    categories.append(book.genre)
-            return categories
+        categories = self.controller.library.get_genres()
 
-        self.category_combo = ttk.Combobox(view_books_frame, values=get_all_categories(), state="readonly")
+        self.category_combo = ttk.Combobox(view_books_frame, values=categories, state="readonly")
         self.category_combo.grid(row=0, column=2, padx=5, pady=5, sticky="w")
-        self.category_combo.set(f"{get_all_categories()[0]}")
+        self.category_combo.set(f"{categories[0]}" if categories else "Categories")
         self.category_combo.grid_forget()
 
         # Function to update the books list based on selected filter
@@ -278,8 +295,7 @@ class LibraryGUI:
             selected_filter = self.combo.get()
             if selected_filter == "Category":
                 self.category_combo.grid(row=0, column=2, padx=5, pady=5, sticky="w")
-                search = Search(SearchCategory())
-                search.search(self.category_combo.get(), self.book_list, self.controller.library.get_books())
+                self.search_books("Category")
             else:
                 self.category_combo.grid_forget()
                 self.search_books(selected_filter)
@@ -354,14 +370,14 @@ class LibraryGUI:
                 add_log("book added fail", "info")
                 return
 
-            try:
-                self.controller.add_book(title, author, copies, genre, year)
+            def added(result):
                 messagebox.showinfo("Success", f"Book '{title}' added successfully.")
                 add_log("book added successfully", "info")
                 add_book_frame.destroy()
                 self.create_dashboard()
-            except Exception as e:
-                error_label.config(text=str(e))
+
+            self.executor.submit(self.controller.add_book, title, author, copies, genre, year, on_done=added,
+                                 on_error=lambda e: error_label.config(text=str(e)))
 
         # Buttons
         button_frame = tk.Frame(add_book_frame)
@@ -393,13 +409,14 @@ class LibraryGUI:
                 add_log("book removed fail", "info")
                 return
             values = self.book_list.item(selected_item, "values")
-            try:
-                self.controller.remove_book(values[0], values[1])
+
+            def removed(result):
                 self.update_book_list()
                 messagebox.showinfo("Success", "Book removed successfully.")
                 add_log("book removed successfully", "info")
-            except Exception as e:
-                messagebox.showinfo("Error", str(e))
+
+            self.executor.submit(self.controller.remove_book, values[0], values[1], on_done=removed,
+                                 on_error=lambda e: messagebox.showinfo("Error", str(e)))
 
         tk.Button(button_frame, text="Remove", command=remove, width=10).pack(side=tk.LEFT, padx=5)
 
@@ -483,19 +500,31 @@ class LibraryGUI:
                 # Create a user dictionary to represent the borrower
                 user = {"name": user_name, "email": user_email, "phone": user_phone}
 
-                try:
-                    if self.controller.borrow_book(title, author, user) : # Pass user info to the controller
+                def borrowed(success):
+                    if success:
                         messagebox.showinfo("Success", f"'{user_name}' borrowed '{title}' successfully.")
                         add_log("book borrowed successfully", "info")
                     else:
                         messagebox.showinfo("Failed",f"Book '{title}' is unavailable. {user['name']} added to the waitlist.")
                         add_log("book borrowed fail", "info")
-                    self.update_book_list()
+                    if self.book_table is not None:
+                        self.book_table.refresh()
                     user_popup.destroy()
-                except ValueError as e:
-                    error_label.config(text=str(e))
 
-            tk.Button(user_popup, text="Submit", command=submit_user_info).pack(pady=10)
+                def failed(error):
+                    submit_button.config(state=tk.NORMAL)
+                    if isinstance(error, ValueError):
+                        error_label.config(text=str(error))
+                    else:
+                        messagebox.showerror("Error", str(error))
+
+                # The borrow (and the save it triggers) runs on the worker; block a second submit meanwhile
+                submit_button.config(state=tk.DISABLED)
+                self.executor.submit(self.controller.borrow_book, title, author, user, on_done=borrowed,
+                                     on_error=failed)
+
+            submit_button = tk.Button(user_popup, text="Submit", command=submit_user_info)
+            submit_button.pack(pady=10)
             tk.Button(user_popup, text="Cancel", command=user_popup.destroy).pack()
 
         tk.Button(button_frame, text="Lend", command=lend_book, width=10).pack(side=tk.LEFT, padx=5)
@@ -525,13 +554,15 @@ class LibraryGUI:
                 add_log("book returned fail", "info")
                 return
             values = self.book_list.item(selected_item, "values")
-            try:
-                self.controller.return_book(values[0], values[1])
-                self.update_book_list()
+
+            def returned(result):
+                if self.book_table is not None:
+                    self.book_table.refresh()
                 messagebox.showinfo("Success", "Book returned successfully.")
                 add_log("book returned successfully", "info")
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+
+            self.executor.submit(self.controller.return_book, values[0], values[1], on_done=returned,
+                                 on_error=lambda e: messagebox.showerror("Error", str(e)))
 
         tk.Button(button_frame, text="Return", command=return_book, width=10).pack(side=tk.LEFT, padx=5)
 
@@ -563,7 +594,7 @@ class LibraryGUI:
                 if isinstance(user, dict) and {"name", "email", "phone"}.issubset(user.keys()):
                     valid_entries.append(f"{user['name']} - {user['email']} - {user['phone']}")
                 else:
-                    print(f"Invalid waitlist entry: {user}")  # Log bad entries for debugging
+                    add_log("Invalid waitlist entry for '%s': %r", "warning", book_key, user)
 
             if valid_entries:
                 waitlist_str = "\n".join(valid_entries)
@@ -573,14 +604,64 @@ class LibraryGUI:
 
     def display_popular_books(self):
         """Display popular books sorted by request count."""
-        popular_books = self.controller.get_popular_books()
-        self.display_books_popup("Popular Books", popular_books, "Popular Books")
-        add_log("displayed successfully", "info")
+        def show(popular_books):
+            self.display_books_popup("Popular Books", popular_books, "Popular Books")
+            add_log("displayed successfully", "info")
+
+        self.executor.submit(self.controller.get_popular_books, on_done=show)
 
     def display_available_books(self):
         """Display books with available copies."""
-        available_books = self.controller.get_available_books()
-        self.display_books_popup("Available Books", available_books, "Available Books")
+        self.executor.submit(self.controller.get_available_books,
+                             on_done=lambda books: self.display_books_popup("Available Books", books, "Available Books"))
+
+    def display_diagnostics(self):
+        """Show the latency of each instrumented operation, refreshed every second while open."""
+        popup = tk.Toplevel(self.root)
+        popup.title("Diagnostics")
+
+        columns = ("operation", "count", "mean", "p50", "p95", "p99", "max")
+        tree = ttk.Treeview(popup, columns=columns, show="headings", height=15)
+        for column in columns:
+            tree.heading(column, text=column.capitalize() if column in ("operation", "count") else f"{column} (ms)")
+            tree.column(column, width=220 if column == "operation" else 80,
+                        anchor=tk.W if column == "operation" else tk.E)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        written_label = tk.Label(popup, anchor=tk.W)
+        written_label.pack(fill=tk.X, padx=10)
+
+        def refresh():
+            if not popup.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for row in metrics.snapshot():
+                tree.insert("", "end", values=(row["operation"], row["count"],
+                                               *(f"{row[key] * 1000:.3f}" for key in columns[2:])))
+            written = ", ".join(f"{labels.get('file')}: {total / 1024:.0f} KiB"
+                                for labels, total in metrics.totals("library_bytes_written"))
+            written_label.config(text=f"Bytes written: {written or 'none'}")
+            popup.after(1000, refresh)
+
+        def export():
+            path = filedialog.asksaveasfilename(parent=popup, defaultextension=".txt",
+                                                initialfile="library_metrics.txt")
+            if path:
+                metrics.write_openmetrics(path)
+                add_log("Metrics exported to %s", "info", path)
+
+        def reset():
+            metrics.reset()
+            tree.delete(*tree.get_children())
+
+        button_frame = tk.Frame(popup)
+        button_frame.pack(pady=10)
+        recording = tk.BooleanVar(value=metrics.enabled)
+        tk.Checkbutton(button_frame, text="Record timings", variable=recording,
+                       command=lambda: metrics.enable(recording.get())).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Reset", command=reset, width=10).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Export...", command=export, width=10).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Close", command=popup.destroy, width=10).pack(side=tk.LEFT, padx=5)
+        refresh()
 
     def display_books_popup(self, title, books, case):
         """Show a list of books in a popup window with dynamic columns based on the case."""
@@ -591,59 +672,96 @@ class LibraryGUI:
         # Define columns based on the case
         if case == "Popular Books":
             columns = ("Title", "Author", "Copies", "Genre", "Year", "Available", "Request Counter")
-            data_rows = [
-                (book.title, book.author, book.copies, book.genre, book.year, book.available, book.request_counter)
-                for book in books
-            ]
+            row = lambda book: (book.title, book.author, book.copies, book.genre, book.year, book.available,
+                                book.request_counter)
         elif case == "Available Books":
             columns = ("Title", "Author", "Copies", "Genre", "Year", "Available")
-            data_rows = [
-                (book.title, book.author, book.copies, book.genre, book.year, book.available)
-                for book in books
-            ]
+            row = lambda book: (book.title, book.author, book.copies, book.genre, book.year, book.available)
         else:
             raise ValueError("Unknown case provided.")
 
+        # Scrollbar configuration; packed first so it keeps its place beside the table
+        scrollbar = ttk.Scrollbar(popup, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
         # Create TreeView for dynamic columns
         book_list = ttk.Treeview(popup, columns=columns, show='headings')
 
         for column in columns:
             book_list.heading(column, text=column)
 
-        # Insert the data rows into the TreeView
-        for row in data_rows:
-            book_list.insert("", tk.END, values=row)
-
         book_list.pack(fill=tk.BOTH, expand=True)
 
-        # Scrollbar configuration
-        scrollbar = ttk.Scrollbar(popup, orient=tk.VERTICAL, command=book_list.yview)
-        book_list.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-    def search_books(self, strategy):
-        if strategy == "Search By Book Name":
-            search = Search(SearchBookName())
-            search.search(self.search_entry.get().strip().lower(), self.book_list, self.controller.library.get_books())
-        elif strategy == "Search By Author Name":
-            search = Search(SearchAuthorName())
-            search.search(self.search_entry.get().strip().lower(), self.book_list, self.controller.library.get_books())
+        # Only the visible page of the books is inserted into the TreeView
+        VirtualBookTable(book_list, scrollbar, row=row).show(books)
+
+    def search_books(self, strategy, live=False):
+        """Run a search on the worker thread and show its result; a newer search discards older ones.
+
+        Live searches (typing in the search box) show an empty query as all
+        books and do not pop up messages.
+        """
+        if strategy in ("Search By Book Name", "Search By Author Name"):
+            query = self.search_entry.get().strip().lower()
+            if live and query in ("", "enter book name...", "enter author name..."):
+                search, query = Search(SearchAllBooks()), "All Books"
+            elif strategy == "Search By Book Name":
+                search = Search(SearchBookName())
+            else:
+                search = Search(SearchAuthorName())
         elif strategy == "All Books":
-            search = Search(SearchAllBooks())
-            search.search("All Books", self.book_list, self.controller.library.get_books())
+            search, query = Search(SearchAllBooks()), "All Books"
         elif strategy == "Available Books":
-            search = Search(SearchAvailableBooks())
-            search.search("available", self.book_list, self.controller.library.get_books())
+            search, query = Search(SearchAvailableBooks()), "available"
         elif strategy == "Borrowed Books":
-            search = Search(SearchBorrowedBooks())
-            search.search("is_loaned", self.book_list, self.controller.library.get_books())
+            search, query = Search(SearchBorrowedBooks()), "is_loaned"
+        elif strategy == "Category":
+            search, query = Search(SearchCategory()), self.category_combo.get()
+        else:
+            return
+
+        def show(result):
+            if self.book_table is None:
+                return  # The screen was left while the search ran
+            if live:
+                self.book_table.show(result[0], keep_position=False)
+            else:
+                SearchStrategy.show_results(result, self.book_table)
+
+        def failed(error):
+            if not live:
+                messagebox.showinfo("Search", str(error))
+
+        self.executor.submit_latest("search", search.find, query, self.controller.library, on_done=show,
+                                    on_error=failed)
 
     def logout(self):
         """Logout the current librarian and return to the login screen."""
         add_log("log out successful", "info")
+        self.controller.logout_librarian()
+        self.executor.shutdown()
+        self.controller.flush()
         self.root.destroy()
-        self.__init__(self.controller)
+        self.__init__(self.controller, self.reload_interval)
+
+    def reload_if_changed(self):
+        """Apply changes saved by other desks and redraw the book list if anything changed."""
+        def reloaded(changed):
+            if changed and self.book_table is not None:
+                self.book_table.refresh()
+            self.root.after(self.reload_interval, self.reload_if_changed)
+
+        def failed(error):
+            add_log("Reloading changed files failed: %s", "error", error)
+            self.root.after(self.reload_interval, self.reload_if_changed)
+
+        self.executor.submit(self.controller.reload_if_changed, on_done=reloaded, on_error=failed)
 
     def run(self):
         """Run the main application loop."""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            # Let running work finish, then make sure no pending change is lost when the window closes
+            self.executor.shutdown()
+            self.controller.close()
@@ -1,39 +1,183 @@
+import itertools
+import os
+import threading
+
 from management.StatisticsManager import StatisticsManager
+from management.SearchIndex import NGramIndex
+from management.PopularityIndex import TopKIndex
+from management.BookLoader import BookLoader
+from management.CatalogSnapshot import CatalogSnapshot, SnapshotBooks
+from management.Metrics import timed
 from books.book import Book
+from files.Log import add_log
 
 
 class Library:
     FILE_PATH_NOT_PROVIDED_ERROR = "File path is not provided."
+    lazy_snapshot = True  # Serve a fresh snapshot straight from its mapping instead of copying it in
 
-    def __init__(self, file_path=None):
+    def __init__(self, file_path=None, popular_k=10, popular_by_genre=False):
         self.books_file_path = file_path
         self.books = {}  # Dictionary keyed by book_key
+        self.load_errors = []  # LoadError entries from the last load_books_from_file
+        self.order = {}  # book key -> insertion sequence, to keep results in library order
+        self._sequence = itertools.count()
+        # Trigram indexes for substring search, built by the first search so that loading stays cheap
+        self.title_index = None
+        self.author_index = None
+        # Secondary indexes, kept up to date on add/remove and through update_book_state. A catalog served
+        # from a snapshot builds them on first use instead.
+        self.indexed = True
+        self._index_lock = threading.Lock()
+        self.genre_index = {}  # genre -> set of book keys
+        self.available_keys = set()  # Books with at least one copy on the shelf
+        self.loaned_keys = set()  # Books marked as loaned
+        # Most requested books overall and, optionally, per genre
+        self.popular_k = popular_k
+        self.popularity = TopKIndex(popular_k)
+        self.genre_popularity = {} if popular_by_genre else None  # genre -> TopKIndex
+
+    @timed("library.load_books_from_file")
+    def load_books_from_file(self, chunk_size=10000, workers=0, use_snapshot=False):
+        """Stream books.csv into the library; rejected rows end up in load_errors.
 
-    def load_books_from_file(self):
+        With use_snapshot the books are served from the binary snapshot beside the
+        CSV when it is up to date, and the snapshot is rebuilt after a CSV load otherwise.
+        """
         if not self.books_file_path:
             raise ValueError(self.FILE_PATH_NOT_PROVIDED_ERROR)
+        snapshot_path = f"{self.books_file_path}.snapshot"
+        if use_snapshot:
+            loaded = self._load_from_snapshot(snapshot_path)
+            if loaded is not None:
+                return loaded
+
+        loader = BookLoader(self.books_file_path, chunk_size=chunk_size, workers=workers)
         try:
-            with open(self.books_file_path, 'r') as file:
-                # Skip the header row
-                next(file)
-                for line in file:
-                    book = self._parse_book_line(line)
-                    if book:
-                        self.add_book(book)
+            source_stat = os.stat(self.books_file_path)
+            for books in loader.iter_chunks():
+                for book in books:
+                    self.add_book(book)
         except FileNotFoundError:
-            print(f"File not found: {self.books_file_path}")
+            add_log(f"File not found: {self.books_file_path}", "warning")
+            return 0
         except Exception as e:
-            print(f"Error loading books: {type(e).__name__} - {e}")
+            add_log(f"Error loading books: {type(e).__name__} - {e}", "error")
+            self.load_errors = loader.errors
+            return loader.loaded  # Only part of the catalog is loaded, so it must not become a snapshot
+        self.load_errors = loader.errors
+        if loader.error_count:
+            add_log(f"Skipped {loader.error_count} invalid rows in {self.books_file_path}.", "warning")
+
+        # Only stamp a snapshot with the CSV's mtime if the CSV did not change while it was read
+        if use_snapshot and os.stat(self.books_file_path).st_mtime_ns == source_stat.st_mtime_ns:
+            try:
+                CatalogSnapshot.write(self, snapshot_path, self.books_file_path)
+            except OSError as e:
+                add_log(f"Could not write catalog snapshot {snapshot_path}: {e}", "warning")
+        return loader.loaded
+
+    def _load_from_snapshot(self, snapshot_path):
+        """Load from a fresh snapshot, or return None so that the caller falls back to the CSV.
+
+        An empty library keeps the snapshot mapped and serves its books from it: nothing
+        is decoded until it is looked up, and the secondary indexes are built by the
+        first query that needs them.
+        """
+        try:
+            snapshot = CatalogSnapshot(snapshot_path)
+        except (OSError, ValueError) as e:
+            add_log(f"Catalog snapshot {snapshot_path} unavailable ({e}), loading the CSV.", "info")
+            return None
+        if not snapshot.is_fresh(self.books_file_path):
+            snapshot.close()
+            add_log(f"Catalog snapshot {snapshot_path} is older than the CSV, rebuilding it.", "info")
+            return None
+
+        if self.lazy_snapshot and not self.books:
+            self.books = SnapshotBooks(snapshot)
+            self.indexed = False
+        else:
+            with snapshot:
+                self.add_books(snapshot.iter_books())
+        add_log(f"Loaded {len(snapshot)} books from catalog snapshot {snapshot_path}.", "info")
+        return len(snapshot)
 
     def add_book(self, book, book_key=None):
         if not isinstance(book, Book):
             raise TypeError(f"Expected a Book object, but got {type(book).__name__}")
         if book_key is None:
             book_key = StatisticsManager.generate_key(book.title, book.author)
+        if not self.indexed:
+            self.books[book_key] = book  # Indexed along with the rest of the catalog on first use
+            return
+        if book_key in self.books:
+            self._unindex_genre(book_key, self.books[book_key].genre)
+        else:
+            self.order[book_key] = next(self._sequence)
         self.books[book_key] = book
+        self._index_text(book_key, book.title, book.author)
+        self.genre_index.setdefault(book.genre, set()).add(book_key)
+        self.update_book_state(book_key)
+
+    def add_books(self, books):
+        """Add many (book_key, Book) pairs; returns how many were added."""
+        count = 0
+        for book_key, book in books:
+            self.add_book(book, book_key)
+            count += 1
+        return count
 
     def remove_book(self, book_key):
-        del self.books[book_key]
+        book = self.books.pop(book_key)
+        if not self.indexed:
+            return
+        del self.order[book_key]
+        self._unindex_text(book_key)
+        self._unindex_genre(book_key, book.genre)
+        self.available_keys.discard(book_key)
+        self.loaned_keys.discard(book_key)
+        self.popularity.remove(book_key)
+
+    def update_book_state(self, book_key):
+        """Refresh the availability and popularity indexes after a book was lent, requested or returned."""
+        if not self.indexed:
+            return
+        book = self.books[book_key]
+        self._index_state(book_key, book.genre, book.available, book.is_loaned, book.request_counter)
+
+    def _index_state(self, book_key, genre, available, is_loaned, request_counter):
+        order = self.order[book_key]
+        self.popularity.update(book_key, request_counter, order)
+        if self.genre_popularity is not None:
+            if genre not in self.genre_popularity:
+                self.genre_popularity[genre] = TopKIndex(self.popular_k)
+            self.genre_popularity[genre].update(book_key, request_counter, order)
+        if available > 0:
+            self.available_keys.add(book_key)
+        else:
+            self.available_keys.discard(book_key)
+        if is_loaned:
+            self.loaned_keys.add(book_key)
+        else:
+            self.loaned_keys.discard(book_key)
+
+    def _ensure_indexes(self):
+        """Build the secondary indexes of a catalog served from a snapshot, straight from its records."""
+        if self.indexed:
+            return
+        with self._index_lock:
+            if self.indexed:
+                return  # Another reader built them meanwhile
+            # The order of a book is its position in the snapshot, so _books_in_order can fetch it by row
+            position = -1
+            for position, book_key, genre, available, is_loaned, request_counter in self.books.iter_positions(
+                    "genre", "available", "is_loaned", "request_counter"):
+                self.order[book_key] = position
+                self.genre_index.setdefault(genre, set()).add(book_key)
+                self._index_state(book_key, genre, available, is_loaned, request_counter)
+            self._sequence = itertools.count(max(position + 1, len(self.books.snapshot)))
+            self.indexed = True
 
     def has_book(self, book_key):
         return book_key in self.books
@@ -42,26 +186,95 @@ class Library:
         # Return the books as a list
         return list(self.books.values())
 
-    @staticmethod
-    def _parse_book_line(line):
-        try:
-            title, author, is_loaned, copies, genre, year, available, request_counter = line.strip().split(',')
-
-            # Convert values to their correct types
-            copies = int(copies)
-            available = int(available)
-            is_loaned = available == 0  # Dynamically determine is_loaned based on available copies
-
-            return Book(
-                title=title,
-                author=author,
-                is_loaned=is_loaned,
-                copies=copies,
-                genre=genre,
-                year=int(year),
-                available=available,
-                request_counter=int(request_counter)
-            )
-        except ValueError:
-            print(f"Invalid book data: {line.strip()}")
-            return None
\ No newline at end of file
+    def get_genres(self):
+        """Return the distinct genres in the order they first appeared."""
+        self._ensure_indexes()
+        return list(self.genre_index)
+
+    def get_popular_books(self, genre=None):
+        """Return the most requested books, overall or within one genre."""
+        self._ensure_indexes()
+        if genre is None:
+            index = self.popularity
+        elif self.genre_popularity is not None:
+            index = self.genre_popularity.get(genre)
+        else:
+            raise ValueError("Per-genre popularity is not enabled for this library.")
+        return [self.books[book_key] for book_key in index.get_top()] if index else []
+
+    def get_books_by_genre(self, genre):
+        self._ensure_indexes()
+        return self._books_in_order(self.genre_index.get(genre, ()))
+
+    def get_available_books(self):
+        self._ensure_indexes()
+        return self._books_in_order(self.available_keys)
+
+    def get_loaned_books(self):
+        self._ensure_indexes()
+        return self._books_in_order(self.loaned_keys)
+
+    def _books_in_order(self, book_keys):
+        # Sorting by insertion order gives results in the same order as get_books()
+        book_keys = sorted(book_keys, key=self.order.__getitem__)
+        if isinstance(self.books, SnapshotBooks):
+            return [self.books.get_at(book_key, self.order[book_key]) for book_key in book_keys]
+        return [self.books[book_key] for book_key in book_keys]
+
+    def _unindex_genre(self, book_key, genre):
+        keys = self.genre_index.get(genre)
+        if keys is not None:
+            keys.discard(book_key)
+            if not keys:
+                del self.genre_index[genre]
+        if self.genre_popularity is not None and genre in self.genre_popularity:
+            self.genre_popularity[genre].remove(book_key)
+            if not self.genre_popularity[genre]:
+                del self.genre_popularity[genre]
+
+    def search_title(self, query):
+        """Return the books whose title contains query, ignoring case."""
+        self._ensure_indexes()
+        if self.title_index is None:
+            self.title_index = self._build_text_index("title")
+        return self._search(self.title_index, query, "title")
+
+    def search_author(self, query):
+        """Return the books whose author contains query, ignoring case."""
+        self._ensure_indexes()
+        if self.author_index is None:
+            self.author_index = self._build_text_index("author")
+        return self._search(self.author_index, query, "author")
+
+    def _search(self, index, query, field):
+        # The index only narrows the candidates down; each one is confirmed with the plain case-insensitive check
+        query = query.lower()
+        book_keys = index.candidates(query)
+        if book_keys is None:
+            books = self.books.values()
+        else:
+            books = self._books_in_order(book_keys)
+        return [book for book in books if query in getattr(book, field).lower()]
+
+    def _build_text_index(self, field):
+        index = NGramIndex()
+        if isinstance(self.books, SnapshotBooks):
+            values = self.books.iter_fields(field)  # Decodes only the one field of each record
+        else:
+            values = ((book_key, getattr(book, field)) for book_key, book in self.books.items())
+        for book_key, text in values:
+            index.add(book_key, text)
+        return index
+
+    def _index_text(self, book_key, title, author):
+        # Indexes that no search has built yet are left alone; they will see the book when they are built
+        if self.title_index is not None:
+            self.title_index.add(book_key, title)
+        if self.author_index is not None:
+            self.author_index.add(book_key, author)
+
+    def _unindex_text(self, book_key):
+        if self.title_index is not None:
+            self.title_index.remove(book_key)
+        if self.author_index is not None:
+            self.author_index.remove(book_key)
@@ -1,22 +1,23 @@
 import csv
 import hashlib
+import hmac
 import os
+import secrets
+import threading
+import time
 
-from management.StatisticsManager import StatisticsManager
 from files.Log import add_log
-
-# Ensure the log directory exists
-log_dir = os.path.dirname("../library_log.txt")
-if log_dir and not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+from management.FileSync import SyncedRows, atomic_write, file_lock, file_stamp
 
 class Librarian:
     """Represents a single librarian with encrypted password storage."""
+    HASH_ALGORITHM = "pbkdf2_sha256"
+    HASH_ITERATIONS = 200_000  # PBKDF2 cost; raising it makes existing hashes upgrade on their next login
 
-    def __init__(self, username, id, password):
+    def __init__(self, username, id, password, iterations=None):
         self.username = username
         self.id = id
-        self.password_hash = self._hash_password(password)
+        self.password_hash = self._hash_password(password, iterations) if password is not None else None
 
     def get_password(self):
         return self.password_hash
@@ -27,14 +28,32 @@ class Librarian:
     def get_username(self):
         return str(self.username)
 
-    @staticmethod
-    def _hash_password(password):
-        """Hash a password using SHA-256."""
-        return hashlib.sha256(password.encode()).hexdigest()
+    @classmethod
+    def _hash_password(cls, password, iterations=None, salt=None):
+        """Hash a password with salted PBKDF2-SHA256, stored as algorithm$iterations$salt$hash."""
+        iterations = iterations or cls.HASH_ITERATIONS
+        salt = salt or secrets.token_hex(16)
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations).hex()
+        return f"{cls.HASH_ALGORITHM}${iterations}${salt}${digest}"
 
     def verify_password(self, password):
         """Verify if the entered password matches the stored hash."""
-        return self.password_hash == hashlib.sha256(password.encode()).hexdigest()
+        if not self.password_hash:
+            return False
+        if "$" not in self.password_hash:
+            # Hashes from before PBKDF2 are plain SHA-256
+            expected = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(self.password_hash, expected)
+        algorithm, iterations, salt, _ = self.password_hash.split("$")
+        if algorithm != self.HASH_ALGORITHM:
+            return False
+        return hmac.compare_digest(self.password_hash, self._hash_password(password, int(iterations), salt))
+
+    def needs_rehash(self, iterations=None):
+        """True if the stored hash is legacy SHA-256 or cheaper than the configured cost."""
+        if not self.password_hash or "$" not in self.password_hash:
+            return True
+        return int(self.password_hash.split("$")[1]) < (iterations or self.HASH_ITERATIONS)
 
     def to_dict(self):
         """Convert librarian details to a dictionary for CSV storage."""
@@ -42,62 +61,167 @@ class Librarian:
 
     @staticmethod
     def update(observer,user, book_key):
-        add_log(f"Hey librarian: {observer.to_dict()['username']} ,please notify the {user['name']} the book {book_key} is now available.","info")
+        add_log("Hey librarian: %s ,please notify the %s the book %s is now available.", "info", observer.username,
+                user['name'], book_key)
 
     @staticmethod
     def from_dict(data):
         """Create a Librarian object from a dictionary."""
-        librarian = Librarian(data["username"], data["id"], "")
+        librarian = Librarian(data["username"], data["id"], None)
         librarian.password_hash = data["password_hash"]
         return librarian
 
 class LibrarianManager:
-    """Manages librarian registration and authentication."""
-    def __init__(self, file_path=os.path.abspath("../files/librarians.csv")):
+    """Manages librarian registration, authentication and login sessions.
+
+    ``hash_iterations`` is the PBKDF2 cost for new hashes; a librarian whose
+    stored hash is legacy SHA-256 or cheaper is rehashed on a successful login.
+    ``login`` hands out a random token that ``validate_session`` checks with a
+    dictionary lookup until it expires after ``session_ttl`` seconds; expired
+    sessions are dropped when they are checked and whenever a new one opens.
+    Librarians registered or changed by another process are picked up before
+    registering or authenticating, and merged rather than overwritten on save.
+    """
+    FIELDNAMES = ["username", "id", "password_hash"]
+
+    def __init__(self, file_path=os.path.abspath("../files/librarians.csv"), hash_iterations=Librarian.HASH_ITERATIONS,
+                 session_ttl=8 * 60 * 60, statistics_manager=None):
         self.file_path = file_path
+        self.statistics_manager = statistics_manager  # Librarians are subscribed to its waitlist notifications
+        self.hash_iterations = hash_iterations
+        self.session_ttl = session_ttl
         self.librarians = {}  # Dictionary to store librarians by ID
+        self.sessions = {}  # token -> (librarian ID, expiry on the monotonic clock)
+        self.synced = SyncedRows(file_path)  # The CSV file as last read or written
+        self.lock = threading.RLock()  # Guards reloads and saves of the file
         self._load_librarians()
 
     def _load_librarians(self):
         """Load librarians from the CSV file."""
+        stamp = file_stamp(self.file_path)
+        rows = self._read_rows()
+        if stamp is None:
+            add_log("Users file not found. Starting with an empty database.","warning")
+        for row in rows.values():
+            librarian = Librarian.from_dict(dict(zip(self.FIELDNAMES, row)))
+            self.librarians[librarian.id] = librarian
+        self.synced.track(rows, stamp)
+        if self.statistics_manager is not None:
+            self.subscribe(self.statistics_manager)
+
+    def reload_librarians(self):
+        """Apply librarians added, changed or removed by another process; returns how many."""
+        with self.lock:
+            if not self.synced.changed():
+                return 0
+            with file_lock(self.file_path, shared=True):
+                return self._merge_from_disk()
+
+    def _merge_from_disk(self):
+        stamp = file_stamp(self.file_path)
+        theirs = self._read_rows()
+        changes, conflicts = self.synced.merge(self._rows(), theirs)
+        for id, row in changes.items():
+            old = self.librarians.pop(id, None)
+            if old is not None and self.statistics_manager is not None:
+                self.statistics_manager.unregister_observer(old)
+            if row is not None:
+                self.librarians[id] = librarian = Librarian.from_dict(dict(zip(self.FIELDNAMES, row)))
+                if self.statistics_manager is not None:
+                    self.statistics_manager.register_observer(librarian)
+        if conflicts:
+            add_log("Kept local changes to librarians also changed in %s: %s", "warning", self.file_path, conflicts)
+        self.synced.track(theirs, stamp)
+        return len(changes)
+
+    def _rows(self):
+        return {librarian.id: (librarian.username, librarian.id, librarian.password_hash)
+                for librarian in self.librarians.values()}
+
+    def _read_rows(self):
         try:
-            with open(self.file_path, "r", encoding="utf-8") as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    librarian = Librarian.from_dict(row)
-                    self.librarians[librarian.id] = librarian
+            with open(self.file_path, "r", newline="", encoding="utf-8") as file:
+                return {row["id"]: tuple(row[field] for field in self.FIELDNAMES) for row in csv.DictReader(file)}
         except FileNotFoundError:
-            add_log("Users file not found. Starting with an empty database.","warning")
-        statistics_manager = StatisticsManager()
-        for value in self.librarians.values():
-            statistics_manager.register_observer(value)
+            return {}
+
+    def subscribe(self, statistics_manager):
+        """Register every librarian as an observer of statistics_manager, and any added later."""
+        self.statistics_manager = statistics_manager
+        for librarian in self.librarians.values():
+            statistics_manager.register_observer(librarian)
 
     def _save_librarians(self):
-        """Save librarians to the CSV file."""
-        with open(self.file_path, "w", newline="", encoding="utf-8") as file:
-            writer = csv.DictWriter(file, fieldnames=["username", "id", "password_hash"])
-            writer.writeheader()
-            for librarian in self.librarians.values():
-                writer.writerow(librarian.to_dict())
+        """Save librarians to the CSV file, locked and replaced atomically."""
+        with self.lock, file_lock(self.file_path):
+            if self.synced.changed():
+                self._merge_from_disk()
+            rows = self._rows()
+            with atomic_write(self.file_path) as file:
+                writer = csv.writer(file)
+                writer.writerow(self.FIELDNAMES)
+                writer.writerows(rows.values())
+            self.synced.track(rows)
 
     def add_librarian(self, username, id, password):
         """Register a new librarian."""
+        self.reload_librarians()
         if id in self.librarians:
-            add_log("Registration failed: ID '{id}' already exists.","error")
+            add_log("Registration failed: ID '%s' already exists.", "error", id)
             raise ValueError(f"Librarian with ID '{id}' already exists.")
-        self.librarians[id] = Librarian(username, id, password)
+        self.librarians[id] = Librarian(username, id, password, self.hash_iterations)
+        if self.statistics_manager is not None:
+            self.statistics_manager.register_observer(self.librarians[id])
         self._save_librarians()
-        add_log(f"Librarian '{username}' registered successfully.","info")
+        add_log("Librarian '%s' registered successfully.", "info", username)
 
     def is_librarian_registered(self, id):
         """Check if a librarian with the given username is already registered."""
+        self.reload_librarians()
         return id in self.librarians
 
     def authenticate(self, username, id, password):
         """Authenticate a librarian by username, ID, and password."""
+        self.reload_librarians()
         librarian = self.librarians.get(id)
         if librarian and librarian.username == username and librarian.verify_password(password):
-            add_log(f"Librarian '{username}' logged in successfully.","info")
+            if librarian.needs_rehash(self.hash_iterations):
+                librarian.password_hash = librarian._hash_password(password, self.hash_iterations)
+                self._save_librarians()
+                add_log("Upgraded password hash of librarian '%s'.", "info", username)
+            add_log("Librarian '%s' logged in successfully.", "info", username)
             return librarian
-        add_log(f"Authentication failed for username '{username}' and ID '{id}'.","error")
+        add_log("Authentication failed for username '%s' and ID '%s'.", "error", username, id)
         return None
+
+    def login(self, username, id, password):
+        """Authenticate a librarian and open a session; returns its token, or None on failure."""
+        librarian = self.authenticate(username, id, password)
+        if librarian is None:
+            return None
+        now = time.monotonic()
+        self._purge_sessions(now)
+        token = secrets.token_urlsafe(32)
+        self.sessions[token] = (librarian.id, now + self.session_ttl)
+        return token
+
+    def validate_session(self, token):
+        """Return the librarian of a live session token, or None if it is unknown or expired."""
+        session = self.sessions.get(token)
+        if session is None:
+            return None
+        librarian_id, expires_at = session
+        if time.monotonic() >= expires_at:
+            del self.sessions[token]
+            return None
+        return self.librarians.get(librarian_id)
+
+    def logout(self, token):
+        """End a session; unknown tokens are ignored."""
+        self.sessions.pop(token, None)
+
+    def _purge_sessions(self, now):
+        """Drop expired sessions, so the table only holds sessions opened within the last session_ttl."""
+        for token, (_, expires_at) in list(self.sessions.items()):
+            if now >= expires_at:
+                self.sessions.pop(token, None)